@@ -0,0 +1,294 @@
+"""
+Vectorized corpus analytics
+- Flattens scenarios into columnar NumPy arrays, one row per scenario or per item
+  (conflict point, negotiable point, party, persuasion technique, objective)
+- Enum fields are stored as small integer codes; the categories come from the
+  "^(a|b|c)$" patterns on the Pydantic models
+- Severity mix, technique frequency, approach x desired-outcome cross-tabs and
+  points-per-scenario distributions are computed with bincount passes
+- CorpusAnalytics caches columns per file and the results per corpus version
+- Requires: pip install numpy
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from corpus import CorpusError, ScenarioIndex, load_scenario_file
+
+logger = logging.getLogger('analytics')
+
+# Codes for values outside the categories and for absent optional values
+UNKNOWN = -1
+MISSING = -2
+
+ENUM_PATTERN = re.compile(r'^\^\(([\w\-|]+)\)\$$')
+COUNT_COLUMNS = ('parties', 'conflictPoints', 'negotiablePoints', 'nonNegotiablePoints')
+TOP_INDUSTRIES = 20
+
+
+def enum_categories(model: type, field: str) -> List[str]:
+    """Return the allowed values of a pattern-constrained model field
+
+    Args:
+        model (type): Pydantic model class
+        field (str): Field name whose pattern looks like ^(a|b|c)$
+
+    Returns:
+        List[str]: Allowed values in pattern order
+
+    Raises:
+        ValueError: If the field has no enum-like pattern
+    """
+    for metadata in model.model_fields[field].metadata:
+        match = ENUM_PATTERN.match(getattr(metadata, 'pattern', None) or '')
+        if match:
+            return match.group(1).split('|')
+    raise ValueError(f"{model.__name__}.{field} has no enum pattern")
+
+
+def _enum_fields() -> Dict[str, List[str]]:
+    from negotiationgen import (
+        ConflictPoint, LongTermObjective, NegotiablePoint, Party, PersuasionTechnique, RelationshipGoals, Strategy
+    )
+    return {
+        'severity': enum_categories(ConflictPoint, 'severity'),
+        'priority': enum_categories(NegotiablePoint, 'priority'),
+        'flexibility': enum_categories(NegotiablePoint, 'flexibility'),
+        'authorityLevel': enum_categories(Party, 'authorityLevel'),
+        'technique': enum_categories(PersuasionTechnique, 'technique'),
+        'overallApproach': enum_categories(Strategy, 'overallApproach'),
+        'desiredOutcome': enum_categories(RelationshipGoals, 'desiredOutcome'),
+        'importance': enum_categories(LongTermObjective, 'importance'),
+    }
+
+
+_categories: Optional[Dict[str, List[str]]] = None
+
+
+def categories() -> Dict[str, List[str]]:
+    """Enum categories per column, read once from the Pydantic models"""
+    global _categories
+    if _categories is None:
+        _categories = _enum_fields()
+    return _categories
+
+
+def _list(value) -> List:
+    return value if isinstance(value, list) else []
+
+
+def _dict(value) -> Dict:
+    return value if isinstance(value, dict) else {}
+
+
+class CorpusColumns:
+    """Columnar view of a set of scenarios
+
+    Scenario-level columns have one row per scenario. Item-level columns
+    (e.g. severity) have one row per item, with an "<column>_owner" array
+    holding the index of the scenario the item belongs to.
+    """
+
+    SCENARIO_ENUMS = ('overallApproach', 'desiredOutcome')
+    ITEM_ENUMS = ('severity', 'priority', 'flexibility', 'authorityLevel', 'technique', 'importance')
+
+    def __init__(self, size: int, arrays: Dict[str, np.ndarray], industries: np.ndarray):
+        self.size = size
+        self.arrays = arrays
+        self.industries = industries
+
+    @classmethod
+    def from_scenarios(cls, scenarios: List[Dict]) -> 'CorpusColumns':
+        """Flatten scenarios into columns (the only per-record Python pass)"""
+        lookup = {name: {value: code for code, value in enumerate(values)}
+                  for name, values in categories().items()}
+
+        def encode(name: str, value) -> int:
+            if value is None:
+                return MISSING
+            return lookup[name].get(value, UNKNOWN)
+
+        counts = {name: [] for name in COUNT_COLUMNS}
+        scenario_codes = {name: [] for name in cls.SCENARIO_ENUMS}
+        item_codes = {name: [] for name in cls.ITEM_ENUMS}
+        owners = {name: [] for name in cls.ITEM_ENUMS}
+        industries = []
+
+        def add_item(name: str, owner: int, value):
+            item_codes[name].append(encode(name, value))
+            owners[name].append(owner)
+
+        for row, scenario in enumerate(scenarios):
+            for name in COUNT_COLUMNS:
+                counts[name].append(len(_list(scenario.get(name))))
+            industries.append(_dict(scenario.get('topic')).get('industry') or '')
+
+            strategies = _dict(scenario.get('strategies'))
+            scenario_codes['overallApproach'].append(encode('overallApproach', strategies.get('overallApproach')))
+            scenario_codes['desiredOutcome'].append(
+                encode('desiredOutcome', _dict(strategies.get('relationshipGoals')).get('desiredOutcome'))
+            )
+            for objective in _list(strategies.get('longTermObjectives')):
+                add_item('importance', row, _dict(objective).get('importance'))
+
+            for point in _list(scenario.get('conflictPoints')):
+                add_item('severity', row, _dict(point).get('severity'))
+            for point in _list(scenario.get('negotiablePoints')):
+                add_item('priority', row, _dict(point).get('priority'))
+                add_item('flexibility', row, _dict(point).get('flexibility'))
+            for party in _list(scenario.get('parties')):
+                add_item('authorityLevel', row, _dict(party).get('authorityLevel'))
+            for technique in _list(_dict(scenario.get('tactics')).get('persuasionTechniques')):
+                add_item('technique', row, _dict(technique).get('technique'))
+
+        arrays = {name: np.array(values, dtype=np.int32) for name, values in counts.items()}
+        arrays.update({name: np.array(values, dtype=np.int8) for name, values in scenario_codes.items()})
+        for name in cls.ITEM_ENUMS:
+            arrays[name] = np.array(item_codes[name], dtype=np.int8)
+            arrays[f"{name}_owner"] = np.array(owners[name], dtype=np.int32)
+        return cls(len(scenarios), arrays, np.array(industries, dtype=object))
+
+    @classmethod
+    def concatenate(cls, parts: List['CorpusColumns']) -> 'CorpusColumns':
+        """Join per-file columns, shifting item owners to corpus-wide scenario indices"""
+        if not parts:
+            return cls.from_scenarios([])
+        offsets = np.cumsum([0] + [part.size for part in parts[:-1]])
+        arrays = {}
+        for name in parts[0].arrays:
+            if name.endswith('_owner'):
+                arrays[name] = np.concatenate([part.arrays[name] + offset for part, offset in zip(parts, offsets)])
+            else:
+                arrays[name] = np.concatenate([part.arrays[name] for part in parts])
+        industries = np.concatenate([part.industries for part in parts])
+        return cls(int(sum(part.size for part in parts)), arrays, industries)
+
+
+def _distribution(codes: np.ndarray, names: List[str]) -> Dict:
+    """Counts and shares of each category, plus unknown and missing values"""
+    known = codes[codes >= 0]
+    counts = np.bincount(known, minlength=len(names))
+    total = max(int(known.size), 1)
+    return {
+        'counts': dict(zip(names, counts.tolist())),
+        'shares': dict(zip(names, np.round(counts / total, 4).tolist())),
+        'unknown': int(np.count_nonzero(codes == UNKNOWN)),
+        'missing': int(np.count_nonzero(codes == MISSING)),
+    }
+
+
+def _scenarios_with(codes: np.ndarray, owners: np.ndarray, names: List[str]) -> Dict[str, int]:
+    """Number of scenarios containing each category at least once"""
+    known = codes >= 0
+    pairs = np.unique(owners[known].astype(np.int64) * len(names) + codes[known])
+    return dict(zip(names, np.bincount(pairs % len(names), minlength=len(names)).tolist()))
+
+
+def _crosstab(rows: np.ndarray, cols: np.ndarray, row_names: List[str], col_names: List[str]) -> Dict:
+    """Count matrix of two scenario-level enum columns (rows with both values only)"""
+    both = (rows >= 0) & (cols >= 0)
+    flat = rows[both].astype(np.int64) * len(col_names) + cols[both]
+    matrix = np.bincount(flat, minlength=len(row_names) * len(col_names)).reshape(len(row_names), len(col_names))
+    return {
+        'rows': row_names,
+        'columns': col_names,
+        'counts': matrix.tolist(),
+        'scenarios': int(both.sum()),
+    }
+
+
+def _count_summary(values: np.ndarray) -> Dict:
+    """Mean, percentiles and histogram of a per-scenario count column"""
+    if values.size == 0:
+        return {'mean': 0.0, 'median': 0.0, 'p90': 0.0, 'min': 0, 'max': 0, 'histogram': []}
+    return {
+        'mean': round(float(values.mean()), 2),
+        'median': float(np.median(values)),
+        'p90': float(np.percentile(values, 90)),
+        'min': int(values.min()),
+        'max': int(values.max()),
+        # histogram[i] = number of scenarios with exactly i points
+        'histogram': np.bincount(values).tolist(),
+    }
+
+
+def compute_stats(columns: CorpusColumns) -> Dict:
+    """Compute the corpus aggregates from columns
+
+    Args:
+        columns (CorpusColumns): Flattened corpus
+
+    Returns:
+        Dict: JSON-serializable aggregates
+    """
+    cats = categories()
+    a = columns.arrays
+    industries, industry_counts = np.unique(columns.industries[columns.industries != ''], return_counts=True)
+    top = np.argsort(-industry_counts, kind='stable')[:TOP_INDUSTRIES]
+    return {
+        'scenarios': columns.size,
+        'enums': {
+            name: _distribution(a[name], cats[name])
+            for name in CorpusColumns.ITEM_ENUMS + CorpusColumns.SCENARIO_ENUMS
+        },
+        'scenariosWith': {
+            'severity': _scenarios_with(a['severity'], a['severity_owner'], cats['severity']),
+            'technique': _scenarios_with(a['technique'], a['technique_owner'], cats['technique']),
+        },
+        'approachByOutcome': _crosstab(a['overallApproach'], a['desiredOutcome'],
+                                       cats['overallApproach'], cats['desiredOutcome']),
+        'pointsPerScenario': {name: _count_summary(a[name]) for name in COUNT_COLUMNS},
+        'industries': dict(zip(industries[top].tolist(), industry_counts[top].tolist())),
+    }
+
+
+class CorpusAnalytics:
+    """Corpus statistics cached until the scenario files change
+
+    Columns are kept per file keyed by modification time, so a change only
+    re-flattens the files that changed before the vectorized passes rerun.
+    """
+
+    def __init__(self, index: ScenarioIndex):
+        self.index = index
+        self._lock = threading.Lock()
+        self._file_columns: Dict[Tuple[str, int], CorpusColumns] = {}
+        self._key: Optional[Tuple] = None
+        self._etag: Optional[str] = None
+        self._stats: Optional[Dict] = None
+
+    def stats(self) -> Tuple[str, Dict]:
+        """Return (etag, stats) for the current corpus
+
+        The etag is derived from the file paths and modification times, so it
+        is the same across worker processes serving the same data root.
+        """
+        versions = tuple(self.index.file_versions())
+        with self._lock:
+            if versions == self._key:
+                return self._etag, self._stats
+
+            parts = []
+            file_columns = {}
+            for version in versions:
+                columns = self._file_columns.get(version)
+                if columns is None:
+                    try:
+                        columns = CorpusColumns.from_scenarios(load_scenario_file(version[0]))
+                    except CorpusError as e:
+                        logger.warning(e.message)
+                        continue
+                file_columns[version] = columns
+                parts.append(columns)
+
+            self._file_columns = file_columns
+            self._stats = compute_stats(CorpusColumns.concatenate(parts))
+            self._stats['files'] = len(parts)
+            self._key = versions
+            self._etag = hashlib.sha1(repr(versions).encode()).hexdigest()
+            return self._etag, self._stats
@@ -7,32 +7,109 @@ document.addEventListener('DOMContentLoaded', () => {
     const loadJsonBtn = document.getElementById('loadJson');
     const jsonFileInput = document.getElementById('jsonFileInput');
     const clearAllBtn = document.getElementById('clearAll');
-
-    // Store negotiations data
+    const gridSentinel = document.getElementById('gridSentinel');
+
+    // Rendering and paging settings
+    const PAGE_SIZE = 50;
+    const RENDER_MARGIN_PX = 800;
+    const ESTIMATED_BLOCK_HEIGHT_PX = 600;
+    const JSON_ENTRIES_PER_FRAME = 200;
+    const LIVE_RECONNECT_MS = 30000;
+
+    // Telemetry batching: events are buffered and sent together
+    const TELEMETRY_FLUSH_MS = 5000;
+    const TELEMETRY_MAX_BATCH = 50;
+    const TELEMETRY_MAX_BUFFER = 500;
+
+    // Store negotiations data. Scenarios paged from the server are kept as
+    // pre-rendered fragments ({ id, key, title, html }) instead of scenario
+    // objects; scenarioIndex maps their ids to positions in negotiations
+    // (null once cleared from the grid); serverOrder lists the paged-in ids
+    // in server order, so live additions can be placed among them
     let negotiations = [];
+    const scenarioIndex = new Map();
+    let serverOrder = [];
+    const serverPaging = { offset: 0, done: false, loading: false };
+
+    // Client telemetry (errors and timings), flushed in batches
+    const telemetry = { events: [], repeats: new Map(), dropped: 0 };
+
+    function recordEvent(kind, data) {
+        const event = { kind, timestamp: new Date().toISOString(), ...data };
+        // Collapse repeats of the same error into one event with a count
+        if (kind === 'error') {
+            const key = `${data.context}\n${data.message}`;
+            const existing = telemetry.repeats.get(key);
+            if (existing) {
+                existing.count += 1;
+                return;
+            }
+            event.count = 1;
+            telemetry.repeats.set(key, event);
+        }
+        if (telemetry.events.length >= TELEMETRY_MAX_BUFFER) {
+            telemetry.events.shift();
+            telemetry.dropped += 1;
+        }
+        telemetry.events.push(event);
+        if (telemetry.events.length >= TELEMETRY_MAX_BATCH) {
+            flushTelemetry();
+        }
+    }
 
-    // Error logging function
-    async function logError(error, context = '') {
-        const timestamp = new Date().toISOString();
-        const errorLog = `[${timestamp}] [ERROR] ${context}\n${error.stack || error}\n---\n`;
-        
-        console.error(errorLog);
-        
-        try {
-            const response = await fetch('/log-error', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'text/plain',
-                },
-                body: errorLog
+    function flushTelemetry() {
+        if (telemetry.events.length === 0 && telemetry.dropped === 0) {
+            return;
+        }
+        while (telemetry.events.length > 0 || telemetry.dropped > 0) {
+            const body = JSON.stringify({
+                events: telemetry.events.splice(0, TELEMETRY_MAX_BATCH),
+                dropped: telemetry.dropped
             });
-            
-            if (!response.ok) {
-                console.error('Failed to log error to server');
+            telemetry.dropped = 0;
+            // sendBeacon survives page unload and never blocks rendering
+            const queued = navigator.sendBeacon
+                && navigator.sendBeacon('/telemetry', new Blob([body], { type: 'application/json' }));
+            if (!queued) {
+                fetch('/telemetry', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body,
+                    keepalive: true
+                }).catch(() => {});
             }
-        } catch (e) {
-            console.error('Failed to log error:', e);
         }
+        telemetry.repeats.clear();
+    }
+
+    setInterval(flushTelemetry, TELEMETRY_FLUSH_MS);
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            flushTelemetry();
+        }
+    });
+    window.addEventListener('pagehide', flushTelemetry);
+
+    // Error logging function
+    function logError(error, context = '') {
+        const timestamp = new Date().toISOString();
+        console.error(`[${timestamp}] [ERROR] ${context}\n${error.stack || error}\n---\n`);
+        recordEvent('error', {
+            context,
+            message: String(error && error.message !== undefined ? error.message : error),
+            stack: error && error.stack ? String(error.stack) : ''
+        });
+    }
+
+    // Escape model-generated text before it goes into an HTML template
+    function escapeHtml(value) {
+        return String(value ?? '').replace(/[&<>"']/g, c => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        })[c]);
+    }
+
+    function isFragment(entry) {
+        return typeof entry.html === 'string';
     }
 
     // Helper function to create strategy section
@@ -47,7 +124,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const objectivesList = clone.querySelector('.objectives-list');
         strategy.longTermObjectives.forEach(obj => {
             const li = document.createElement('li');
-            li.innerHTML = `<strong>${obj.objective}</strong> (${obj.importance}) - ${obj.timeframe}`;
+            li.innerHTML = `<strong>${escapeHtml(obj.objective)}</strong> (${escapeHtml(obj.importance)}) - ${escapeHtml(obj.timeframe)}`;
             objectivesList.appendChild(li);
         });
         
@@ -80,11 +157,11 @@ document.addEventListener('DOMContentLoaded', () => {
             const div = document.createElement('div');
             div.className = 'concession-stage';
             div.innerHTML = `
-                <h5>${stage.stage}</h5>
+                <h5>${escapeHtml(stage.stage)}</h5>
                 <p><strong>Possible Concessions:</strong></p>
-                <ul>${stage.possibleConcessions.map(c => `<li>${c}</li>`).join('')}</ul>
+                <ul>${stage.possibleConcessions.map(c => `<li>${escapeHtml(c)}</li>`).join('')}</ul>
                 <p><strong>Trigger Conditions:</strong></p>
-                <ul>${stage.triggerConditions.map(t => `<li>${t}</li>`).join('')}</ul>
+                <ul>${stage.triggerConditions.map(t => `<li>${escapeHtml(t)}</li>`).join('')}</ul>
             `;
             sequenceList.appendChild(div);
         });
@@ -97,10 +174,10 @@ document.addEventListener('DOMContentLoaded', () => {
         tactics.persuasionTechniques.forEach(tech => {
             const li = document.createElement('li');
             li.innerHTML = `
-                <strong>${tech.technique}</strong>
-                <p>${tech.applicationContext}</p>
+                <strong>${escapeHtml(tech.technique)}</strong>
+                <p>${escapeHtml(tech.applicationContext)}</p>
                 ${tech.fallbackOptions ? 
-                    `<p><em>Fallback Options:</em> ${tech.fallbackOptions.join(', ')}</p>` : 
+                    `<p><em>Fallback Options:</em> ${escapeHtml(tech.fallbackOptions.join(', '))}</p>` : 
                     ''}
             `;
             techniquesList.appendChild(li);
@@ -126,9 +203,9 @@ document.addEventListener('DOMContentLoaded', () => {
         tactics.deadlockBreakers.forEach(breaker => {
             const li = document.createElement('li');
             li.innerHTML = `
-                <strong>${breaker.approach}</strong>
-                <p>Conditions: ${breaker.conditions}</p>
-                <p>Risks: ${breaker.risks}</p>
+                <strong>${escapeHtml(breaker.approach)}</strong>
+                <p>Conditions: ${escapeHtml(breaker.conditions)}</p>
+                <p>Risks: ${escapeHtml(breaker.risks)}</p>
             `;
             breakersList.appendChild(li);
         });
@@ -136,211 +213,601 @@ document.addEventListener('DOMContentLoaded', () => {
         return clone;
     }
 
+    // Helper function to create a collapsible section whose content is built on first expand
+    function createLazySection(templateId, kind, index) {
+        const template = document.getElementById(templateId);
+        const clone = template.content.cloneNode(true);
+        const section = clone.firstElementChild;
+        section.dataset.kind = kind;
+        section.dataset.index = index;
+        section.querySelector('.section-content').replaceChildren();
+        return clone;
+    }
+
+    // Fill a lazy section the first time it is expanded
+    function buildLazySection(section) {
+        if (section.dataset.built) return;
+        const content = section.querySelector('.section-content');
+        const inert = section.closest('.negotiation-block')
+            .querySelector(`template[data-kind="${section.dataset.kind}"]`);
+        if (inert) {
+            // Server fragment: the section markup ships inert, once per scenario
+            content.replaceChildren(inert.content.cloneNode(true));
+        } else {
+            const negotiation = negotiations[Number(section.dataset.index)];
+            const built = section.dataset.kind === 'strategy'
+                ? createStrategySection(negotiation.strategies)
+                : createTacticsSection(negotiation.tactics);
+            content.replaceWith(built.querySelector('.section-content'));
+        }
+        section.dataset.built = 'true';
+    }
+
+    // Render one scenario (topic, description and party cards) into its block
+    function renderScenario(negotiation, index, block) {
+        const { topic, parties } = negotiation;
+
+        // Create topic header
+        const topicHeader = document.createElement('div');
+        topicHeader.className = 'negotiation-topic';
+        topicHeader.style.gridColumn = '1 / span 2';
+        topicHeader.textContent = topic.title;
+        block.appendChild(topicHeader);
+
+        // Create description
+        const description = document.createElement('div');
+        description.className = 'negotiation-description';
+        description.style.gridColumn = '1 / span 2';
+        description.textContent = topic.description;
+        block.appendChild(description);
+
+        // Create cards for both parties
+        parties.forEach(party => {
+            const card = document.createElement('div');
+            card.className = 'negotiation-card';
+
+            // Party name and role
+            const nameDiv = document.createElement('div');
+            nameDiv.className = 'party-name';
+            nameDiv.textContent = party.name;
+
+            const roleDiv = document.createElement('div');
+            roleDiv.className = 'party-role';
+            roleDiv.textContent = party.role;
+
+            // Interests section
+            const interestsSection = document.createElement('div');
+            interestsSection.className = 'section-container';
+            const interestsTitle = document.createElement('div');
+            interestsTitle.className = 'section-title';
+            interestsTitle.textContent = 'INTERESTS';
+            const interestsList = document.createElement('ul');
+            interestsList.className = 'interests-list';
+            party.interests.forEach(interest => {
+                const li = document.createElement('li');
+                li.textContent = interest;
+                interestsList.appendChild(li);
+            });
+
+            // Constraints section
+            const constraintsSection = document.createElement('div');
+            constraintsSection.className = 'section-container';
+            const constraintsTitle = document.createElement('div');
+            constraintsTitle.className = 'section-title';
+            constraintsTitle.textContent = 'CONSTRAINTS';
+            const constraintsList = document.createElement('ul');
+            constraintsList.className = 'constraints-list';
+            party.constraints.forEach(constraint => {
+                const li = document.createElement('li');
+                li.textContent = constraint;
+                constraintsList.appendChild(li);
+            });
+
+            // Negotiable points section
+            const pointsSection = document.createElement('div');
+            pointsSection.className = 'negotiable-points';
+            const pointsTitle = document.createElement('div');
+            pointsTitle.className = 'section-title';
+            pointsTitle.textContent = 'CURRENT POSITIONS';
+
+            const pointsList = document.createElement('ul');
+            pointsList.className = 'section-list';
+            negotiation.negotiablePoints.forEach(point => {
+                const li = document.createElement('li');
+                li.className = 'section-item';
+                const position = party.id === 'party1' ? point.currentPosition.party1Position : point.currentPosition.party2Position;
+                li.textContent = `${point.topic}: ${position}`;
+                pointsList.appendChild(li);
+            });
+
+            // Walkaway conditions section
+            const walkawaySection = document.createElement('div');
+            walkawaySection.className = 'walkaway-conditions';
+            const walkawayTitle = document.createElement('div');
+            walkawayTitle.className = 'section-title';
+            walkawayTitle.textContent = 'WALKAWAY CONDITIONS';
+
+            const walkawayList = document.createElement('ul');
+            walkawayList.className = 'section-list';
+            const conditions = party.id === 'party1' ? negotiation.walkawayConditions.party1Conditions : negotiation.walkawayConditions.party2Conditions;
+            conditions.forEach(condition => {
+                const li = document.createElement('li');
+                li.className = 'section-item';
+                li.textContent = condition.condition;
+                walkawayList.appendChild(li);
+            });
+
+            // Assemble the card
+            card.appendChild(nameDiv);
+            card.appendChild(roleDiv);
+            
+            interestsSection.appendChild(interestsTitle);
+            interestsSection.appendChild(interestsList);
+            card.appendChild(interestsSection);
+
+            constraintsSection.appendChild(constraintsTitle);
+            constraintsSection.appendChild(constraintsList);
+            card.appendChild(constraintsSection);
+
+            pointsSection.appendChild(pointsTitle);
+            pointsSection.appendChild(pointsList);
+            card.appendChild(pointsSection);
+
+            walkawaySection.appendChild(walkawayTitle);
+            walkawaySection.appendChild(walkawayList);
+            card.appendChild(walkawaySection);
+
+            // Add strategy section if available (content built on first expand)
+            if (negotiation.strategies) {
+                card.appendChild(createLazySection('strategyTemplate', 'strategy', index));
+            }
+
+            // Add tactics section if available (content built on first expand)
+            if (negotiation.tactics) {
+                card.appendChild(createLazySection('tacticsTemplate', 'tactics', index));
+            }
+
+            block.appendChild(card);
+        });
+    }
+
+    // Windowed rendering: every scenario gets a block that is only
+    // materialized while it is near the viewport. Off-screen blocks keep
+    // their measured height so the scrollbar stays stable.
+    const blockObserver = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            const block = entry.target;
+            if (entry.isIntersecting) {
+                materializeBlock(block);
+            } else {
+                releaseBlock(block);
+            }
+        });
+    }, { rootMargin: `${RENDER_MARGIN_PX}px 0px` });
+
+    function materializeBlock(block) {
+        if (block.dataset.rendered) return;
+        const index = Number(block.dataset.index);
+        try {
+            const entry = negotiations[index];
+            if (isFragment(entry)) {
+                // Rendered and escaped by the server
+                block.innerHTML = entry.html;
+            } else {
+                renderScenario(entry, index, block);
+            }
+        } catch (error) {
+            logError(error, `Error rendering scenario ${index}`);
+        }
+        block.style.minHeight = '';
+        block.dataset.rendered = 'true';
+    }
+
+    function releaseBlock(block) {
+        if (!block.dataset.rendered) return;
+        block.style.minHeight = `${block.offsetHeight}px`;
+        block.replaceChildren();
+        delete block.dataset.rendered;
+    }
+
+    // Append scenarios to the grid (or insert them before a block) without
+    // touching existing blocks
+    function appendScenarios(scenarios, ids = [], before = null) {
+        const fragment = document.createDocumentFragment();
+        scenarios.forEach((scenario, i) => {
+            const id = ids[i];
+            const index = negotiations.length;
+            if (id !== undefined) {
+                if (scenarioIndex.has(id)) return;
+                scenarioIndex.set(id, index);
+            }
+            negotiations.push(scenario);
+
+            const block = document.createElement('div');
+            block.className = 'negotiation-block';
+            block.dataset.index = index;
+            block.style.minHeight = `${ESTIMATED_BLOCK_HEIGHT_PX}px`;
+            fragment.appendChild(block);
+            blockObserver.observe(block);
+        });
+        gridContainer.insertBefore(fragment, before);
+    }
+
+    // Insert a server card at its position in server order: before the next
+    // paged-in card that is still shown, or at the end of the grid
+    function insertScenario(entry, id, position) {
+        const next = serverOrder.slice(position).find(other => scenarioIndex.get(other) != null);
+        appendScenarios([entry], [id], next === undefined ? null : blockAt(scenarioIndex.get(next)));
+        serverOrder.splice(position, 0, id);
+    }
+
+    // Rebuild the grid from scratch (used after clearing)
     function updateGrid() {
-        gridContainer.innerHTML = '';
-        negotiations.forEach((negotiation, index) => {
-            const { topic, parties } = negotiation;
-
-            // Create topic header
-            const topicHeader = document.createElement('div');
-            topicHeader.className = 'negotiation-topic';
-            topicHeader.style.gridColumn = '1 / span 2';
-            topicHeader.textContent = topic.title;
-            gridContainer.appendChild(topicHeader);
-
-            // Create description
-            const description = document.createElement('div');
-            description.className = 'negotiation-description';
-            description.style.gridColumn = '1 / span 2';
-            description.textContent = topic.description;
-            gridContainer.appendChild(description);
-
-            // Create cards for both parties
-            parties.forEach(party => {
-                const card = document.createElement('div');
-                card.className = 'negotiation-card';
-
-                // Party name and role
-                const nameDiv = document.createElement('div');
-                nameDiv.className = 'party-name';
-                nameDiv.textContent = party.name;
-
-                const roleDiv = document.createElement('div');
-                roleDiv.className = 'party-role';
-                roleDiv.textContent = party.role;
-
-                // Interests section
-                const interestsSection = document.createElement('div');
-                interestsSection.className = 'section-container';
-                const interestsTitle = document.createElement('div');
-                interestsTitle.className = 'section-title';
-                interestsTitle.textContent = 'INTERESTS';
-                const interestsList = document.createElement('ul');
-                interestsList.className = 'interests-list';
-                party.interests.forEach(interest => {
-                    const li = document.createElement('li');
-                    li.textContent = interest;
-                    interestsList.appendChild(li);
-                });
+        blockObserver.disconnect();
+        gridContainer.replaceChildren();
+        const scenarios = negotiations;
+        negotiations = [];
+        appendScenarios(scenarios);
+    }
 
-                // Constraints section
-                const constraintsSection = document.createElement('div');
-                constraintsSection.className = 'section-container';
-                const constraintsTitle = document.createElement('div');
-                constraintsTitle.className = 'section-title';
-                constraintsTitle.textContent = 'CONSTRAINTS';
-                const constraintsList = document.createElement('ul');
-                constraintsList.className = 'constraints-list';
-                party.constraints.forEach(constraint => {
-                    const li = document.createElement('li');
-                    li.textContent = constraint;
-                    constraintsList.appendChild(li);
-                });
+    function fragmentEntry(item) {
+        return { id: item.id, key: item.key, title: item.title, html: item.html };
+    }
 
-                // Negotiable points section
-                const pointsSection = document.createElement('div');
-                pointsSection.className = 'negotiable-points';
-                const pointsTitle = document.createElement('div');
-                pointsTitle.className = 'section-title';
-                pointsTitle.textContent = 'CURRENT POSITIONS';
-
-                const pointsList = document.createElement('ul');
-                pointsList.className = 'section-list';
-                negotiation.negotiablePoints.forEach(point => {
-                    const li = document.createElement('li');
-                    li.className = 'section-item';
-                    const position = party.id === 'party1' ? point.currentPosition.party1Position : point.currentPosition.party2Position;
-                    li.textContent = `${point.topic}: ${position}`;
-                    pointsList.appendChild(li);
-                });
+    function blockAt(index) {
+        return gridContainer.querySelector(`.negotiation-block[data-index="${index}"]`);
+    }
 
-                // Walkaway conditions section
-                const walkawaySection = document.createElement('div');
-                walkawaySection.className = 'walkaway-conditions';
-                const walkawayTitle = document.createElement('div');
-                walkawayTitle.className = 'section-title';
-                walkawayTitle.textContent = 'WALKAWAY CONDITIONS';
-
-                const walkawayList = document.createElement('ul');
-                walkawayList.className = 'section-list';
-                const conditions = party.id === 'party1' ? negotiation.walkawayConditions.party1Conditions : negotiation.walkawayConditions.party2Conditions;
-                conditions.forEach(condition => {
-                    const li = document.createElement('li');
-                    li.className = 'section-item';
-                    li.textContent = condition.condition;
-                    walkawayList.appendChild(li);
-                });
+    // Replace a card in place, re-rendering it only if it is on screen
+    function updateScenario(item) {
+        const index = scenarioIndex.get(item.id);
+        if (index == null || negotiations[index].key === item.key) return;
+        negotiations[index] = fragmentEntry(item);
+        const block = blockAt(index);
+        if (block && block.dataset.rendered) {
+            delete block.dataset.rendered;
+            materializeBlock(block);
+        }
+    }
 
-                // Assemble the card
-                card.appendChild(nameDiv);
-                card.appendChild(roleDiv);
-                
-                interestsSection.appendChild(interestsTitle);
-                interestsSection.appendChild(interestsList);
-                card.appendChild(interestsSection);
-
-                constraintsSection.appendChild(constraintsTitle);
-                constraintsSection.appendChild(constraintsList);
-                card.appendChild(constraintsSection);
-
-                pointsSection.appendChild(pointsTitle);
-                pointsSection.appendChild(pointsList);
-                card.appendChild(pointsSection);
-
-                walkawaySection.appendChild(walkawayTitle);
-                walkawaySection.appendChild(walkawayList);
-                card.appendChild(walkawaySection);
-
-                // Add strategy section if available
-                if (negotiation.strategies) {
-                    const strategySection = createStrategySection(negotiation.strategies);
-                    card.appendChild(strategySection);
-                }
+    // Drop a card; its slot in negotiations stays empty so indexes do not shift.
+    // Returns whether the id was paged in, including cards hidden by Clear All
+    function removeScenario(id) {
+        if (!scenarioIndex.has(id)) return false;
+        const index = scenarioIndex.get(id);
+        scenarioIndex.delete(id);
+        if (index == null) return true;
+        negotiations[index] = null;
+        const block = blockAt(index);
+        if (block) {
+            blockObserver.unobserve(block);
+            block.remove();
+        }
+        return true;
+    }
 
-                // Add tactics section if available
-                if (negotiation.tactics) {
-                    const tacticsSection = createTacticsSection(negotiation.tactics);
-                    card.appendChild(tacticsSection);
-                }
+    // Paging and live updates both move serverPaging.offset, so they run one at a time
+    let serverTasks = Promise.resolve();
+    function queueServerTask(task) {
+        serverTasks = serverTasks.then(task).catch(error => logError(error, 'Error updating scenarios'));
+        return serverTasks;
+    }
+
+    // Server-side paging: fetch the next page of pre-rendered cards when the
+    // sentinel scrolls into view
+    function loadNextPage() {
+        if (serverPaging.loading || serverPaging.done) return;
+        serverPaging.loading = true;
+        return queueServerTask(fetchNextPage);
+    }
 
-                gridContainer.appendChild(card);
+    async function fetchNextPage() {
+        try {
+            const started = performance.now();
+            const response = await fetch(`/api/fragments?offset=${serverPaging.offset}&limit=${PAGE_SIZE}`);
+            if (!response.ok) {
+                serverPaging.done = true;
+                return;
+            }
+            const page = await response.json();
+            page.items.forEach(item => {
+                if (!scenarioIndex.has(item.id)) serverOrder.push(item.id);
             });
+            appendScenarios(page.items.map(fragmentEntry), page.items.map(item => item.id));
+            if (serverPaging.offset === 0) {
+                logMetrics('first-page', { items: page.items.length, totalMs: performance.now() - started });
+            }
+            serverPaging.offset += page.items.length;
+            serverPaging.done = page.items.length === 0 || serverPaging.offset >= page.total;
+        } catch (error) {
+            // Viewer opened without the backend: file loading still works
+            serverPaging.done = true;
+        } finally {
+            serverPaging.loading = false;
+        }
+    }
+
+    const pageObserver = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }, { rootMargin: `${RENDER_MARGIN_PX}px 0px` });
+    pageObserver.observe(gridSentinel);
+
+    async function fetchFragments(ids) {
+        const items = [];
+        for (let i = 0; i < ids.length; i += PAGE_SIZE) {
+            const query = ids.slice(i, i + PAGE_SIZE).map(id => `id=${encodeURIComponent(id)}`).join('&');
+            const response = await fetch(`/api/fragments?${query}`);
+            if (!response.ok) throw new Error(`Fragments request failed: ${response.status}`);
+            items.push(...(await response.json()).items);
+        }
+        return items;
+    }
+
+    // Live corpus updates: fetch and insert only the cards that changed
+    async function applyCorpusChanges(changes) {
+        changes.removed.forEach(id => {
+            if (removeScenario(id)) serverPaging.offset--;
         });
+        serverOrder = serverOrder.filter(id => scenarioIndex.has(id));
+        const known = changes.updated.filter(id => scenarioIndex.get(id) != null);
+        const items = await fetchFragments([...changes.added, ...known]);
+        items.sort((a, b) => a.position - b.position).forEach(item => {
+            if (scenarioIndex.has(item.id)) {
+                updateScenario(item);
+            } else if (item.position < serverPaging.offset || serverPaging.done) {
+                // Paging has passed its position; later cards move down by one
+                insertScenario(fragmentEntry(item), item.id, item.position);
+                serverPaging.offset++;
+            }
+        });
+        logMetrics('live-update', {
+            added: changes.added.length, updated: changes.updated.length, removed: changes.removed.length
+        });
+    }
+
+    // The server lost track of what this page has seen: page through the
+    // loaded range again and touch only the cards that differ
+    async function resyncCorpus() {
+        const loaded = serverPaging.offset;
+        const order = [];
+        const fresh = new Map();
+        let offset = 0;
+        let total = 0;
+        while (offset < loaded) {
+            const response = await fetch(`/api/fragments?offset=${offset}&limit=${PAGE_SIZE}`);
+            if (!response.ok) throw new Error(`Fragments request failed: ${response.status}`);
+            const page = await response.json();
+            total = page.total;
+            page.items.forEach(item => {
+                order.push(item.id);
+                if (scenarioIndex.has(item.id)) {
+                    updateScenario(item);
+                } else {
+                    fresh.set(item.id, item);
+                }
+            });
+            if (page.items.length === 0) break;
+            offset += page.items.length;
+        }
+        const seen = new Set(order);
+        [...scenarioIndex.keys()].filter(id => !seen.has(id)).forEach(removeScenario);
+        // New cards go in last, in ascending position, so each one lands among cards already in order
+        serverOrder = order.filter(id => scenarioIndex.has(id));
+        order.forEach((id, position) => {
+            if (fresh.has(id)) insertScenario(fragmentEntry(fresh.get(id)), id, position);
+        });
+        serverPaging.offset = offset;
+        serverPaging.done = offset >= total;
     }
 
+    function connectCorpusEvents() {
+        if (!window.EventSource) return;
+        const source = new EventSource('/api/events');
+        source.addEventListener('changes', e => queueServerTask(() => applyCorpusChanges(JSON.parse(e.data))));
+        source.addEventListener('resync', () => queueServerTask(resyncCorpus));
+        source.onerror = () => {
+            // Dropped streams are retried by EventSource; refused ones (503, no backend) are closed
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connectCorpusEvents, LIVE_RECONNECT_MS);
+            }
+        };
+    }
+    connectCorpusEvents();
+
     // JSON file loading functionality
     loadJsonBtn.addEventListener('click', () => {
         jsonFileInput.click();
     });
 
-    jsonFileInput.addEventListener('change', (e) => {
-        const file = e.target.files[0];
-        if (!file) return;
+    // Report parse/render timings through the server logging endpoint
+    function logMetrics(name, data) {
+        recordEvent('metric', { name, ...data });
+    }
 
+    function showSuccess(message) {
+        const successMsg = document.createElement('div');
+        successMsg.className = 'success-message';
+        successMsg.textContent = message;
+        gridContainer.insertAdjacentElement('beforebegin', successMsg);
+
+        setTimeout(() => {
+            successMsg.remove();
+        }, 3000);
+    }
+
+    // Fallback for browsers without worker support: parse on the main thread
+    function loadFileOnMainThread(file) {
         const reader = new FileReader();
         reader.onload = (event) => {
             try {
-                const jsonData = JSON.parse(event.target.result);
-                
+                const started = performance.now();
+                const text = event.target.result;
+                let scenarios;
+                if (/\.(ndjson|jsonl)$/i.test(file.name)) {
+                    scenarios = text.split('\n').filter(line => line.trim()).map(line => JSON.parse(line));
+                } else {
+                    const jsonData = JSON.parse(text);
+                    scenarios = Array.isArray(jsonData.scenarios) ? jsonData.scenarios
+                        : (jsonData.negotiationId ? [jsonData] : null);
+                }
+
                 // Validate JSON structure
-                if (!Array.isArray(jsonData.scenarios)) {
+                if (!scenarios) {
                     throw new Error('Invalid JSON format. File must contain a "scenarios" array.');
                 }
 
-                negotiations = jsonData.scenarios;
-                updateGrid();
-
-                // Reset file input
-                e.target.value = '';
-                
-                // Show success message
-                const successMsg = document.createElement('div');
-                successMsg.className = 'success-message';
-                successMsg.textContent = 'Negotiation data loaded successfully!';
-                gridContainer.insertAdjacentElement('beforebegin', successMsg);
-
-                setTimeout(() => {
-                    successMsg.remove();
-                }, 3000);
-
+                appendScenarios(scenarios);
+                logMetrics('file-load', {
+                    file: file.name, bytes: file.size, count: scenarios.length,
+                    worker: false, totalMs: performance.now() - started
+                });
+                showSuccess('Negotiation data loaded successfully!');
             } catch (error) {
                 logError(error, 'Error loading JSON file');
                 alert('Error reading JSON file: ' + error.message);
             }
         };
         reader.readAsText(file);
+    }
+
+    // Parse the file in a worker and render cards as batches of records arrive
+    function loadFileInWorker(file) {
+        const worker = new Worker('scenario-worker.js');
+        const started = performance.now();
+        let firstRecordMs = null;
+        let renderMs = 0;
+
+        worker.onmessage = (event) => {
+            const message = event.data;
+            if (message.type === 'records') {
+                if (firstRecordMs === null) {
+                    firstRecordMs = performance.now() - started;
+                }
+                const renderStart = performance.now();
+                appendScenarios(message.records);
+                renderMs += performance.now() - renderStart;
+            } else if (message.type === 'done') {
+                worker.terminate();
+                logMetrics('file-load', {
+                    file: file.name, bytes: message.bytesRead, count: message.count,
+                    worker: true, parseMs: message.parseMs, renderMs,
+                    firstRecordMs, totalMs: performance.now() - started
+                });
+                showSuccess(`Loaded ${message.count} negotiation scenarios successfully!`);
+            } else if (message.type === 'error') {
+                worker.terminate();
+                logError(new Error(message.message), 'Error loading JSON file');
+                alert('Error reading JSON file: ' + message.message);
+            }
+        };
+        worker.onerror = (event) => {
+            event.preventDefault();
+            worker.terminate();
+            logError(new Error(event.message), 'Scenario worker failed, parsing on main thread');
+            loadFileOnMainThread(file);
+        };
+        worker.postMessage({ file });
+    }
+
+    jsonFileInput.addEventListener('change', (e) => {
+        const file = e.target.files[0];
+        if (!file) return;
+
+        if (window.Worker) {
+            loadFileInWorker(file);
+        } else {
+            loadFileOnMainThread(file);
+        }
+
+        // Reset file input
+        e.target.value = '';
     });
 
-    // Initialize collapsible sections
-    function initializeCollapsible() {
-        document.querySelectorAll('.collapsible .section-header').forEach(header => {
-            header.addEventListener('click', () => {
-                const content = header.nextElementSibling;
-                const button = header.querySelector('.toggle-btn i');
-                
-                // Toggle content visibility
-                if (content.style.maxHeight) {
-                    content.style.maxHeight = null;
-                    button.classList.remove('fa-chevron-up');
-                    button.classList.add('fa-chevron-down');
-                } else {
-                    content.style.maxHeight = content.scrollHeight + "px";
-                    button.classList.remove('fa-chevron-down');
-                    button.classList.add('fa-chevron-up');
+    // Collapsible sections: a single delegated handler instead of one per section
+    gridContainer.addEventListener('click', (e) => {
+        const header = e.target.closest('.collapsible .section-header');
+        if (!header) return;
+
+        const section = header.parentElement;
+        if (section.dataset.kind) {
+            buildLazySection(section);
+        }
+        const content = header.nextElementSibling;
+        const button = header.querySelector('.toggle-btn i');
+
+        // Toggle content visibility
+        if (content.style.maxHeight) {
+            content.style.maxHeight = null;
+            button.classList.remove('fa-chevron-up');
+            button.classList.add('fa-chevron-down');
+        } else {
+            content.style.maxHeight = content.scrollHeight + "px";
+            button.classList.remove('fa-chevron-down');
+            button.classList.add('fa-chevron-up');
+        }
+    });
+
+    // Modal functionality: one collapsed entry per scenario, serialized when opened
+    function createJsonEntry(negotiation, index) {
+        const details = document.createElement('details');
+        details.className = 'json-entry';
+        const summary = document.createElement('summary');
+        const title = isFragment(negotiation)
+            ? negotiation.title || negotiation.id
+            : negotiation.topic ? negotiation.topic.title : negotiation.negotiationId;
+        summary.textContent = `${index + 1}. ${title}`;
+        details.appendChild(summary);
+        details.addEventListener('toggle', async () => {
+            if (details.open && !details.querySelector('pre')) {
+                const pre = document.createElement('pre');
+                details.appendChild(pre);
+                if (!isFragment(negotiation)) {
+                    pre.textContent = JSON.stringify(negotiation, null, 2);
+                    return;
                 }
-            });
+                // Server scenarios are only fetched as JSON when opened here
+                try {
+                    const response = await fetch(`/api/scenarios/${encodeURIComponent(negotiation.id)}`);
+                    const data = await response.json();
+                    pre.textContent = JSON.stringify(response.ok ? data.scenario : data, null, 2);
+                } catch (error) {
+                    logError(error, `Error loading scenario ${negotiation.id}`);
+                    pre.textContent = 'Failed to load scenario.';
+                }
+            }
         });
+        return details;
     }
 
-    // Modal functionality
+    let jsonRenderToken = 0;
     viewJsonBtn.addEventListener('click', () => {
-        const formattedJson = JSON.stringify(negotiations, null, 2);
-        jsonDisplay.textContent = formattedJson;
+        const token = ++jsonRenderToken;
+        jsonDisplay.replaceChildren();
         modal.style.display = 'block';
+
+        let next = 0;
+        const renderChunk = () => {
+            if (token !== jsonRenderToken) return;
+            const fragment = document.createDocumentFragment();
+            const end = Math.min(next + JSON_ENTRIES_PER_FRAME, negotiations.length);
+            for (; next < end; next++) {
+                if (negotiations[next]) {
+                    fragment.appendChild(createJsonEntry(negotiations[next], next));
+                }
+            }
+            jsonDisplay.appendChild(fragment);
+            if (next < negotiations.length) {
+                requestAnimationFrame(renderChunk);
+            }
+        };
+        renderChunk();
     });
 
     closeModalBtn.addEventListener('click', () => {
         modal.style.display = 'none';
+        jsonRenderToken++;
     });
 
     window.addEventListener('click', (e) => {
@@ -349,33 +816,21 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    // Initialize collapsible sections after loading JSON
-    const originalUpdateGrid = updateGrid;
-    updateGrid = function() {
-        originalUpdateGrid.apply(this, arguments);
-        initializeCollapsible();
-    };
-
     // Clear All functionality
     clearAllBtn.addEventListener('click', () => {
-        if (negotiations.length === 0) {
+        if (!negotiations.some(Boolean)) {
             alert('No negotiations to clear.');
             return;
         }
 
         if (confirm('Are you sure you want to clear all negotiations? This action cannot be undone.')) {
             negotiations = [];
+            // Cleared server scenarios stay hidden; live updates skip them
+            scenarioIndex.forEach((_, id) => scenarioIndex.set(id, null));
             updateGrid();
 
             // Show success message
-            const successMsg = document.createElement('div');
-            successMsg.className = 'success-message';
-            successMsg.textContent = 'All negotiations have been cleared successfully!';
-            gridContainer.insertAdjacentElement('beforebegin', successMsg);
-
-            setTimeout(() => {
-                successMsg.remove();
-            }, 3000);
+            showSuccess('All negotiations have been cleared successfully!');
         }
     });
 });
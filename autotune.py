@@ -0,0 +1,291 @@
+"""
+Inference-options auto-tuner for the generators
+- Sweeps num_ctx, num_thread, num_batch, num_predict and temperature for the
+  negotiation and character workloads against an Ollama endpoint (--host, which
+  can also be a local stand-in for testing)
+- Each trial generates and validates a few items with one option set and measures
+  validated items per minute and per-item latency
+- Options are tuned one at a time starting from Ollama's defaults; a value is kept
+  only if it beats the best set so far by --min-gain
+- The best options per workload are saved to ollama_profile.json (OLLAMA_PROFILE),
+  which both generators load automatically
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ollama_runtime import PROFILE_PATH, TUNABLE_OPTIONS, positive_int
+
+logger = logging.getLogger('autotune')
+
+WORKLOADS = ('negotiation', 'character')
+DEFAULT_SAMPLES = 3
+DEFAULT_WARMUP = 1
+DEFAULT_MIN_GAIN = 0.05
+MAX_ERRORS_PER_TRIAL = 3
+
+# num_thread candidates describe this machine; pass --grid num_thread=... for a remote endpoint
+_CPUS = os.cpu_count() or 1
+DEFAULT_CANDIDATES: Dict[str, List[Any]] = {
+    'num_ctx': [4096, 8192, 16384],
+    'num_thread': sorted({max(_CPUS // 2, 1), _CPUS}),
+    'num_batch': [256, 512, 1024],
+    'num_predict': [2048, 4096, 8192],
+    'temperature': [0.3, 0.7, 1.0],
+}
+
+
+class AutotuneError(Exception):
+    """Exception raised when tuning cannot produce a profile"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output for the tuner"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console_handler)
+
+
+def parse_grid(value: str) -> Tuple[str, List[Any]]:
+    """Parse a candidate list like "num_ctx=4096,8192" """
+    name, _, values = value.partition('=')
+    name = name.strip()
+    if name not in TUNABLE_OPTIONS:
+        raise argparse.ArgumentTypeError(f"Unknown option {name!r} (expected {', '.join(TUNABLE_OPTIONS)})")
+    cast = float if name == 'temperature' else int
+    try:
+        candidates = [cast(v) for v in values.split(',') if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid values for {name}: {values!r}")
+    return name, candidates
+
+
+def workload_name(value: str) -> str:
+    """argparse type for a workload name"""
+    if value not in WORKLOADS:
+        raise argparse.ArgumentTypeError(f"Unknown workload {value!r} (expected {', '.join(WORKLOADS)})")
+    return value
+
+
+def _generator(workload: str) -> Tuple[Callable[..., Dict], str, float]:
+    """Return (generate, default model, attempt timeout) for a workload"""
+    if workload == 'character':
+        import charactergen
+
+        def generate(**options) -> Dict:
+            character = charactergen.generate_character(charactergen.SYSTEM_PROMPT, max_retries=1, **options)
+            charactergen.validate_character(character)
+            return character
+        return generate, charactergen.DEFAULT_MODEL, charactergen.DEFAULT_ATTEMPT_TIMEOUT
+
+    import negotiationgen
+
+    def generate(**options) -> Dict:
+        scenario = negotiationgen.generate_negotiation(negotiationgen.SYSTEM_PROMPT, max_retries=1, **options)
+        negotiationgen.validate_negotiation(scenario)
+        return scenario
+    return generate, negotiationgen.DEFAULT_MODEL, negotiationgen.DEFAULT_ATTEMPT_TIMEOUT
+
+
+def run_trial(generate: Callable[..., Dict], options: Dict[str, Any], model: str, samples: int,
+              warmup: int, attempt_timeout: float) -> Dict:
+    """Generate samples items with one option set and measure them
+
+    Warm-up items are not counted: changing num_ctx, num_batch or num_thread
+    makes Ollama reload the model, which a long batch only pays once.
+
+    Args:
+        generate (Callable[..., Dict]): Generates and validates one item
+        options (Dict[str, Any]): Inference options ({} for Ollama's defaults)
+        model (str): Model to tune for
+        samples (int): Measured items
+        warmup (int): Unmeasured items sent first
+        attempt_timeout (float): Seconds allowed for a single request
+
+    Returns:
+        Dict: Options, validated items per minute, latencies and the first errors
+    """
+    request = dict(options=options, models=[model], attempt_timeout=attempt_timeout)
+    for _ in range(warmup):
+        try:
+            generate(**request)
+        except Exception:
+            pass
+
+    latencies = []
+    errors = []
+    start_time = time.monotonic()
+    for _ in range(samples):
+        item_start = time.monotonic()
+        try:
+            generate(**request)
+            latencies.append(time.monotonic() - item_start)
+        except Exception as e:
+            if len(errors) < MAX_ERRORS_PER_TRIAL:
+                errors.append(str(getattr(e, 'message', e))[:200])
+    elapsed = time.monotonic() - start_time
+
+    latencies.sort()
+    return {
+        'options': options,
+        'samples': samples,
+        'valid': len(latencies),
+        'elapsed': round(elapsed, 2),
+        'items_per_minute': round(len(latencies) / max(elapsed, 1e-9) * 60, 3),
+        'mean_latency': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'p90_latency': round(latencies[min(len(latencies) - 1, int(0.9 * len(latencies)))], 3) if latencies else None,
+        'errors': errors,
+    }
+
+
+def better(trial: Dict, best: Dict, min_gain: float) -> bool:
+    """True if a trial beats the best one on throughput, or matches it with lower latency"""
+    if not trial['valid']:
+        return False
+    if not best['valid']:
+        return True
+    if trial['items_per_minute'] > best['items_per_minute'] * (1 + min_gain):
+        return True
+    return (trial['items_per_minute'] >= best['items_per_minute']
+            and trial['mean_latency'] < best['mean_latency'] * (1 - min_gain))
+
+
+def tune(workload: str, model: str, candidates: Dict[str, List[Any]], samples: int = DEFAULT_SAMPLES,
+         warmup: int = DEFAULT_WARMUP, min_gain: float = DEFAULT_MIN_GAIN,
+         attempt_timeout: Optional[float] = None) -> Tuple[Dict, Dict, List[Dict]]:
+    """Tune one workload option by option, starting from Ollama's defaults
+
+    Args:
+        workload (str): negotiation or character
+        model (str): Model to tune for
+        candidates (Dict[str, List[Any]]): Values to try per option
+        samples (int): Measured items per trial
+        warmup (int): Unmeasured items per trial
+        min_gain (float): Relative improvement required to keep a value
+        attempt_timeout (Optional[float]): Seconds per request (default: the generator's)
+
+    Returns:
+        Tuple[Dict, Dict, List[Dict]]: Best trial, baseline trial and every trial
+
+    Raises:
+        AutotuneError: If no option set produced a valid item
+    """
+    generate, _, default_timeout = _generator(workload)
+    timeout = attempt_timeout or default_timeout
+
+    def trial(options: Dict[str, Any]) -> Dict:
+        result = run_trial(generate, options, model, samples, warmup, timeout)
+        logger.info(
+            f"[{workload}] {json.dumps(options) if options else 'defaults'}: "
+            f"{result['valid']}/{samples} valid, {result['items_per_minute']:.2f} items/min, "
+            f"mean latency {result['mean_latency']}s"
+        )
+        return result
+
+    baseline = trial({})
+    best = baseline
+    trials = [baseline]
+    for name in TUNABLE_OPTIONS:
+        for value in candidates.get(name, []):
+            result = trial({**best['options'], name: value})
+            trials.append(result)
+            if better(result, best, min_gain):
+                best = result
+    if not best['valid']:
+        raise AutotuneError(f"No option set produced a valid {workload} item: {'; '.join(best['errors'])}")
+    return best, baseline, trials
+
+
+def save_profile(path: str, workload: str, entry: Dict):
+    """Store the tuned entry of one workload, keeping the other workloads"""
+    profile = {'workloads': {}}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            logger.warning(f"Replacing unreadable profile {path}: {str(e)}")
+        if not isinstance(profile.get('workloads'), dict):
+            profile = {'workloads': {}}
+    profile['workloads'][workload] = entry
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Tune Ollama inference options for the generators")
+    parser.add_argument('workloads', nargs='*', type=workload_name,
+                        help=f"Workloads to tune: {', '.join(WORKLOADS)} (default: both)")
+    parser.add_argument('--host', help="Ollama endpoint to tune against (default: OLLAMA_HOST)")
+    parser.add_argument('--model', help="Model to tune for (default: each generator's default model)")
+    parser.add_argument('--samples', type=positive_int, default=DEFAULT_SAMPLES, help="Measured items per trial")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help="Unmeasured items per trial")
+    parser.add_argument('--min-gain', type=float, default=DEFAULT_MIN_GAIN,
+                        help="Relative improvement required to keep a value")
+    parser.add_argument('--attempt-timeout', type=float, default=None, help="Seconds per request")
+    parser.add_argument('--grid', type=parse_grid, action='append', default=[],
+                        help="Candidate values for one option, e.g. num_ctx=4096,8192 (repeatable; empty skips it)")
+    parser.add_argument('--profile', default=PROFILE_PATH, help="Profile file the generators load")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Command-line entry point"""
+    args = parse_args()
+    setup_logging()
+    if args.host:
+        # Read by the Ollama client each generator request creates
+        os.environ['OLLAMA_HOST'] = args.host
+    candidates = dict(DEFAULT_CANDIDATES)
+    candidates.update(dict(args.grid))
+
+    failed = 0
+    try:
+        for workload in dict.fromkeys(args.workloads or WORKLOADS):
+            model = args.model or _generator(workload)[1]
+            logger.info(f"Tuning {workload} on {model} ({args.samples} samples per trial)")
+            try:
+                best, baseline, trials = tune(workload, model, candidates, args.samples, max(args.warmup, 0),
+                                              args.min_gain, args.attempt_timeout)
+            except AutotuneError as e:
+                logger.error(e.message)
+                failed += 1
+                continue
+            save_profile(args.profile, workload, {
+                'model': model,
+                'host': os.environ.get('OLLAMA_HOST'),
+                'options': best['options'],
+                'items_per_minute': best['items_per_minute'],
+                'mean_latency': best['mean_latency'],
+                'p90_latency': best['p90_latency'],
+                'baseline': {k: baseline[k] for k in ('items_per_minute', 'mean_latency', 'p90_latency')},
+                'trials': len(trials),
+                'samples': args.samples,
+                'tuned_at': datetime.datetime.utcnow().isoformat(),
+            })
+            logger.info(
+                f"Best {workload} options: {json.dumps(best['options']) if best['options'] else 'defaults'} "
+                f"({best['items_per_minute']:.2f} vs {baseline['items_per_minute']:.2f} items/min) "
+                f"saved to {args.profile}"
+            )
+    except KeyboardInterrupt:
+        logger.info("\nTuning cancelled by user.")
+        sys.exit(130)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,19 +8,39 @@ Character Generator using llama3.2 model
 """
 
 
+import argparse
 import json
 import datetime
 import re
 import traceback
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import sys
 import logging
 from logging.handlers import TimedRotatingFileHandler
 import time
 import os
-from ollama import chat
 from pydantic import BaseModel
 
+from ollama_runtime import (
+    CascadeStats, Cancelled, ChatResult, Deadline, DeadlineExceeded, HedgePolicy, HedgeStats, InferenceProfile,
+    LatencyTracker, OutputStats, ProgressRecorder, add_hedge_arguments, parse_models, positive_int, run_chat,
+    run_hedged_chat, sleep_within
+)
+from deadletter import DEAD_LETTER_PATH, DeadLetterError, DeadLetterQueue
+from genclient import DEFAULT_SOCKET, DaemonClient, DaemonError
+from profiling import add_profile_arguments, stage_profiler
+from wire_schema import expand_json, wire_schema
+
+# Model cascade, cheapest first; a single entry disables escalation
+DEFAULT_MODEL = 'llama3.2'
+DEFAULT_MODELS = [DEFAULT_MODEL]
+
+# Time limits (seconds); None means unbounded
+DEFAULT_ATTEMPT_TIMEOUT = 60.0
+DEFAULT_ITEM_TIMEOUT = None
+DEFAULT_BATCH_BUDGET = None
+PROGRESS_FILE = 'charactergen_progress.json'
+
 # Pydantic models for character structure
 class CategoryItem(BaseModel):
     text: str
@@ -62,6 +82,12 @@ class ValidationError(CharacterGenError):
     def __init__(self, message: str):
         super().__init__(message, "VALIDATION_ERROR")
 
+class DeadlineExceededError(CharacterGenError):
+    """Exception raised when a request, item or batch runs out of time"""
+    def __init__(self, message: str, scope: str = "attempt"):
+        super().__init__(message, f"DEADLINE_EXCEEDED_{scope.upper()}")
+        self.scope = scope
+
 def setup_logging():
     """Configure logging with enhanced error tracking and rotation"""
     logger = logging.getLogger('charactergen')
@@ -110,7 +136,7 @@ def setup_logging():
     
     return logger
 
-logger = setup_logging()
+logger = logging.getLogger('charactergen')
 
 def extract_json_from_response(text: str) -> Tuple[str, bool]:
     """Extract JSON content from a formatted response with improved handling
@@ -147,12 +173,163 @@ def extract_json_from_response(text: str) -> Tuple[str, bool]:
             
     raise JSONError("Could not extract valid JSON content from response")
 
-def generate_character(system_prompt: str, max_retries: int = 3) -> Dict:
+# Recent request latencies, hedging and cascade counters for this process
+latency_tracker = LatencyTracker()
+hedge_stats = HedgeStats()
+cascade_stats = CascadeStats()
+output_stats = OutputStats()
+
+# Tuned inference options (autotune.py), re-read when the profile changes
+inference_profile = InferenceProfile()
+
+def parse_character(content: str) -> Dict:
+    """Validate raw model output as a character profile
+    
+    Raises:
+        ValidationError: If the content does not match the Character model
+    """
+    try:
+        # Use Pydantic to validate the response
+        return Character.model_validate_json(content).model_dump()
+    except Exception as e:
+        error = ValidationError(f"Invalid character data structure: {str(e)}")
+        # Kept for the dead-letter queue
+        error.raw_content = content
+        raise error
+
+def _request(
+    messages: List[Dict[str, str]],
+    model: str,
+    attempt_timeout: Optional[float],
+    deadlines: List[Optional[Deadline]],
+    cancel_event,
+    hedge: Optional[HedgePolicy],
+    compact_keys: bool = False,
+    options: Optional[Dict[str, Any]] = None
+) -> Tuple[Dict, ChatResult]:
+    """Send one character request (hedged if configured) and validate the response"""
+    parse = parse_character
+    with stage_profiler.stage('schema'):
+        format = Character.model_json_schema()
+        if compact_keys:
+            # Short keys in the output, expanded to canonical names before validation
+            format = wire_schema(Character)
+            parse = lambda content: parse_character(expand_json(content, Character))
+    
+    if hedge is not None:
+        # Race a duplicate request once this one is slower than usual; the
+        # responses are parsed on the hedging threads, inside the model stage
+        with stage_profiler.stage('model'):
+            character_data, result = run_hedged_chat(
+                messages,
+                model,
+                parse,
+                hedge,
+                latency_tracker,
+                hedge_stats,
+                format=format,
+                options=options,
+                timeout=attempt_timeout,
+                deadlines=deadlines,
+                cancel_event=cancel_event
+            )
+        logger.debug(f"API request completed in {result.elapsed:.2f} seconds (host: {result.host or 'default'})")
+        logger.debug(f"Raw API response: {result.content}")
+        output_stats.record(result)
+        return character_data, result
+    
+    # Stream the response with the Pydantic model schema so the
+    # request can be cut off at its deadline
+    with stage_profiler.stage('model'):
+        result = run_chat(
+            messages=messages,
+            model=model,
+            format=format,
+            options=options,
+            timeout=attempt_timeout,
+            deadlines=deadlines,
+            cancel_event=cancel_event
+        )
+    latency_tracker.record(result.elapsed)
+    
+    # Log API performance
+    logger.debug(f"API request completed in {result.elapsed:.2f} seconds")
+    
+    # Log the raw response for debugging
+    logger.debug(f"Raw API response: {result.content}")
+    
+    with stage_profiler.stage('parse'):
+        character_data = parse(result.content)
+    output_stats.record(result)
+    return character_data, result
+
+def generate_with_cascade(messages: List[Dict[str, str]], models: List[str], **request_options) -> Dict:
+    """Generate a character trying the cheapest model first
+    
+    Output that fails validation is escalated to the next model.
+    
+    Raises:
+        ValidationError: If no model produced a valid character
+    """
+    last_error = None
+    for tier, model in enumerate(models):
+        start_time = time.monotonic()
+        try:
+            character_data, _ = _request(messages, model, **request_options)
+            cascade_stats.record(model, time.monotonic() - start_time, True)
+            return character_data
+        except ValidationError as e:
+            cascade_stats.record(model, time.monotonic() - start_time, False)
+            last_error = e
+            if tier + 1 < len(models):
+                logger.info(f"Escalating character from {model} to {models[tier + 1]}: {e.message}")
+    raise last_error
+
+def repair_character(raw_response: str, errors: List[str], models: List[str], **request_options) -> Dict:
+    """Ask the models to correct a stored invalid character instead of generating a new one
+    
+    Used to replay dead letters (deadletter.py --repair).
+    
+    Raises:
+        ValidationError: If no model returned a valid character
+    """
+    with stage_profiler.stage('prompt'):
+        messages = [
+            {
+                'role': 'user',
+                'content': (
+                    "Correct this character profile so it matches the required JSON structure. "
+                    "Keep its content where it is valid.\n"
+                    + (f"Validation errors:\n{chr(10).join(errors)}\n" if errors else "")
+                    + f"Profile:\n{raw_response}"
+                )
+            }
+        ]
+    return generate_with_cascade(messages, models, **request_options)
+
+def generate_character(
+    system_prompt: str,
+    max_retries: int = 3,
+    attempt_timeout: Optional[float] = DEFAULT_ATTEMPT_TIMEOUT,
+    deadlines: List[Optional[Deadline]] = (),
+    cancel_event=None,
+    hedge: Optional[HedgePolicy] = None,
+    models: Optional[List[str]] = None,
+    compact_keys: bool = False,
+    options: Optional[Dict[str, Any]] = None
+) -> Dict:
     """Generate a character using Ollama chat with enhanced error handling
     
     Args:
         system_prompt (str): Additional prompt instructions
         max_retries (int): Maximum number of retry attempts
+        attempt_timeout (Optional[float]): Seconds allowed for a single request
+        deadlines (List[Optional[Deadline]]): Item/batch deadlines bounding all attempts
+        cancel_event (Optional[threading.Event]): Set to abandon the request cooperatively
+        hedge (Optional[HedgePolicy]): Duplicate slow requests according to this policy
+        models (Optional[List[str]]): Model cascade, cheapest first
+        compact_keys (bool): Request short JSON keys to reduce output tokens
+        options (Optional[Dict[str, Any]]): Ollama inference options (default: the tuned profile)
         
     Returns:
         Dict: Generated character data in dictionary format
@@ -161,18 +338,20 @@ def generate_character(system_prompt: str, max_retries: int = 3) -> Dict:
         APIError: If API connection or response is invalid
         JSONError: If JSON processing fails
         ValidationError: If character data is invalid
+        DeadlineExceededError: If an item or batch deadline is reached
     """
     retry_count = 0
     last_error = None
+    last_raw = None
+    if options is None:
+        options = inference_profile.options('character')
     
     while retry_count < max_retries:
         try:
-            start_time = time.time()
             logger.debug(f"Attempt {retry_count + 1}/{max_retries}: Sending request to Ollama")
             
-            # Use ollama.chat() with Pydantic model schema
-            response = chat(
-                messages=[
+            with stage_profiler.stage('prompt'):
+                messages = [
                     {
                         'role': 'user',
                         'content': (
@@ -180,48 +359,61 @@ def generate_character(system_prompt: str, max_retries: int = 3) -> Dict:
                             f"{system_prompt}"
                         )
                     }
-                ],
-                model='llama3.2',
-                format=Character.model_json_schema()
-            )
-            
-            # Log API performance
-            elapsed = time.time() - start_time
-            logger.debug(f"API request completed in {elapsed:.2f} seconds")
+                ]
             
-            # Log the raw response for debugging
-            logger.debug(f"Raw API response: {response.message.content}")
-            
-            try:
-                # Use Pydantic to validate the response
-                character_data = Character.model_validate_json(response.message.content).model_dump()
-                return character_data
-                
-            except Exception as e:
-                raise ValidationError(f"Invalid character data structure: {str(e)}")
+            return generate_with_cascade(
+                messages,
+                models or DEFAULT_MODELS,
+                attempt_timeout=attempt_timeout,
+                deadlines=deadlines,
+                cancel_event=cancel_event,
+                hedge=hedge,
+                compact_keys=compact_keys,
+                options=options
+            )
             
+        except Cancelled as e:
+            raise DeadlineExceededError(f"Request cancelled: {str(e)}", "cancelled")
         except Exception as e:
             last_error = e
+            # Kept on the final error for the dead-letter queue
+            last_raw = getattr(e, 'raw_content', None) or last_raw
             retry_count += 1
+            # Item and batch deadlines end the retries; a per-attempt timeout does not
+            expired = next((d for d in deadlines if d is not None and d.expired()), None)
+            if expired is not None:
+                logger.error(f"{expired.scope.capitalize()} deadline reached after {retry_count} attempts: {str(e)}")
+                error = DeadlineExceededError(f"{expired.scope} deadline exceeded: {str(e)}", expired.scope)
+                error.raw_content = last_raw
+                raise error
             if retry_count < max_retries:
                 wait_time = 2 ** retry_count  # Exponential backoff
                 logger.warning(
                     f"Error on attempt {retry_count}: {str(e)}. "
                     f"Retrying in {wait_time} seconds..."
                 )
-                time.sleep(wait_time)
+                try:
+                    sleep_within(wait_time, deadlines, cancel_event)
+                except (DeadlineExceeded, Cancelled) as stop:
+                    raise DeadlineExceededError(f"Stopped during backoff: {str(stop)}",
+                                                getattr(stop, 'scope', 'cancelled'))
             else:
                 logger.error(
                     f"Failed after {max_retries} attempts: {str(e)}",
                     exc_info=True,
                     stack_info=True
                 )
-                if "connection" in str(e).lower():
-                    raise APIError(f"Connection error: {str(e)}")
+                if isinstance(e, DeadlineExceeded):
+                    error = DeadlineExceededError(f"Request timed out: {str(e)}", "attempt")
+                elif "connection" in str(e).lower():
+                    error = APIError(f"Connection error: {str(e)}")
                 else:
-                    raise CharacterGenError(f"Failed to generate character: {str(e)}")
+                    error = CharacterGenError(f"Failed to generate character: {str(e)}")
+                error.raw_content = last_raw
+                raise error
 
 
+@stage_profiler.staged('validate')
 def validate_character(character: Dict) -> bool:
     """Validate the character JSON structure using Pydantic
     
@@ -255,15 +447,144 @@ def validate_character(character: Dict) -> bool:
         )
         raise ValidationError(f"Validation failed: {str(e)}")
 
+@stage_profiler.staged('save')
+def save_characters(characters: List[Dict], suffix: str = "", directory: str = "") -> str:
+    """Save characters to a timestamped file and return its name
+    
+    Raises:
+        IOError: If the file cannot be written
+    """
+    timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    filename = os.path.join(directory, f"characters_{timestamp}{suffix}.json")
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({"students": characters}, f, indent=2, ensure_ascii=False)
+    return filename
+
+# Prompt sent with every request
+SYSTEM_PROMPT = """
+Generate a character profile following this exact JSON structure:
+{
+  "name": "A realistic full name",
+  "verbs": ["3-4 action words that describe what they do"],
+  "adjectives": ["3-4 descriptive words about their personality"],
+  "categories": {
+    "character": [
+      {"text": "A character trait", "emoji": "relevant emoji"},
+      {"text": "Another character trait", "emoji": "relevant emoji"}
+    ],
+    "business": [
+      {"text": "A business/professional skill", "emoji": "relevant emoji"},
+      {"text": "Another business/professional skill", "emoji": "relevant emoji"}
+    ],
+    "psychology": [
+      {"text": "A psychological trait", "emoji": "relevant emoji"},
+      {"text": "Another psychological trait", "emoji": "relevant emoji"}
+    ],
+    "desires": [
+      {"text": "A personal goal or desire", "emoji": "relevant emoji"},
+      {"text": "Another personal goal or desire", "emoji": "relevant emoji"}
+    ]
+  }
+}
+
+Guidelines:
+- Name should be realistic and professional
+- Verbs should be present tense (-s form) describing regular actions
+- Adjectives should capture key personality traits
+- Each category should have exactly 2 items
+- Each item must have relevant text and an appropriate emoji
+- Ensure all JSON formatting is exact with proper quotes and commas
+"""
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line options for the generator"""
+    parser = argparse.ArgumentParser(description="Generate character profiles with Ollama")
+    parser.add_argument('--attempt-timeout', type=float, default=DEFAULT_ATTEMPT_TIMEOUT,
+                        help="Seconds allowed for a single Ollama request")
+    parser.add_argument('--item-timeout', type=float, default=DEFAULT_ITEM_TIMEOUT,
+                        help="Seconds allowed per character across all retries")
+    parser.add_argument('--batch-budget', type=float, default=DEFAULT_BATCH_BUDGET,
+                        help="Seconds allowed for the whole batch")
+    add_hedge_arguments(parser)
+    parser.add_argument('--compact-keys', action='store_true',
+                        help="Generate with short JSON keys and expand them before validation")
+    parser.add_argument('--models', type=parse_models, default=DEFAULT_MODELS,
+                        help="Comma-separated model cascade, cheapest first (e.g. llama3.2:1b,llama3.2)")
+    parser.add_argument('--progress-file', default=PROGRESS_FILE,
+                        help="Where batch progress is recorded")
+    parser.add_argument('--count', type=positive_int, default=None,
+                        help="Number of characters to generate (asked interactively if omitted)")
+    parser.add_argument('--daemon', nargs='?', const=DEFAULT_SOCKET, default=None, metavar='SOCKET',
+                        help="Run the batch on the generator daemon (gendaemon.py) instead of in this process")
+    parser.add_argument('--dead-letters', default=DEAD_LETTER_PATH,
+                        help="Where characters that fail every attempt are queued for replay (deadletter.py)")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+def record_dead_letter(
+    dead_letters: DeadLetterQueue,
+    args: argparse.Namespace,
+    item: int,
+    error: Exception,
+    attempts: int
+):
+    """Queue a failed character for replay so the batch can go on"""
+    try:
+        letter_id = dead_letters.add(
+            'character',
+            error,
+            SYSTEM_PROMPT,
+            item=item,
+            models=args.models,
+            compact_keys=args.compact_keys,
+            attempts=attempts,
+            schema_model=Character
+        )
+    except DeadLetterError as e:
+        logger.error(f"Character {item} could not be queued for replay: {e.message}")
+        print(f"Failed to generate character {item}. Check error.log for details.")
+        return
+    logger.error(f"Character {item} queued in {dead_letters.path} as {letter_id}")
+    print(f"Failed to generate character {item}; queued for replay as {letter_id}.")
+
+def generate_with_daemon(args: argparse.Namespace, count: int) -> List[Dict]:
+    """Run the batch on the generator daemon and collect the characters it streams back
+    
+    Raises:
+        DaemonError: If the daemon is not running or rejects the request
+    """
+    fields = dict(models=args.models, compact_keys=args.compact_keys, attempt_timeout=args.attempt_timeout,
+                  item_timeout=args.item_timeout, budget=args.batch_budget)
+    characters = []
+    for event in DaemonClient(args.daemon).generate('character', count, **fields):
+        if event['event'] == 'accepted':
+            logger.info(f"Daemon accepted the batch as {event['job']}")
+        elif event['event'] == 'item':
+            characters.append(event['data'])
+            logger.info(f"Received character {event['item']}/{count} in {event['seconds']:.2f}s")
+        elif event['event'] == 'failed':
+            logger.error(f"Character {event['item']} failed on the daemon: {event['error']}")
+    return characters
+
 def main():
     """Main function to run the character generator with enhanced error handling"""
+    args = parse_args()
+    setup_logging()
     start_time = time.time()
     process_id = os.getpid()
     logger.info(f"Starting character generation process (PID: {process_id})")
+    if stage_profiler.start_from_args(args, [logger]):
+        logger.info(f"Profiling pipeline stages ({args.profile or 'timings only'})")
+    tuned_options = inference_profile.options('character')
+    if tuned_options:
+        logger.info(f"Using inference options from {inference_profile.path}: {tuned_options}")
+    characters = []
+    progress = None
     
     try:
-        # Get number of characters to generate
-        while True:
+        # Get number of characters to generate (--count skips the prompt)
+        num_characters = args.count
+        while args.count is None:
             try:
                 num_characters = int(input("How many characters would you like to generate? "))
                 if num_characters > 0:
@@ -280,60 +601,58 @@ def main():
                 )
                 print("Please enter a valid number.")
 
+        if args.daemon:
+            try:
+                characters = generate_with_daemon(args, num_characters)
+            except DaemonError as e:
+                logger.error(e.message)
+                print(f"{e.message}. Start it with: python gendaemon.py")
+                sys.exit(1)
+            if characters:
+                print(f"\nSuccessfully generated {len(characters)} characters, saved to {save_characters(characters)}")
+            sys.exit(0 if len(characters) == num_characters else 1)
+
         # Generate characters
-        characters = []
         successful_generations = 0
         total_attempts = 0
+        batch_status = 'completed'
+        batch_deadline = Deadline(args.batch_budget, scope="batch")
+        progress = ProgressRecorder(args.progress_file, 'character', num_characters)
+        dead_letters = DeadLetterQueue(args.dead_letters)
+        hedge_policy = HedgePolicy.from_args(args)
         
         for i in range(num_characters):
+            if batch_deadline.expired():
+                logger.warning(f"Batch budget exhausted before character {i+1}/{num_characters}")
+                batch_status = 'budget_exhausted'
+                break
             logger.info(f"Generating character {i+1}/{num_characters}...")
             generation_start = time.time()
+            item_deadline = Deadline(args.item_timeout, scope="item")
+            deadlines = [item_deadline, batch_deadline]
             attempts = 0
             max_attempts = 3
             
             while attempts < max_attempts:
                 try:
                     total_attempts += 1
-                    system_prompt = """
-Generate a character profile following this exact JSON structure:
-{
-  "name": "A realistic full name",
-  "verbs": ["3-4 action words that describe what they do"],
-  "adjectives": ["3-4 descriptive words about their personality"],
-  "categories": {
-    "character": [
-      {"text": "A character trait", "emoji": "relevant emoji"},
-      {"text": "Another character trait", "emoji": "relevant emoji"}
-    ],
-    "business": [
-      {"text": "A business/professional skill", "emoji": "relevant emoji"},
-      {"text": "Another business/professional skill", "emoji": "relevant emoji"}
-    ],
-    "psychology": [
-      {"text": "A psychological trait", "emoji": "relevant emoji"},
-      {"text": "Another psychological trait", "emoji": "relevant emoji"}
-    ],
-    "desires": [
-      {"text": "A personal goal or desire", "emoji": "relevant emoji"},
-      {"text": "Another personal goal or desire", "emoji": "relevant emoji"}
-    ]
-  }
-}
-
-Guidelines:
-- Name should be realistic and professional
-- Verbs should be present tense (-s form) describing regular actions
-- Adjectives should capture key personality traits
-- Each category should have exactly 2 items
-- Each item must have relevant text and an appropriate emoji
-- Ensure all JSON formatting is exact with proper quotes and commas
-"""
-                    character = generate_character(system_prompt)
+                    with stage_profiler.stage('progress'):
+                        progress.item_started(i + 1, attempts + 1)
+                    character = generate_character(
+                        SYSTEM_PROMPT,
+                        attempt_timeout=args.attempt_timeout,
+                        deadlines=deadlines,
+                        hedge=hedge_policy,
+                        models=args.models,
+                        compact_keys=args.compact_keys
+                    )
                     
                     # Validate the generated character
                     if validate_character(character):
                         characters.append(character)
                         successful_generations += 1
+                        with stage_profiler.stage('progress'):
+                            progress.item_completed()
                         generation_time = time.time() - generation_start
                         logger.info(
                             f"Successfully generated character {i+1} "
@@ -341,7 +660,22 @@ Guidelines:
                         )
                         break
                         
-                except (APIError, JSONError, ValidationError) as e:
+                except DeadlineExceededError as e:
+                    if e.scope in ('item', 'batch'):
+                        # Give up on this item (or the batch) instead of stalling behind it
+                        logger.error(f"Character {i+1} stopped: {e.message}")
+                        progress.item_failed(i + 1, e.message)
+                        print(f"Character {i+1} ran out of time ({e.scope} deadline).")
+                        if e.scope == 'item':
+                            record_dead_letter(dead_letters, args, i + 1, e, attempts + 1)
+                        break
+                    attempts += 1
+                    logger.error(f"Timed out on attempt {attempts}/{max_attempts}: {e.message}")
+                    if attempts >= max_attempts:
+                        progress.item_failed(i + 1, e.message)
+                        record_dead_letter(dead_letters, args, i + 1, e, attempts)
+                        
+                except CharacterGenError as e:
                     attempts += 1
                     logger.error(
                         f"Error on attempt {attempts}/{max_attempts}: {str(e)}",
@@ -350,24 +684,33 @@ Guidelines:
                     )
                     if attempts < max_attempts:
                         print(f"Error occurred, retrying... ({attempts}/{max_attempts})")
-                        time.sleep(2 ** attempts)  # Exponential backoff
+                        try:
+                            sleep_within(2 ** attempts, deadlines)  # Exponential backoff
+                        except DeadlineExceeded as stop:
+                            logger.error(f"Character {i+1} stopped during backoff: {stop.message}")
+                            progress.item_failed(i + 1, stop.message)
+                            if stop.scope == 'item':
+                                record_dead_letter(dead_letters, args, i + 1, e, attempts)
+                            break
                     else:
                         logger.error(
                             f"Failed to generate character {i+1} after {max_attempts} attempts",
                             exc_info=True,
                             stack_info=True
                         )
-                        print(f"Failed to generate character {i+1}. Check error.log for details.")
-                        sys.exit(1)
+                        progress.item_failed(i + 1, str(e))
+                        # One bad item does not cost the rest of the batch
+                        record_dead_letter(dead_letters, args, i + 1, e, attempts)
             
-        # Create output filename with timestamp
-        timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"characters_{timestamp}.json"
-
-        # Save to file
+            if batch_deadline.expired() and i + 1 < num_characters:
+                batch_status = 'budget_exhausted'
+                logger.warning(f"Batch budget exhausted after character {i+1}/{num_characters}")
+                break
+            
+        # Save to file with timestamp
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump({"students": characters}, f, indent=2, ensure_ascii=False)
+            filename = save_characters(characters)
+            progress.update(outputs=[filename])
         except IOError as e:
             logger.error(
                 f"Failed to save characters to file: {str(e)}",
@@ -387,13 +730,31 @@ Guidelines:
                     'characters_requested': num_characters,
                     'characters_generated': successful_generations,
                     'total_attempts': total_attempts,
-                    'success_rate': f"{(successful_generations/total_attempts)*100:.1f}%"
+                    'success_rate': f"{(successful_generations/max(total_attempts, 1))*100:.1f}%",
+                    'status': batch_status,
+                    'dead_letters': dead_letters.added,
+                    **(hedge_stats.as_dict() if hedge_policy is not None else {}),
+                    'models': cascade_stats.as_dict(),
+                    'output': {'keys': 'compact' if args.compact_keys else 'canonical', **output_stats.as_dict()}
                 }
             }
         )
+        progress.finish(batch_status)
         
         print(f"\nSuccessfully generated {successful_generations} characters "
               f"and saved to {filename}")
+        if dead_letters.added:
+            print(f"{dead_letters.added} failed characters queued in {dead_letters.path} "
+                  f"(replay with: python deadletter.py replay)")
+        if hedge_policy is not None:
+            print(f"Hedging: {hedge_stats.as_dict()}")
+        print(f"Output ({'compact' if args.compact_keys else 'canonical'} keys): {output_stats.as_dict()}")
+        if len(args.models) > 1:
+            print("Model cascade:")
+            for model, tier in cascade_stats.as_dict().items():
+                print(f"- {model}: {tier}")
+        if stage_profiler.enabled:
+            print(stage_profiler.finish(args.profile_output, 'character'))
 
     except KeyboardInterrupt:
         elapsed_time = time.time() - start_time
@@ -402,6 +763,19 @@ Guidelines:
             extra={'partial_completion': len(characters)}
         )
         print("\nOperation cancelled by user.")
+        if progress is not None:
+            # Keep the characters generated so far
+            if characters:
+                try:
+                    filename = save_characters(characters, "_partial")
+                    progress.update(outputs=[filename])
+                    print(f"Saved {len(characters)} characters to {filename}")
+                except IOError as e:
+                    logger.error(f"Failed to save partial characters: {str(e)}")
+            progress.finish('interrupted')
+            print(f"Progress recorded in {progress.path}")
+        if stage_profiler.enabled:
+            print(stage_profiler.finish(args.profile_output, 'character'))
         sys.exit(0)
         
     except Exception as e:
@@ -415,6 +789,8 @@ Guidelines:
                 'partial_completion': len(characters)
             }
         )
+        if progress is not None:
+            progress.finish('failed')
         print("An unexpected error occurred. Check error.log for details.")
         sys.exit(1)
 
@@ -0,0 +1,670 @@
+"""
+Scenario corpus access for the viewer backend
+- Discovers negotiation scenario files under a data root
+- Accepts {"scenarios": [...]} files, bare scenario objects and NDJSON files
+- Indexes scenarios as read-only views (byte ranges of memory-mapped files) that
+  decode single fields on access, so the index stays small for 100k+ scenarios
+- Re-reads files only when their size or modification time changes
+- Keeps a short log of the scenario ids each refresh added, updated or removed, so
+  open viewers can be sent just the changes (server.py /api/events)
+- Upgrades stored records to the current schema version as they are read (migrations.py)
+"""
+
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from migrations import migrate, migrate_all, needs_migration
+
+logger = logging.getLogger('corpus')
+
+# Files in the data root that are never scenario files
+EXCLUDED_FILES = {'negotiation-schema.json', 'package.json'}
+SCENARIO_EXTENSIONS = ('.json', '.ndjson', '.jsonl')
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+# Memory maps kept open per index (each holds a file descriptor)
+MAX_OPEN_MAPS = 64
+# Refreshes remembered for change notifications, and the most ids one refresh reports
+# (larger changes make clients resynchronize instead)
+CHANGE_LOG_SIZE = 256
+MAX_CHANGED_IDS = 1000
+
+# JSON strings and brackets; enough to walk an object without decoding its values
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_COLON = re.compile(r'\s*:\s*')
+_SPACE = re.compile(r'\s*')
+_SEPARATOR = re.compile(r'[\s,]*')
+_SHARD_PREFIX = re.compile(r'\{\s*"scenarios"\s*:\s*\[')
+_decoder = json.JSONDecoder()
+
+
+class CorpusError(Exception):
+    """Exception raised for unreadable or malformed corpus files"""
+    def __init__(self, message: str, path: Optional[str] = None):
+        self.message = message
+        self.path = path
+        super().__init__(self.message)
+
+
+def extract_scenarios(data: Any) -> List[Dict]:
+    """Return the scenarios contained in a parsed JSON document
+
+    Args:
+        data (Any): Parsed JSON document
+
+    Returns:
+        List[Dict]: Scenario dictionaries (empty if the document is not a scenario file)
+    """
+    if isinstance(data, dict):
+        if isinstance(data.get('scenarios'), list):
+            return [s for s in data['scenarios'] if isinstance(s, dict)]
+        if 'negotiationId' in data and 'topic' in data:
+            return [data]
+    return []
+
+
+def _is_scenario_entry(entry: os.DirEntry) -> bool:
+    return (entry.is_file() and entry.name.endswith(SCENARIO_EXTENSIONS)
+            and entry.name not in EXCLUDED_FILES)
+
+
+def scenario_files(root: str) -> List[str]:
+    """List the candidate scenario files directly under a directory, sorted by name
+
+    Args:
+        root (str): Directory to scan
+
+    Returns:
+        List[str]: Paths of .json and NDJSON files, without known non-scenario files
+    """
+    with os.scandir(root) as it:
+        return sorted(entry.path for entry in it if _is_scenario_entry(entry))
+
+
+def scenario_id(path: str, index: int) -> str:
+    """Build a stable scenario id from its file and position
+
+    negotiationId values produced by the model are not unique (many files
+    share "ABCD1234"), so the file name is used instead. It keeps its extension,
+    since a .json and an .ndjson file may share a stem.
+
+    Args:
+        path (str): Path of the file holding the scenario
+        index (int): Position of the scenario inside the file
+
+    Returns:
+        str: Scenario id in the form <file name>.<index>
+    """
+    return f"{os.path.basename(path)}.{index}"
+
+
+def load_scenario_file(path: str, migrate_records: bool = True) -> List[Dict]:
+    """Load every scenario stored in a file
+
+    Args:
+        path (str): Scenario file path
+        migrate_records (bool): Upgrade records to the current schema version
+
+    Returns:
+        List[Dict]: Scenarios in file order
+
+    Raises:
+        CorpusError: If the file cannot be read or parsed
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith(NDJSON_EXTENSIONS):
+                scenarios = []
+                for line in f:
+                    if line.strip():
+                        scenarios.extend(extract_scenarios(json.loads(line)))
+            else:
+                scenarios = extract_scenarios(json.load(f))
+    except (IOError, OSError) as e:
+        raise CorpusError(f"Cannot read {path}: {str(e)}", path)
+    except json.JSONDecodeError as e:
+        raise CorpusError(f"Invalid JSON in {path}: {str(e)}", path)
+    if migrate_records:
+        scenarios, _ = migrate_all(scenarios)
+    return scenarios
+
+
+def summarize_scenario(scenario: Dict) -> Dict:
+    """Pick the fields needed for listings out of a full scenario"""
+    topic = scenario.get('topic') or {}
+    return {
+        'negotiationId': scenario.get('negotiationId'),
+        'title': topic.get('title'),
+        'industry': topic.get('industry'),
+    }
+
+
+def _member(text: str, pos: int, key: str) -> Optional[int]:
+    """Find a key of the JSON object starting at pos without decoding other members
+
+    Returns:
+        Optional[int]: Position of the key's value, or None if the key is absent
+    """
+    depth = 0
+    for match in _TOKEN.finditer(text, pos):
+        token = match.group()
+        if token[0] != '"':
+            depth += 1 if token in '{[' else -1
+            if depth == 0:
+                return None
+        elif depth == 1:
+            colon = _COLON.match(text, match.end())
+            if colon and (json.loads(token) if '\\' in token else token[1:-1]) == key:
+                return colon.end()
+    return None
+
+
+def _object_end(text: str, pos: int) -> int:
+    """Return the position after the "}" closing the object that pos is inside of"""
+    depth = 1
+    for match in _TOKEN.finditer(text, pos):
+        token = match.group()
+        if token[0] != '"':
+            depth += 1 if token in '{[' else -1
+            if depth == 0:
+                return match.end()
+    raise ValueError("Unterminated JSON object")
+
+
+def scenario_spans(data: bytes) -> List[Tuple[int, int, bool]]:
+    """Locate the scenarios of a file
+
+    Each scenario is parsed once to check it and then dropped. The bytes are
+    decoded as Latin-1 so character positions are byte positions; JSON syntax
+    is ASCII and UTF-8 multi-byte sequences never contain quotes or brackets.
+
+    Args:
+        data (bytes): File contents ({"scenarios": [...]}, a bare scenario or NDJSON)
+
+    Returns:
+        List[Tuple[int, int, bool]]: (start, end, needs migration) byte ranges in file order
+
+    Raises:
+        ValueError: If the file is not valid JSON
+    """
+    text = data.decode('latin-1')
+    spans = []
+    pos = _SPACE.match(text).end()
+    while pos < len(text):
+        members = None
+        shard = _SHARD_PREFIX.match(text, pos)
+        if shard:
+            members = shard.end() - 1
+        else:
+            document, end = _decoder.raw_decode(text, pos)
+            if isinstance(document, dict) and isinstance(document.get('scenarios'), list):
+                members = _member(text, pos, 'scenarios')
+            elif extract_scenarios(document):
+                spans.append((pos, end, needs_migration(document)))
+
+        if members is not None:
+            pos = members + 1
+            while True:
+                pos = _SEPARATOR.match(text, pos).end()
+                if text.startswith(']', pos):
+                    break
+                scenario, stop = _decoder.raw_decode(text, pos)
+                if isinstance(scenario, dict):
+                    spans.append((pos, stop, needs_migration(scenario)))
+                pos = stop
+            if shard:
+                end = _object_end(text, pos + 1)
+        pos = _SPACE.match(text, end).end()
+    return spans
+
+
+class MappedFiles:
+    """Read-only memory maps of scenario files, shared by the views of an index
+
+    At most max_open files stay mapped; the least recently read is closed
+    first. Writers replace files (os.replace) or append to them, so a mapping
+    never sees its bytes change underneath it.
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_MAPS):
+        self.max_open = max_open
+        self._maps: 'OrderedDict[str, Tuple[int, mmap.mmap]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, path: str, mtime_ns: int, start: int, end: int) -> bytes:
+        """Return bytes start:end of a file as it was at mtime_ns
+
+        Raises:
+            CorpusError: If the file cannot be mapped or changed since it was indexed
+        """
+        with self._lock:
+            cached = self._maps.get(path)
+            if cached is None or cached[0] != mtime_ns:
+                if cached is not None:
+                    cached[1].close()
+                    del self._maps[path]
+                cached = (mtime_ns, self._open(path, mtime_ns))
+                self._maps[path] = cached
+                while len(self._maps) > self.max_open:
+                    _, (_, oldest) = self._maps.popitem(last=False)
+                    oldest.close()
+            self._maps.move_to_end(path)
+            return cached[1][start:end]
+
+    @staticmethod
+    def _open(path: str, mtime_ns: int) -> mmap.mmap:
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_mtime_ns != mtime_ns:
+                    raise CorpusError(f"{path} changed since it was indexed", path)
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError) as e:
+            raise CorpusError(f"Cannot map {path}: {str(e)}", path)
+
+    def close(self):
+        with self._lock:
+            for _, mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+class ScenarioFile:
+    """An indexed scenario file, shared by the views of its scenarios"""
+    __slots__ = ('path', 'mtime_ns', 'maps')
+
+    def __init__(self, path: str, mtime_ns: int, maps: MappedFiles):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.maps = maps
+
+
+class ScenarioView:
+    """Read-only view of one stored scenario
+
+    Holds only where the record lives. Fields are decoded when accessed,
+    walking just the keys on their path, and load() parses the full record.
+    Records older than the current schema version are always read through
+    load(), so every value returned is migrated; the migrated record is kept
+    on the view until its file changes or is compacted.
+    """
+    __slots__ = ('file', 'index', 'start', 'end', 'stale', 'migrated')
+
+    def __init__(self, file: ScenarioFile, index: int, start: int, end: int, stale: bool = False):
+        self.file = file
+        self.index = index
+        self.start = start
+        self.end = end
+        self.stale = stale
+        self.migrated: Optional[Dict] = None
+
+    @property
+    def id(self) -> str:
+        return scenario_id(self.file.path, self.index)
+
+    @property
+    def path(self) -> str:
+        return self.file.path
+
+    @property
+    def mtime_ns(self) -> int:
+        return self.file.mtime_ns
+
+    def raw(self) -> bytes:
+        """Return the stored JSON bytes of the record"""
+        return self.file.maps.read(self.file.path, self.file.mtime_ns, self.start, self.end)
+
+    def _text(self) -> str:
+        try:
+            return self.raw().decode('utf-8')
+        except UnicodeDecodeError as e:
+            raise CorpusError(f"Invalid UTF-8 in {self.file.path}: {str(e)}", self.file.path)
+
+    def load(self) -> Dict:
+        """Parse the full record, migrated to the current schema version
+
+        Raises:
+            CorpusError: If the record cannot be read or parsed
+        """
+        if self.migrated is not None:
+            return self.migrated
+        try:
+            scenario = json.loads(self._text())
+        except json.JSONDecodeError as e:
+            raise CorpusError(f"Invalid JSON in {self.file.path}: {str(e)}", self.file.path)
+        if not self.stale:
+            return scenario
+        self.migrated = migrate(scenario)
+        return self.migrated
+
+    def get(self, *keys: str, default: Any = None) -> Any:
+        """Decode the value at a key path, e.g. view.get('topic', 'title')
+
+        Raises:
+            CorpusError: If the record cannot be read or parsed
+        """
+        if self.stale:
+            value = self.load()
+            for key in keys:
+                if not isinstance(value, dict) or key not in value:
+                    return default
+                value = value[key]
+            return value
+        text = self._text()
+        pos = 0
+        try:
+            for key in keys:
+                if not text.startswith('{', pos):
+                    return default
+                pos = _member(text, pos, key)
+                if pos is None:
+                    return default
+            return _decoder.raw_decode(text, pos)[0]
+        except json.JSONDecodeError as e:
+            raise CorpusError(f"Invalid JSON in {self.file.path}: {str(e)}", self.file.path)
+
+    def __getitem__(self, key: str) -> Any:
+        missing = object()
+        value = self.get(key, default=missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+    @property
+    def title(self) -> Optional[str]:
+        return self.get('topic', 'title')
+
+    @property
+    def industry(self) -> Optional[str]:
+        return self.get('topic', 'industry')
+
+    @property
+    def negotiation_id(self) -> Optional[str]:
+        return self.get('negotiationId')
+
+    def summary(self) -> Dict:
+        """Return the listing fields, like summarize_scenario"""
+        topic = self.get('topic') or {}
+        if not isinstance(topic, dict):
+            topic = {}
+        return {
+            'negotiationId': self.negotiation_id,
+            'title': topic.get('title'),
+            'industry': topic.get('industry'),
+        }
+
+    def __repr__(self) -> str:
+        return f"ScenarioView({self.id!r}, bytes {self.start}:{self.end})"
+
+
+def index_file(path: str, mtime_ns: int, maps: MappedFiles) -> List[ScenarioView]:
+    """Build views of the scenarios stored in a file
+
+    Raises:
+        CorpusError: If the file cannot be read or parsed
+    """
+    try:
+        with open(path, 'rb') as f:
+            spans = scenario_spans(f.read())
+    except (IOError, OSError) as e:
+        raise CorpusError(f"Cannot read {path}: {str(e)}", path)
+    except ValueError as e:
+        raise CorpusError(f"Invalid JSON in {path}: {str(e)}", path)
+    source = ScenarioFile(path, mtime_ns, maps)
+    return [ScenarioView(source, i, start, end, stale) for i, (start, end, stale) in enumerate(spans)]
+
+
+def diff_views(path: str, old: List[ScenarioView], new: List[ScenarioView],
+               appended: bool) -> Tuple[List[str], List[str], List[str]]:
+    """Compare the scenarios of one file before and after it changed
+
+    Records are matched by position, which is what their ids are made of. A
+    record with the same byte range and schema state is only taken as
+    unchanged when the file grew (records were appended); after any other
+    rewrite every record still present counts as updated.
+
+    Returns:
+        Tuple[List[str], List[str], List[str]]: Added, updated and removed ids
+    """
+    updated = [
+        scenario_id(path, i) for i, (before, after) in enumerate(zip(old, new))
+        if not appended or (before.start, before.end, before.stale) != (after.start, after.end, after.stale)
+    ]
+    added = [scenario_id(path, i) for i in range(len(old), len(new))]
+    removed = [scenario_id(path, i) for i in range(len(new), len(old))]
+    return added, updated, removed
+
+
+class ScenarioIndex:
+    """Index of the scenarios stored under a data root
+
+    Scenarios are held as ScenarioView objects (a few integers each) over
+    memory-mapped files. Full scenarios are parsed on demand from their own
+    byte range, with a small LRU of recently used records that also caches
+    migrated results. Files are ordered by age when first seen and keep
+    their place when they change, so new scenarios are appended.
+    """
+
+    def __init__(self, root: str = '.', refresh_interval: float = 2.0, scenario_cache_size: int = 256,
+                 max_open_maps: int = MAX_OPEN_MAPS):
+        self.root = os.path.abspath(root)
+        self.refresh_interval = refresh_interval
+        self.scenario_cache_size = scenario_cache_size
+        self.version = 0
+        self._lock = threading.RLock()
+        self._maps = MappedFiles(max_open_maps)
+        self._files: Dict[str, Tuple[int, int, List[ScenarioView]]] = {}
+        self._entries: List[ScenarioView] = []
+        self._by_name: Dict[str, List[ScenarioView]] = {}
+        # File name -> index in views() order of its first scenario
+        self._offsets: Dict[str, int] = {}
+        self._scenario_cache: 'OrderedDict[Tuple[str, int, int], Dict]' = OrderedDict()
+        # (version, (added, updated, removed) or None when too much changed)
+        self._changes: 'deque[Tuple[int, Optional[Tuple[List[str], List[str], List[str]]]]]' = deque(
+            maxlen=CHANGE_LOG_SIZE)
+        self._last_refresh = 0.0
+
+    def _scan(self) -> List[os.DirEntry]:
+        """List candidate scenario files, oldest first so new files append"""
+        with os.scandir(self.root) as it:
+            candidates = [entry for entry in it if _is_scenario_entry(entry)]
+        candidates.sort(key=lambda e: (e.stat().st_mtime_ns, e.name))
+        return candidates
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rescan the data root and re-index changed files
+
+        Args:
+            force (bool): Ignore the refresh interval
+
+        Returns:
+            bool: True if the corpus changed since the last refresh
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._entries and now - self._last_refresh < self.refresh_interval:
+                return False
+            self._last_refresh = now
+
+            changed = False
+            added, updated, removed = [], [], []
+            scanned = {entry.path: entry for entry in self._scan()}
+            files = {}
+            for path in [p for p in self._files if p in scanned] + [p for p in scanned if p not in self._files]:
+                stat = scanned[path].stat()
+                cached = self._files.get(path)
+                if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                    files[path] = cached
+                    continue
+                try:
+                    views = index_file(path, stat.st_mtime_ns, self._maps)
+                except CorpusError as e:
+                    logger.warning(e.message)
+                    views = []
+                files[path] = (stat.st_mtime_ns, stat.st_size, views)
+                changed = True
+                if self.version:
+                    file_added, file_updated, file_removed = diff_views(
+                        path, cached[2] if cached else [], views, bool(cached) and stat.st_size > cached[1])
+                    added.extend(file_added)
+                    updated.extend(file_updated)
+                    removed.extend(file_removed)
+            for path in self._files.keys() - scanned.keys():
+                removed.extend(view.id for view in self._files[path][2])
+                changed = True
+
+            if changed or not self._entries:
+                entries = []
+                by_name = {}
+                offsets = {}
+                for path, (_, _, views) in files.items():
+                    if views:
+                        by_name[os.path.basename(path)] = views
+                        offsets[os.path.basename(path)] = len(entries)
+                    entries.extend(views)
+                self._files = files
+                self._entries = entries
+                self._by_name = by_name
+                self._offsets = offsets
+                if changed:
+                    self.version += 1
+                    # The first scan is not a change anyone was shown
+                    if self.version > 1:
+                        too_many = len(added) + len(updated) + len(removed) > MAX_CHANGED_IDS
+                        self._changes.append((self.version, None if too_many else (added, updated, removed)))
+            return changed
+
+    def changes(self, since: int) -> Optional[Dict[str, Any]]:
+        """Return the scenario ids added, updated and removed after a version
+
+        Args:
+            since (int): Index version the caller last saw
+
+        Returns:
+            Optional[Dict[str, Any]]: 'added', 'updated' and 'removed' ids (empty if nothing
+            changed) and the current 'version', or None if those changes are no longer known
+        """
+        self.refresh()
+        with self._lock:
+            if since > self.version or (since < self.version and (
+                    not self._changes or self._changes[0][0] > since + 1)):
+                return None
+            added, updated, removed = {}, {}, {}
+            for version, change in self._changes:
+                if version <= since:
+                    continue
+                if change is None:
+                    return None
+                for sid in change[0]:
+                    # Removed earlier and back again: the caller still shows the old record
+                    if removed.pop(sid, False):
+                        updated[sid] = True
+                    else:
+                        added[sid] = True
+                for sid in change[1]:
+                    if sid not in added:
+                        updated[sid] = True
+                for sid in change[2]:
+                    if added.pop(sid, False):
+                        continue
+                    updated.pop(sid, None)
+                    removed[sid] = True
+            return {'version': self.version, 'added': list(added), 'updated': list(updated),
+                    'removed': list(removed)}
+
+    def position(self, sid: str) -> Optional[int]:
+        """Return the index of a scenario in views() order, or None if unknown"""
+        self.refresh()
+        name, _, index = sid.rpartition('.')
+        with self._lock:
+            views = self._by_name.get(name)
+            if views is None or not index.isdigit() or int(index) >= len(views):
+                return None
+            return self._offsets[name] + int(index)
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._entries)
+
+    def _load_cached(self, view: ScenarioView) -> Dict:
+        """Parse a scenario through the LRU keyed by file, modification time and position"""
+        key = (view.path, view.mtime_ns, view.index)
+        with self._lock:
+            if key in self._scenario_cache:
+                self._scenario_cache.move_to_end(key)
+                return self._scenario_cache[key]
+        scenario = view.load()
+        with self._lock:
+            self._scenario_cache[key] = scenario
+            while len(self._scenario_cache) > self.scenario_cache_size:
+                self._scenario_cache.popitem(last=False)
+        return scenario
+
+    def views(self) -> List[ScenarioView]:
+        """Return a view of every indexed scenario, in index order"""
+        self.refresh()
+        return list(self._entries)
+
+    def view(self, sid: str) -> Optional[ScenarioView]:
+        """Return the view of a scenario by id, or None if unknown"""
+        self.refresh()
+        name, _, index = sid.rpartition('.')
+        views = self._by_name.get(name)
+        if views is None or not index.isdigit() or int(index) >= len(views):
+            return None
+        return views[int(index)]
+
+    def entries(self) -> List[Dict]:
+        """Return the summaries of every indexed scenario
+
+        Each summary decodes a few fields of its record; prefer views() for
+        large corpora.
+        """
+        return [dict(view.summary(), id=view.id, path=view.path, index=view.index, mtime_ns=view.mtime_ns)
+                for view in self.views()]
+
+    def files(self) -> List[str]:
+        """Return the names of the indexed files that hold scenarios"""
+        self.refresh()
+        return [os.path.basename(path) for path, (_, _, views) in self._files.items() if views]
+
+    def file_versions(self) -> List[Tuple[str, int]]:
+        """Return (path, mtime_ns) of the indexed files that hold scenarios, in index order"""
+        self.refresh()
+        return [(path, mtime_ns) for path, (mtime_ns, _, views) in self._files.items() if views]
+
+    def get(self, sid: str) -> Optional[Dict]:
+        """Return a full scenario by id, or None if unknown"""
+        view = self.view(sid)
+        if view is None:
+            return None
+        try:
+            return self._load_cached(view)
+        except CorpusError as e:
+            logger.warning(e.message)
+            return None
+
+    def page(self, offset: int = 0, limit: int = 50) -> Tuple[int, List[Dict]]:
+        """Return one page of full scenarios
+
+        Args:
+            offset (int): Index of the first scenario
+            limit (int): Maximum number of scenarios to return
+
+        Returns:
+            Tuple[int, List[Dict]]: Total scenario count and the page items
+        """
+        self.refresh()
+        entries = self._entries
+        items = []
+        for view in entries[offset:offset + limit]:
+            try:
+                items.append({'id': view.id, 'scenario': self._load_cached(view)})
+            except CorpusError as e:
+                logger.warning(e.message)
+        return len(entries), items
@@ -0,0 +1,340 @@
+"""
+Dead-letter queue for batch generation
+- Items that fail every attempt are appended to dead_letters.ndjson (DEAD_LETTER_FILE)
+  with their prompt, seed, last raw model response and validation errors, and the
+  batch goes on with the next item
+- `python deadletter.py list` shows the pending letters
+- `python deadletter.py replay` reprocesses them, optionally with other models
+  (--models, e.g. a larger one) or by repairing the stored response (--repair)
+- The file is append-only: replay outcomes are added as records, never rewritten
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import ValidationError as PydanticValidationError
+
+from ollama_runtime import parse_models, positive_int
+
+logger = logging.getLogger('deadletter')
+
+DEAD_LETTER_PATH = os.environ.get('DEAD_LETTER_FILE', 'dead_letters.ndjson')
+WORKLOADS = ('negotiation', 'character')
+MAX_VALIDATION_ERRORS = 20
+MAX_RAW_RESPONSE_CHARS = 200000
+
+
+class DeadLetterError(Exception):
+    """Exception raised when a dead letter cannot be stored or replayed"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output for the replay tool"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console_handler)
+
+
+def validation_errors(raw_response: Optional[str], schema_model: Optional[type]) -> List[str]:
+    """List why a raw response fails a Pydantic model, as "field.path: message" lines"""
+    if not raw_response or schema_model is None:
+        return []
+    try:
+        schema_model.model_validate_json(raw_response)
+    except PydanticValidationError as e:
+        return [f"{'.'.join(str(part) for part in error['loc']) or '(root)'}: {error['msg']}"
+                for error in e.errors()[:MAX_VALIDATION_ERRORS]]
+    except ValueError as e:
+        return [str(e)]
+    return []
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat()
+
+
+class DeadLetterQueue:
+    """Append-only NDJSON file of failed items and their replay outcomes"""
+
+    def __init__(self, path: str = DEAD_LETTER_PATH):
+        self.path = path
+        self.added = 0
+        self._lock = threading.Lock()
+
+    def _append(self, record: Dict):
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        except (IOError, OSError) as e:
+            raise DeadLetterError(f"Cannot write {self.path}: {str(e)}")
+
+    def add(self, workload: str, error: Exception, prompt: str, item: Optional[int] = None,
+            seed: Optional[Dict] = None, models: Optional[List[str]] = None, compact_keys: bool = False,
+            attempts: int = 0, schema_model: Optional[type] = None) -> str:
+        """Record a failed item
+
+        The last raw response is taken from the error (raw_content), as set by
+        the generators' parse functions.
+
+        Args:
+            workload (str): negotiation or character
+            error (Exception): Error of the last attempt
+            prompt (str): Prompt instructions the item was generated with
+            item (Optional[int]): Position of the item in its batch
+            seed (Optional[Dict]): Diversity seed of the item
+            models (Optional[List[str]]): Model cascade used
+            compact_keys (bool): Whether short JSON keys were requested
+            attempts (int): Attempts spent on the item
+            schema_model (Optional[type]): Model the raw response is checked against
+
+        Returns:
+            str: Id of the new letter
+        """
+        raw_response = getattr(error, 'raw_content', None)
+        letter_id = uuid.uuid4().hex[:12]
+        self._append({
+            'kind': 'letter',
+            'id': letter_id,
+            'workload': workload,
+            'created': _now(),
+            'item': item,
+            'prompt': prompt,
+            'seed': seed,
+            'models': models,
+            'compact_keys': compact_keys,
+            'attempts': attempts,
+            'error': getattr(error, 'message', str(error)),
+            'error_type': getattr(error, 'error_type', type(error).__name__),
+            'raw_response': raw_response[:MAX_RAW_RESPONSE_CHARS] if raw_response else None,
+            'validation_errors': validation_errors(raw_response, schema_model),
+        })
+        self.added += 1
+        return letter_id
+
+    def resolve(self, letter_id: str, output: Optional[str], models: List[str], repaired: bool):
+        """Record a successful replay"""
+        self._append({'kind': 'replayed', 'id': letter_id, 'at': _now(), 'output': output,
+                      'models': models, 'repaired': repaired})
+
+    def replay_failed(self, letter_id: str, error: Exception):
+        """Record a failed replay; the letter stays pending"""
+        self._append({'kind': 'replay_failed', 'id': letter_id, 'at': _now(),
+                      'error': getattr(error, 'message', str(error))})
+
+    def records(self) -> Iterator[Dict]:
+        """Yield every record of the file, skipping unreadable lines"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping unreadable line {number} of {self.path}")
+        except (IOError, OSError) as e:
+            raise DeadLetterError(f"Cannot read {self.path}: {str(e)}")
+
+    def letters(self, include_replayed: bool = False) -> List[Dict]:
+        """Return the letters with their status (pending or replayed) and failed replays"""
+        letters: Dict[str, Dict] = {}
+        for record in self.records():
+            letter = letters.get(record.get('id'))
+            if record.get('kind') == 'letter':
+                letters[record['id']] = dict(record, status='pending', replay_failures=0)
+            elif letter is not None and record.get('kind') == 'replayed':
+                letter.update(status='replayed', output=record.get('output'))
+            elif letter is not None and record.get('kind') == 'replay_failed':
+                letter['replay_failures'] += 1
+                letter['last_replay_error'] = record.get('error')
+        return [letter for letter in letters.values() if include_replayed or letter['status'] == 'pending']
+
+
+def replay_negotiation(letter: Dict, models: List[str], repair: bool,
+                       attempt_timeout: Optional[float], output: str) -> Dict:
+    """Reprocess a failed scenario and save it
+
+    With repair, only the invalid sections of the stored response are
+    regenerated; if that is not possible the scenario is generated again.
+
+    Returns:
+        Dict: Output file and whether the stored response was repaired
+    """
+    import negotiationgen
+    request_options = dict(attempt_timeout=attempt_timeout or negotiationgen.DEFAULT_ATTEMPT_TIMEOUT,
+                           deadlines=(), cancel_event=None, hedge=None,
+                           options=negotiationgen.inference_profile.options('negotiation'))
+    scenario = None
+    if repair and letter.get('raw_response'):
+        try:
+            scenario = negotiationgen.repair_draft(letter['raw_response'], models, **request_options)
+        except negotiationgen.NegotiationGenError as e:
+            logger.info(f"Repair of {letter['id']} failed, generating again: {e.message}")
+    repaired = scenario is not None
+    if scenario is None:
+        scenario = negotiationgen.generate_negotiation(
+            letter['prompt'], models=models, compact_keys=bool(letter.get('compact_keys')),
+            attempt_timeout=request_options['attempt_timeout']
+        )
+    negotiationgen.validate_negotiation(scenario)
+    os.makedirs(output, exist_ok=True)
+    return {'output': negotiationgen.save_scenario(scenario, output), 'repaired': repaired}
+
+
+def replay_character(letter: Dict, models: List[str], repair: bool,
+                     attempt_timeout: Optional[float]) -> Dict:
+    """Reprocess a failed character
+
+    Returns:
+        Dict: The character and whether the stored response was repaired
+    """
+    import charactergen
+    request_options = dict(attempt_timeout=attempt_timeout or charactergen.DEFAULT_ATTEMPT_TIMEOUT,
+                           deadlines=(), cancel_event=None, hedge=None,
+                           options=charactergen.inference_profile.options('character'))
+    character = None
+    if repair and letter.get('raw_response'):
+        try:
+            character = charactergen.repair_character(letter['raw_response'], letter.get('validation_errors') or [],
+                                                      models, **request_options)
+        except charactergen.CharacterGenError as e:
+            logger.info(f"Repair of {letter['id']} failed, generating again: {e.message}")
+    repaired = character is not None
+    if character is None:
+        character = charactergen.generate_character(
+            letter['prompt'], models=models, compact_keys=bool(letter.get('compact_keys')),
+            attempt_timeout=request_options['attempt_timeout']
+        )
+    charactergen.validate_character(character)
+    return {'character': character, 'repaired': repaired}
+
+
+def replay(queue: DeadLetterQueue, letters: List[Dict], models: Optional[List[str]] = None,
+           repair: bool = False, attempt_timeout: Optional[float] = None, output: str = '.') -> Counter:
+    """Reprocess letters one by one; a failing letter does not stop the others
+
+    Args:
+        queue (DeadLetterQueue): Queue the outcomes are recorded in
+        letters (List[Dict]): Pending letters to replay
+        models (Optional[List[str]]): Model cascade (default: the one each letter used)
+        repair (bool): Repair stored responses before generating again
+        attempt_timeout (Optional[float]): Seconds per request (default: the generator's)
+        output (str): Directory for replayed scenarios and characters
+
+    Returns:
+        Counter: replayed, repaired and failed counts
+    """
+    counts = Counter()
+    characters = []
+    for letter in letters:
+        letter_models = models or letter.get('models')
+        try:
+            if letter.get('workload') == 'character':
+                import charactergen
+                letter_models = letter_models or charactergen.DEFAULT_MODELS
+                result = replay_character(letter, letter_models, repair, attempt_timeout)
+                characters.append((letter, result))
+                counts['repaired' if result['repaired'] else 'replayed'] += 1
+                continue
+            import negotiationgen
+            letter_models = letter_models or negotiationgen.DEFAULT_MODELS
+            result = replay_negotiation(letter, letter_models, repair, attempt_timeout, output)
+        except Exception as e:
+            counts['failed'] += 1
+            queue.replay_failed(letter['id'], e)
+            logger.error(f"Replay of {letter['id']} ({letter.get('workload')}) failed: {getattr(e, 'message', e)}")
+            continue
+        counts['repaired' if result['repaired'] else 'replayed'] += 1
+        queue.resolve(letter['id'], result['output'], letter_models, result['repaired'])
+        logger.info(f"Replayed {letter['id']} -> {result['output']}{' (repaired)' if result['repaired'] else ''}")
+
+    if characters:
+        import charactergen
+        os.makedirs(output, exist_ok=True)
+        filename = charactergen.save_characters([result['character'] for _, result in characters], "_replayed", output)
+        for letter, result in characters:
+            queue.resolve(letter['id'], filename, models or letter.get('models') or charactergen.DEFAULT_MODELS,
+                          result['repaired'])
+        logger.info(f"Replayed {len(characters)} characters -> {filename}")
+    return counts
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Inspect and replay failed generation items")
+    parser.add_argument('--file', default=DEAD_LETTER_PATH, help="Dead-letter file (DEAD_LETTER_FILE)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    list_cmd = sub.add_parser('list', help="Show pending dead letters")
+    list_cmd.add_argument('--all', action='store_true', help="Include replayed letters")
+    replay_cmd = sub.add_parser('replay', help="Reprocess pending dead letters")
+    replay_cmd.add_argument('ids', nargs='*', help="Letters to replay (default: all pending)")
+    replay_cmd.add_argument('--workload', choices=WORKLOADS, help="Only replay this workload")
+    replay_cmd.add_argument('--models', type=parse_models, default=None,
+                            help="Comma-separated model cascade to use instead of the original one")
+    replay_cmd.add_argument('--repair', action='store_true',
+                            help="Fix the stored response (invalid sections only) before generating again")
+    replay_cmd.add_argument('--limit', type=positive_int, default=None, help="Replay at most this many letters")
+    replay_cmd.add_argument('--attempt-timeout', type=float, default=None, help="Seconds per request")
+    replay_cmd.add_argument('--output', default='.', help="Directory for replayed items")
+    args = parser.parse_args()
+
+    setup_logging()
+    queue = DeadLetterQueue(args.file)
+    try:
+        if args.command == 'list':
+            letters = queue.letters(include_replayed=args.all)
+            for letter in letters:
+                errors = letter.get('validation_errors') or []
+                logger.info(
+                    f"{letter['id']}  {letter['workload']:<11} {letter['status']:<8} {letter['created'][:19]}  "
+                    f"{letter['error_type']}: {(letter['error'].splitlines() or [''])[0][:100]}"
+                    + (f" ({len(errors)} validation errors)" if errors else '')
+                    + (f" [{letter['replay_failures']} failed replays]" if letter['replay_failures'] else '')
+                )
+            logger.info(f"{len(letters)} {'letters' if args.all else 'pending letters'} in {args.file}")
+            sys.exit(0)
+
+        letters = queue.letters()
+        if args.ids:
+            unknown = set(args.ids) - {letter['id'] for letter in letters}
+            if unknown:
+                logger.error(f"Not pending: {', '.join(sorted(unknown))}")
+                sys.exit(1)
+            letters = [letter for letter in letters if letter['id'] in args.ids]
+        if args.workload:
+            letters = [letter for letter in letters if letter['workload'] == args.workload]
+        letters = letters[:args.limit]
+        if not letters:
+            logger.info("No pending dead letters")
+            sys.exit(0)
+        logger.info(f"Replaying {len(letters)} dead letters"
+                    + (f" with {', '.join(args.models)}" if args.models else '')
+                    + (" (repair first)" if args.repair else ''))
+        counts = replay(queue, letters, args.models, args.repair, args.attempt_timeout, args.output)
+        logger.info(f"Replay completed: {json.dumps(counts)}")
+        sys.exit(1 if counts['failed'] else 0)
+
+    except DeadLetterError as e:
+        logger.error(e.message)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        logger.info("\nReplay cancelled by user.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
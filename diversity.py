@@ -0,0 +1,331 @@
+"""
+Diversity-aware topic seeds for negotiation generation
+- Classifies scenarios by industry, deal type, party archetypes and overall approach
+- Counts what the corpus already covers and draws each request's topic seed from the
+  least covered combinations (industry x deal type cells weigh most)
+- Flags near-duplicate scenarios (title/description word overlap within the same cell)
+- Reports unique validated scenarios per compute-hour as the yield metric
+- `python diversity.py report [root]` shows the coverage gaps and the next seeds
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger('diversity')
+
+# Coverage plan: value -> lower-case keywords that identify it in stored scenarios
+INDUSTRIES: Dict[str, Tuple[str, ...]] = {
+    'pharmaceuticals': ('pharma', 'drug', 'biotech'),
+    'healthcare': ('health', 'hospital', 'medical', 'clinic'),
+    'manufacturing': ('manufactur', 'industrial', 'factory', 'equipment'),
+    'software': ('software', 'saas', 'technology', 'tech ', 'information technology'),
+    'retail': ('retail', 'e-commerce', 'ecommerce', 'consumer goods'),
+    'logistics': ('logistic', 'shipping', 'freight', 'transport', 'supply chain'),
+    'energy': ('energy', 'oil', 'gas', 'solar', 'utilit', 'renewable'),
+    'construction': ('construction', 'real estate', 'property', 'building'),
+    'finance': ('financ', 'bank', 'insurance', 'investment', 'fintech'),
+    'agriculture': ('agri', 'farm', 'food production'),
+    'hospitality': ('hospitality', 'hotel', 'restaurant', 'tourism', 'travel'),
+    'media': ('media', 'entertainment', 'publishing', 'film', 'music', 'gaming'),
+    'education': ('education', 'university', 'school', 'training'),
+    'public sector': ('government', 'public sector', 'municipal', 'defense'),
+    'telecommunications': ('telecom', 'wireless', 'network'),
+    'automotive': ('automotive', 'vehicle', 'car maker'),
+    'nonprofit': ('nonprofit', 'non-profit', 'charity', 'ngo'),
+    'sports': ('sport', 'athlet', 'league'),
+}
+DEAL_TYPES: Dict[str, Tuple[str, ...]] = {
+    'acquisition': ('acqui', 'merger', 'buyout', 'purchase of'),
+    'supply contract': ('supply', 'supplier', 'procurement', 'raw material', 'sale of'),
+    'licensing': ('licens', 'royalt', 'intellectual property', 'patent'),
+    'partnership': ('partnership', 'alliance', 'joint venture', 'collaboration'),
+    'employment': ('salary', 'employment', 'hiring', 'compensation', 'union', 'labor', 'labour'),
+    'lease': ('lease', 'rent', 'tenan'),
+    'services': ('service agreement', 'outsourc', 'consulting', 'services contract', 'maintenance'),
+    'distribution': ('distribut', 'reseller', 'franchise', 'client', 'customer'),
+    'dispute settlement': ('dispute', 'settlement', 'claim', 'breach', 'disruption'),
+    'investment': ('funding', 'investment round', 'equity', 'financing', 'loan'),
+}
+ARCHETYPES: Dict[str, Tuple[str, ...]] = {
+    'startup founder': ('founder', 'startup', 'start-up'),
+    'procurement manager': ('procurement', 'purchasing', 'buyer'),
+    'sales executive': ('sales', 'account manager', 'business development'),
+    'chief executive': ('ceo', 'chief executive', 'president', 'owner', 'managing director'),
+    'legal counsel': ('legal', 'counsel', 'attorney', 'lawyer'),
+    'finance director': ('cfo', 'finance', 'treasur', 'controller'),
+    'union representative': ('union', 'labor', 'worker representative'),
+    'government official': ('government', 'official', 'regulator', 'minister', 'agency'),
+    'investor': ('investor', 'venture', 'private equity', 'fund'),
+    'operations manager': ('operations', 'supply chain', 'logistics', 'plant manager'),
+}
+
+# Candidate seeds sampled per draw, and the weight of an industry x deal type cell
+CANDIDATES_PER_DRAW = 64
+CELL_WEIGHT = 4
+# Word-set overlap at which two scenarios of the same cell count as duplicates
+DUPLICATE_SIMILARITY = 0.6
+SIGNATURE_WORDS = re.compile(r'[a-z][a-z\-]{3,}')
+STOPWORDS = frozenset({'with', 'from', 'that', 'this', 'between', 'their', 'they', 'will', 'into', 'over',
+                       'agreement', 'negotiation', 'company', 'companies', 'terms', 'parties', 'deal'})
+
+
+def setup_logging():
+    """Configure console output for the report command"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console_handler)
+
+
+def approach_values(strategy_model: Optional[type] = None) -> List[str]:
+    """Allowed overallApproach values, read from the Strategy model
+
+    negotiationgen passes its own Strategy class, so running it as a script
+    does not import it a second time.
+    """
+    from analytics import enum_categories
+    if strategy_model is None:
+        from negotiationgen import Strategy as strategy_model
+    return enum_categories(strategy_model, 'overallApproach')
+
+
+def _match(text: str, plan: Dict[str, Tuple[str, ...]]) -> Optional[str]:
+    text = f" {text.lower()} "
+    for value, keywords in plan.items():
+        if any(keyword in text for keyword in keywords):
+            return value
+    return None
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else ''
+
+
+def classify(scenario: Dict) -> Dict:
+    """Place a scenario in the coverage plan
+
+    Returns:
+        Dict: industry, dealType, archetypes (list) and approach; None where nothing matched
+    """
+    topic = scenario.get('topic') if isinstance(scenario.get('topic'), dict) else {}
+    summary = f"{_text(topic.get('title'))} {_text(topic.get('description'))}"
+    archetypes = []
+    for party in scenario.get('parties') or []:
+        if isinstance(party, dict):
+            archetype = _match(f"{_text(party.get('role'))} {_text(party.get('name'))}", ARCHETYPES)
+            if archetype and archetype not in archetypes:
+                archetypes.append(archetype)
+    strategies = scenario.get('strategies') if isinstance(scenario.get('strategies'), dict) else {}
+    return {
+        'industry': _match(_text(topic.get('industry')), INDUSTRIES) or _match(summary, INDUSTRIES),
+        'dealType': _match(summary, DEAL_TYPES),
+        'archetypes': archetypes,
+        'approach': strategies.get('overallApproach'),
+    }
+
+
+def signature(scenario: Dict) -> FrozenSet[str]:
+    """Content words of the title and description, used for near-duplicate checks"""
+    topic = scenario.get('topic') if isinstance(scenario.get('topic'), dict) else {}
+    text = f"{_text(topic.get('title'))} {_text(topic.get('description'))}".lower()
+    return frozenset(w for w in SIGNATURE_WORDS.findall(text) if w not in STOPWORDS)
+
+
+def seed_prompt(system_prompt: str, seed: Dict) -> str:
+    """Append a topic seed to the generation prompt"""
+    first, second = seed['archetypes']
+    return (
+        f"{system_prompt}\n"
+        "Scenario focus (use this instead of a generic topic):\n"
+        f"- Industry: {seed['industry']}\n"
+        f"- Deal type: {seed['dealType']}\n"
+        f"- Parties: a {first} negotiating with a {second}\n"
+        f"- Overall approach (strategies.overallApproach): {seed['approach']}\n"
+    )
+
+
+class CoverageScheduler:
+    """Draw topic seeds from the least covered parts of the coverage plan
+
+    Counts include seeds that were handed out but not finished yet, so
+    concurrent requests spread over different combinations. Finished items
+    are counted by what the model actually produced, not by their seed.
+    """
+
+    def __init__(self, approaches: Optional[List[str]] = None, rng: Optional[random.Random] = None):
+        self.approaches = approaches or approach_values()
+        self.rng = rng or random.Random()
+        self.counts = {name: Counter() for name in ('industry', 'dealType', 'archetype', 'approach')}
+        self.cells: Counter = Counter()
+        self.signatures: Dict[Tuple, List[FrozenSet[str]]] = defaultdict(list)
+        self.existing = 0
+        self.stats = Counter()
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_corpus(cls, root: str, **kwargs) -> 'CoverageScheduler':
+        """Build a scheduler that knows the scenarios stored under a data root"""
+        from corpus import CorpusError, ScenarioIndex, load_scenario_file
+        scheduler = cls(**kwargs)
+        for path, _ in ScenarioIndex(root).file_versions():
+            try:
+                for scenario in load_scenario_file(path):
+                    scheduler.observe(scenario)
+            except CorpusError as e:
+                logger.warning(e.message)
+        return scheduler
+
+    def _add(self, seed: Dict, delta: int):
+        self.counts['industry'][seed['industry']] += delta
+        self.counts['dealType'][seed['dealType']] += delta
+        self.counts['approach'][seed['approach']] += delta
+        for archetype in seed['archetypes']:
+            self.counts['archetype'][archetype] += delta
+        self.cells[(seed['industry'], seed['dealType'])] += delta
+
+    def _score(self, seed: Dict) -> float:
+        counts = self.counts
+        return (CELL_WEIGHT * self.cells[(seed['industry'], seed['dealType'])]
+                + counts['industry'][seed['industry']]
+                + counts['dealType'][seed['dealType']]
+                + counts['approach'][seed['approach']]
+                + sum(counts['archetype'][a] for a in seed['archetypes']) / 2)
+
+    def _is_duplicate(self, cell: Tuple, words: FrozenSet[str]) -> bool:
+        for other in self.signatures[cell]:
+            union = len(words | other)
+            if union and len(words & other) / union >= DUPLICATE_SIMILARITY:
+                return True
+        return False
+
+    def _count(self, found: Dict, words: FrozenSet[str]) -> bool:
+        """Add a classified scenario to the counts (lock held); True if it is unique"""
+        cell = (found['industry'], found['dealType'])
+        unique = not self._is_duplicate(cell, words)
+        self.signatures[cell].append(words)
+        if found['industry'] and found['dealType']:
+            self.cells[cell] += 1
+        for name in ('industry', 'dealType', 'approach'):
+            if found[name]:
+                self.counts[name][found[name]] += 1
+        for archetype in found['archetypes']:
+            self.counts['archetype'][archetype] += 1
+        return unique
+
+    def observe(self, scenario: Dict):
+        """Count a scenario that is already in the corpus"""
+        found = classify(scenario)
+        words = signature(scenario)
+        with self._lock:
+            self._count(found, words)
+            self.existing += 1
+
+    def next_seed(self) -> Dict:
+        """Return the least covered of a sample of candidate seeds and reserve it"""
+        with self._lock:
+            best = None
+            best_score = None
+            for _ in range(CANDIDATES_PER_DRAW):
+                seed = {
+                    'industry': self.rng.choice(list(INDUSTRIES)),
+                    'dealType': self.rng.choice(list(DEAL_TYPES)),
+                    'archetypes': self.rng.sample(list(ARCHETYPES), 2),
+                    'approach': self.rng.choice(self.approaches),
+                }
+                score = self._score(seed)
+                if best is None or score < best_score:
+                    best, best_score = seed, score
+            self._add(best, 1)
+            return best
+
+    def record(self, seed: Dict, scenario: Optional[Dict], seconds: float) -> Optional[bool]:
+        """Release a seed and count the validated scenario generated from it
+
+        Args:
+            seed (Dict): Seed returned by next_seed
+            scenario (Optional[Dict]): Validated scenario, or None if the item failed
+            seconds (float): Generation time spent on the item, including retries
+
+        Returns:
+            Optional[bool]: Whether the scenario is unique (None for failed items)
+        """
+        found = classify(scenario) if scenario is not None else None
+        words = signature(scenario) if scenario is not None else None
+        with self._lock:
+            self._add(seed, -1)
+            self.seconds += seconds
+            if found is None:
+                self.stats['failed'] += 1
+                return None
+            unique = self._count(found, words)
+            self.stats['generated'] += 1
+            self.stats['unique' if unique else 'duplicates'] += 1
+            if (found['industry'], found['dealType']) == (seed['industry'], seed['dealType']):
+                self.stats['on_seed'] += 1
+        return unique
+
+    def coverage(self) -> Dict:
+        """Filled industry x deal type cells and the least covered plan values"""
+        with self._lock:
+            filled = sum(1 for i in INDUSTRIES for d in DEAL_TYPES if self.cells[(i, d)] > 0)
+            return {
+                'cells_filled': filled,
+                'cells_total': len(INDUSTRIES) * len(DEAL_TYPES),
+                'least_covered': {
+                    'industry': sorted(INDUSTRIES, key=lambda v: self.counts['industry'][v])[:5],
+                    'dealType': sorted(DEAL_TYPES, key=lambda v: self.counts['dealType'][v])[:5],
+                    'approach': sorted(self.approaches, key=lambda v: self.counts['approach'][v])[:3],
+                },
+            }
+
+    def as_dict(self) -> Dict:
+        """Yield statistics for the scenarios generated through this scheduler"""
+        with self._lock:
+            generated = self.stats['generated']
+            unique = self.stats['unique']
+            seconds = self.seconds
+            report = {
+                'generated': generated,
+                'unique': unique,
+                'duplicates': self.stats['duplicates'],
+                'failed': self.stats['failed'],
+                'seed_adherence': f"{self.stats['on_seed'] / max(generated, 1) * 100:.1f}%",
+                'compute_seconds': round(seconds, 1),
+                'unique_per_compute_hour': round(unique / (seconds / 3600), 1) if seconds else None,
+            }
+        report['cells_filled'] = self.coverage()['cells_filled']
+        return report
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Show scenario coverage gaps and the next topic seeds")
+    sub = parser.add_subparsers(dest='command', required=True)
+    report = sub.add_parser('report', help="Summarize what a corpus covers")
+    report.add_argument('root', nargs='?', default='.', help="Data root")
+    report.add_argument('--seeds', type=int, default=5, help="Number of next seeds to show")
+    args = parser.parse_args()
+
+    setup_logging()
+    scheduler = CoverageScheduler.from_corpus(args.root)
+    coverage = scheduler.coverage()
+    print(f"Scenarios: {scheduler.existing}")
+    print(f"Industry x deal type cells filled: {coverage['cells_filled']}/{coverage['cells_total']}")
+    for name, counts in scheduler.counts.items():
+        print(f"Most common {name}: {json.dumps(counts.most_common(5))}")
+    print(f"Least covered: {json.dumps(coverage['least_covered'])}")
+    print("Next seeds:")
+    for _ in range(max(args.seeds, 0)):
+        print(f"- {json.dumps(scheduler.next_seed())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Pre-rendered scenario card fragments for the viewer grid
+- Renders the HTML of one scenario block (topic, description, party cards with
+  strategy/tactics sections) with the same markup app.js builds, autoescaped by Jinja
+- Fragments are keyed by a hash of the stored record and the template, so each
+  scenario version is rendered once; results are kept in an LRU and on disk
+  (shared by gunicorn workers and kept across restarts)
+- `python fragments.py warm [root]` renders a whole corpus ahead of time
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from corpus import CorpusError, ScenarioIndex, ScenarioView
+from migrations import CURRENT_SCHEMA_VERSION
+
+logger = logging.getLogger('fragments')
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+TEMPLATE_NAME = 'scenario_fragment.html'
+DEFAULT_CACHE_DIR = '.fragment_cache'
+DEFAULT_CACHE_SIZE = 2048
+
+
+class FragmentError(Exception):
+    """Exception raised when a fragment cannot be rendered"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output for the fragment tool"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console_handler)
+
+
+class FragmentRenderer:
+    """Render scenario blocks from templates/scenario_fragment.html"""
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR):
+        self.environment = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(['html']),
+            trim_blocks=True,
+            lstrip_blocks=True
+        )
+        self.template = self.environment.get_template(TEMPLATE_NAME)
+        with open(os.path.join(template_dir, TEMPLATE_NAME), 'rb') as f:
+            template_hash = hashlib.sha1(f.read()).hexdigest()[:12]
+        # Part of every cache key: a template or schema change re-renders everything
+        self.version = f"{template_hash}-v{CURRENT_SCHEMA_VERSION}"
+
+    def render(self, scenario: Dict) -> str:
+        """Render the HTML of one scenario block
+
+        Raises:
+            FragmentError: If the scenario cannot be rendered
+        """
+        try:
+            return self.template.render(scenario=scenario)
+        except Exception as e:
+            raise FragmentError(f"Cannot render scenario: {str(e)}")
+
+
+class FragmentCache:
+    """Rendered fragments in a memory LRU backed by a directory of HTML files"""
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_CACHE_SIZE,
+                 renderer: Optional[FragmentRenderer] = None):
+        """
+        Args:
+            cache_dir (Optional[str]): Directory for rendered files (None keeps them in memory only)
+            max_entries (int): Fragments kept in memory
+            renderer (Optional[FragmentRenderer]): Renderer to use (default: the shipped template)
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.renderer = renderer or FragmentRenderer()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'rendered': 0}
+        self._lru: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, view: ScenarioView) -> str:
+        """Cache key of a scenario version: hash of its stored bytes and the renderer version"""
+        digest = hashlib.sha1(self.renderer.version.encode('ascii'))
+        digest.update(view.raw())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.html")
+
+    def _remember(self, key: str, html: str):
+        with self._lock:
+            self._lru[key] = html
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def _write_disk(self, key: str, html: str):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            # The memory LRU still serves it; the next process renders it again
+            logger.warning(f"Cannot write fragment {path}: {str(e)}")
+
+    def get(self, view: ScenarioView) -> Tuple[str, str]:
+        """Return (key, html) of a scenario, rendering it on first use
+
+        Raises:
+            CorpusError: If the record cannot be read
+            FragmentError: If it cannot be rendered
+        """
+        key = self.key(view)
+        with self._lock:
+            html = self._lru.get(key)
+            if html is not None:
+                self._lru.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return key, html
+        html = self._read_disk(key)
+        if html is not None:
+            self.stats['disk_hits'] += 1
+        else:
+            html = self.renderer.render(view.load())
+            self._write_disk(key, html)
+            self.stats['rendered'] += 1
+        self._remember(key, html)
+        return key, html
+
+    def page(self, index: ScenarioIndex, offset: int = 0, limit: int = 50) -> Tuple[int, list]:
+        """Return one page of fragments as {id, key, title, html} items
+
+        Args:
+            index (ScenarioIndex): Corpus to page through
+            offset (int): Index of the first scenario
+            limit (int): Maximum number of fragments
+
+        Returns:
+            Tuple[int, list]: Total scenario count and the page items
+        """
+        views = index.views()
+        items = []
+        for view in views[offset:offset + limit]:
+            try:
+                key, html = self.get(view)
+                items.append({'id': view.id, 'key': key, 'title': view.title, 'html': html})
+            except (CorpusError, FragmentError) as e:
+                logger.warning(f"Skipping {view.id}: {e.message}")
+        return len(views), items
+
+    def items(self, index: ScenarioIndex, ids: List[str]) -> list:
+        """Return the fragments of some scenarios as {id, key, title, html, position} items
+
+        Unknown ids are left out; position is the scenario's index in page order.
+        """
+        items = []
+        for sid in ids:
+            view = index.view(sid)
+            if view is None:
+                continue
+            try:
+                key, html = self.get(view)
+            except (CorpusError, FragmentError) as e:
+                logger.warning(f"Skipping {sid}: {e.message}")
+                continue
+            items.append({'id': sid, 'key': key, 'title': view.title, 'html': html,
+                          'position': index.position(sid)})
+        return items
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Pre-render scenario card fragments for the viewer")
+    sub = parser.add_subparsers(dest='command', required=True)
+    warm = sub.add_parser('warm', help="Render every scenario of a data root into the disk cache")
+    warm.add_argument('root', nargs='?', default=os.environ.get('SCENARIO_DATA_ROOT', '.'), help="Data root")
+    warm.add_argument('--cache-dir', default=os.environ.get('FRAGMENT_CACHE_DIR', DEFAULT_CACHE_DIR),
+                      help="Fragment cache directory (FRAGMENT_CACHE_DIR)")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        cache = FragmentCache(args.cache_dir, max_entries=0)
+        index = ScenarioIndex(args.root)
+        total = len(index)
+        failed = 0
+        for view in index.views():
+            try:
+                cache.get(view)
+            except (CorpusError, FragmentError) as e:
+                logger.warning(f"Skipping {view.id}: {e.message}")
+                failed += 1
+        logger.info(f"{total} scenarios: {cache.stats['rendered']} rendered, "
+                    f"{cache.stats['disk_hits']} already cached, {failed} failed ({args.cache_dir})")
+        sys.exit(1 if failed else 0)
+    except KeyboardInterrupt:
+        logger.info("\nWarm-up cancelled by user.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
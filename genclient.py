@@ -0,0 +1,88 @@
+"""
+Client for the generation daemon (gendaemon.py)
+- Sends one JSON-line request over the daemon's Unix domain socket and iterates
+  over the JSON-line events it streams back
+- Standard library only, so the viewer backend can forward generation requests
+  without the generator stack (ollama, httpx, the generator modules) installed
+- Tells requests the daemon rejected apart from a daemon that cannot be reached
+"""
+
+import json
+import os
+import socket
+from typing import Any, Dict, Iterator, Optional
+
+DEFAULT_SOCKET = os.environ.get('GENERATOR_SOCKET', 'generator.sock')
+
+
+class DaemonError(Exception):
+    """Exception raised when the daemon cannot be reached or rejects a request"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class DaemonRejected(DaemonError):
+    """Exception raised when the daemon answers a request with an error event"""
+
+
+class DaemonClient:
+    """Send requests to a running daemon and iterate over its JSON-line replies"""
+
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = timeout
+
+    def request(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Send one request and yield the events streamed back
+
+        Closing the iterator closes the connection, which makes the daemon
+        cancel the rest of a generation request.
+
+        Raises:
+            DaemonError: If the daemon is not running
+            DaemonRejected: If the daemon answers with an error
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            try:
+                sock.connect(self.path)
+                sock.sendall((json.dumps(payload) + '\n').encode('utf-8'))
+            except OSError as e:
+                raise DaemonError(f"Cannot reach the generator daemon at {self.path}: {str(e)}")
+            with sock.makefile('r', encoding='utf-8') as replies:
+                for line in replies:
+                    event = json.loads(line)
+                    if event.get('event') == 'error':
+                        raise DaemonRejected(event.get('error', 'request rejected'))
+                    yield event
+        finally:
+            sock.close()
+
+    def _single(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        events = self.request(payload)
+        try:
+            return next(events)
+        except StopIteration:
+            raise DaemonError("The generator daemon closed the connection without answering")
+        finally:
+            events.close()
+
+    def ping(self) -> Dict[str, Any]:
+        return self._single({'op': 'ping'})
+
+    def status(self) -> Dict[str, Any]:
+        return self._single({'op': 'status'})
+
+    def generate(self, job_type: str, count: int, **fields) -> Iterator[Dict[str, Any]]:
+        """Request count items; yields accepted, item, failed and done events
+
+        Args:
+            job_type (str): negotiation or character
+            count (int): Number of items
+            **fields: Other JobSpec fields (models, compact_keys, diverse, priority...),
+                plus output (store items on the daemon side) and data_root (corpus
+                the diverse scheduler steers away from)
+        """
+        return self.request({'op': 'generate', 'type': job_type, 'count': count, **fields})
@@ -0,0 +1,361 @@
+"""
+Long-lived generation daemon
+- Keeps the generator modules, Pydantic models, logging, latency/cascade history,
+  coverage state and the Ollama models warm across runs
+- Accepts character and negotiation requests on a Unix domain socket (one JSON line
+  per request) and streams every validated item back as a JSON line when it is ready
+- All clients share one request capacity, divided with the job runner's fair scheduler
+- Clients: negotiationgen.py/charactergen.py --daemon, server.py /api/generate
+  (GENERATOR_SOCKET) and genclient.DaemonClient
+- Usage: python gendaemon.py [--socket generator.sock] [--capacity 2]
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import select
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError as SpecValidationError
+
+from diversity import CoverageScheduler
+from genclient import DEFAULT_SOCKET, DaemonClient, DaemonError
+from jobrunner import FairScheduler, Job, JobSpec, coverage_root, flush_job, item_generator, run_item, store_item
+from ollama_runtime import Deadline
+from profiling import add_profile_arguments, stage_profiler
+
+logger = logging.getLogger('gendaemon')
+
+DEFAULT_CAPACITY = 2
+MAX_REQUEST_BYTES = 64 * 1024
+# Seconds between checks whether a waiting client is still connected
+DISCONNECT_POLL = 1.0
+# How long Ollama keeps preloaded models in memory
+PRELOAD_KEEP_ALIVE = '30m'
+
+
+def setup_logging():
+    """Configure console output for the daemon"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s', '%H:%M:%S'))
+    logger.addHandler(console_handler)
+
+
+class StreamJob(Job):
+    """A job whose results are streamed to one connected client"""
+
+    def __init__(self, spec: JobSpec, order: int, store: bool, budget: Optional[float]):
+        super().__init__(spec, order, record_progress=False)
+        self.store = store
+        self.deadline = Deadline(budget, scope="batch")
+        self.cancel_event = threading.Event()
+        self.events: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+
+
+class GeneratorDaemon:
+    """Run generation requests from many clients on one shared capacity"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.jobs: List[StreamJob] = []
+        self.scheduler = FairScheduler(self.jobs)
+        self.generators = {job_type: item_generator(job_type) for job_type in ('negotiation', 'character')}
+        self.coverage: Dict[str, CoverageScheduler] = {}
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.started = time.time()
+        self._order = itertools.count(1)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._pool = ThreadPoolExecutor(max_workers=capacity, thread_name_prefix='generate')
+        self._dispatcher = threading.Thread(target=self._dispatch, name='dispatcher', daemon=True)
+
+    def start(self):
+        self._dispatcher.start()
+
+    def stop(self):
+        """Cancel every job and wait for running requests to end"""
+        with self._cond:
+            self._stopping = True
+            for job in self.jobs:
+                job.cancel_event.set()
+            self._cond.notify_all()
+        self._pool.shutdown(wait=True)
+
+    def preload(self, models: List[str]):
+        """Ask Ollama to load models now so the first request does not pay for it"""
+        from ollama import Client
+        client = Client()
+        for model in models:
+            try:
+                client.generate(model=model, prompt='', keep_alive=PRELOAD_KEEP_ALIVE)
+                logger.info(f"Preloaded {model}")
+            except Exception as e:
+                logger.warning(f"Could not preload {model}: {str(e)}")
+
+    def _coverage_for(self, spec: JobSpec, data_root: Optional[str]) -> CoverageScheduler:
+        """One coverage scheduler per corpus, shared by every client writing to it"""
+        root = os.path.abspath(data_root or coverage_root(spec))
+        with self._cond:
+            scheduler = self.coverage.get(root)
+        if scheduler is None:
+            # Read the corpus without holding up dispatching
+            scheduler = CoverageScheduler.from_corpus(root) if os.path.isdir(root) else CoverageScheduler()
+            with self._cond:
+                scheduler = self.coverage.setdefault(root, scheduler)
+        return scheduler
+
+    def submit(self, spec: JobSpec, store: bool = False, data_root: Optional[str] = None,
+               budget: Optional[float] = None) -> StreamJob:
+        """Queue a job; its events arrive on job.events"""
+        order = next(self._order)
+        if spec.name is None:
+            spec.name = f"{spec.type}-{order}"
+        job = StreamJob(spec, order, store, budget)
+        if spec.diverse and spec.type == 'negotiation':
+            job.coverage = self._coverage_for(spec, data_root)
+        with self._cond:
+            self.jobs.append(job)
+            self._cond.notify_all()
+        return job
+
+    def cancel(self, job: StreamJob):
+        """Stop dispatching a job's items and cancel its running requests"""
+        job.cancel_event.set()
+        with self._cond:
+            job.next_item = job.spec.count + 1
+            if job.done and job in self.jobs:
+                self.jobs.remove(job)
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    if self.in_flight < self.capacity:
+                        job = self.scheduler.pick()
+                        if job is not None:
+                            break
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                item, estimate = self.scheduler.start(job)
+                self.in_flight += 1
+            started = time.monotonic()
+            future = self._pool.submit(run_item, job, self.generators[job.spec.type], job.deadline, job.cancel_event)
+            future.add_done_callback(lambda f, job=job, item=item, estimate=estimate, started=started:
+                                     self._finished(job, item, estimate, started, f))
+
+    def _finished(self, job: StreamJob, item: int, estimate: float, started: float, future: Future):
+        seconds = time.monotonic() - started
+        try:
+            data = future.result()
+            output = store_item(job, data) if job.store else None
+            event = {'event': 'item', 'item': item, 'data': data, 'output': output, 'seconds': round(seconds, 2)}
+            success = True
+        except Exception as e:
+            reason = getattr(e, 'message', None) or str(e)
+            event = {'event': 'failed', 'item': item, 'error': reason, 'seconds': round(seconds, 2)}
+            success = False
+
+        with self._cond:
+            self.in_flight -= 1
+            self.scheduler.finish(job, estimate, seconds)
+            if success:
+                job.completed += 1
+                self.completed += 1
+            else:
+                job.failed += 1
+                self.failed += 1
+            job.events.put(event)
+            finished = job.done
+            if finished and job in self.jobs:
+                self.jobs.remove(job)
+            self._cond.notify_all()
+
+        if finished:
+            done = {'event': 'done', 'job': job.spec.name, 'completed': job.completed, 'failed': job.failed}
+            if job.store:
+                try:
+                    filename = flush_job(job)
+                    if filename:
+                        done['output'] = filename
+                except IOError as e:
+                    logger.error(f"Cannot save {job.spec.name}: {str(e)}")
+            if job.coverage is not None:
+                done['diversity'] = job.coverage.as_dict()
+            job.events.put(done)
+            logger.info(f"Job finished - {job.summary()}")
+
+    def status(self) -> Dict[str, Any]:
+        """Capacity, jobs and the shared per-workload request history"""
+        import charactergen
+        import negotiationgen
+        with self._cond:
+            report = {
+                'pid': os.getpid(),
+                'uptime': round(time.time() - self.started, 1),
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'jobs': [job.summary() for job in self.jobs],
+            }
+        for name, module in (('negotiation', negotiationgen), ('character', charactergen)):
+            report[name] = {
+                'latency_p50': module.latency_tracker.percentile(0.5),
+                'latency_p90': module.latency_tracker.percentile(0.9),
+                'models': module.cascade_stats.as_dict(),
+                'output': module.output_stats.as_dict(),
+            }
+        return report
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """One client connection: a single request, answered with JSON lines"""
+
+    def client_gone(self) -> bool:
+        """True if the client closed its end (the only thing it sends after the request)"""
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+
+    def send(self, event: Dict[str, Any]):
+        self.wfile.write((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def handle(self):
+        daemon: GeneratorDaemon = self.server.daemon
+        try:
+            payload = json.loads(self.rfile.readline(MAX_REQUEST_BYTES))
+            if not isinstance(payload, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            self.send({'event': 'error', 'error': f"Invalid request: {str(e)}"})
+            return
+
+        op = payload.get('op', 'generate')
+        if op == 'ping':
+            self.send({'event': 'pong', 'pid': os.getpid()})
+            return
+        if op == 'status':
+            self.send({'event': 'status', **daemon.status()})
+            return
+        if op != 'generate':
+            self.send({'event': 'error', 'error': f"Unknown op {op!r}"})
+            return
+
+        try:
+            spec = JobSpec.model_validate({k: v for k, v in payload.items() if k in JobSpec.model_fields})
+        except SpecValidationError as e:
+            self.send({'event': 'error', 'error': f"Invalid job: {str(e)}"})
+            return
+        budget = payload.get('budget')
+        if budget is not None and (isinstance(budget, bool) or not isinstance(budget, (int, float))
+                                   or budget <= 0):
+            self.send({'event': 'error', 'error': f"Invalid budget {budget!r}: expected positive seconds"})
+            return
+        job = daemon.submit(spec, store='output' in payload, data_root=payload.get('data_root'),
+                            budget=budget)
+        logger.info(f"Accepted {spec.name}: {spec.count} {spec.type} items")
+        try:
+            self.send({'event': 'accepted', 'job': spec.name})
+            while True:
+                try:
+                    event = job.events.get(timeout=DISCONNECT_POLL)
+                except queue.Empty:
+                    if self.client_gone():
+                        raise ConnectionResetError("client disconnected")
+                    continue
+                self.send(event)
+                if event['event'] == 'done':
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info(f"Client of {spec.name} disconnected; cancelling its remaining items")
+            daemon.cancel(job)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: GeneratorDaemon):
+        self.daemon = daemon
+        super().__init__(path, RequestHandler)
+
+
+def remove_stale_socket(path: str):
+    """Remove a socket file left by a daemon that is no longer running
+
+    Raises:
+        DaemonError: If another daemon is listening on the path
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        DaemonClient(path, timeout=2).ping()
+    except DaemonError:
+        os.remove(path)
+        return
+    raise DaemonError(f"A generator daemon is already listening on {path}")
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Serve character and negotiation generation over a Unix socket")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Socket path (GENERATOR_SOCKET)")
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help="Concurrent Ollama requests")
+    parser.add_argument('--preload', default=None,
+                        help="Comma-separated models to load at startup (default: both generators' models)")
+    parser.add_argument('--no-preload', action='store_true', help="Do not preload models")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        remove_stale_socket(args.socket)
+    except DaemonError as e:
+        logger.error(e.message)
+        sys.exit(1)
+
+    daemon = GeneratorDaemon(max(args.capacity, 1))
+    server = DaemonServer(args.socket, daemon)
+    # Covers the daemon's whole lifetime; the profile is written on shutdown
+    stage_profiler.start_from_args(args, [logging.getLogger(name) for name in ('negotiationgen', 'charactergen')])
+    # Only the owner may submit work
+    os.chmod(args.socket, 0o600)
+    daemon.start()
+    if not args.no_preload:
+        import charactergen
+        import negotiationgen
+        models = ([m.strip() for m in args.preload.split(',') if m.strip()] if args.preload
+                  else list(dict.fromkeys(negotiationgen.DEFAULT_MODELS + charactergen.DEFAULT_MODELS)))
+        threading.Thread(target=daemon.preload, args=(models,), name='preload', daemon=True).start()
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logger.info(f"Generator daemon listening on {args.socket} (PID {os.getpid()}, capacity {daemon.capacity})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down...")
+    finally:
+        server.server_close()
+        daemon.stop()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        if stage_profiler.enabled:
+            logger.info(stage_profiler.finish(args.profile_output, 'gendaemon'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Headless batch runner for character and negotiation generation
+- Reads a JSON job spec listing jobs (type, count, models, concurrency, output, priority)
+- Runs all jobs together on a shared number of concurrent Ollama requests
+- Shares capacity fairly: each job is charged the request-seconds it uses, divided
+  by its priority, and the job with the lowest charge is served next
+- Writes per-job progress files, prints periodic progress and exits with a status code
+- Usage: python jobrunner.py jobs.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError as SpecValidationError, model_validator
+
+from diversity import CoverageScheduler, seed_prompt
+from migrations import migrate
+from ollama_runtime import Deadline, ProgressRecorder
+from profiling import add_profile_arguments, stage_profiler
+
+logger = logging.getLogger('jobrunner')
+
+# Exit codes
+EXIT_OK = 0
+EXIT_PARTIAL = 1       # Some items failed or the run budget ran out
+EXIT_SPEC_ERROR = 2    # The job spec could not be read or is invalid
+EXIT_ALL_FAILED = 3    # No item succeeded
+EXIT_INTERRUPTED = 130
+
+PROGRESS_INTERVAL = 5.0
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+# Expected seconds per item, charged when an item starts and corrected when it ends
+DEFAULT_ITEM_ESTIMATE = {'character': 30.0, 'negotiation': 60.0}
+
+
+class JobSpec(BaseModel):
+    """One batch of items to generate"""
+    name: Optional[str] = None
+    type: str = Field(..., pattern="^(character|negotiation)$")
+    count: int = Field(..., ge=1)
+    model: Optional[str] = None
+    models: Optional[List[str]] = None
+    concurrency: int = Field(1, ge=1)
+    output: str = '.'
+    priority: int = Field(1, ge=1)
+    attempt_timeout: Optional[float] = None
+    item_timeout: Optional[float] = None
+    compact_keys: bool = False
+    # Negotiation jobs only: seed requests from the least covered topics of the output corpus
+    diverse: bool = False
+
+
+class RunSpec(BaseModel):
+    """Job spec file: shared capacity, optional run budget and the jobs"""
+    capacity: int = Field(1, ge=1)
+    budget: Optional[float] = None
+    jobs: List[JobSpec] = Field(..., min_length=1)
+
+    @model_validator(mode='after')
+    def name_jobs(self):
+        for index, job in enumerate(self.jobs):
+            if job.name is None:
+                job.name = f"{job.type}-{index + 1}"
+        names = [job.name for job in self.jobs]
+        if len(set(names)) != len(names):
+            raise ValueError("job names must be unique")
+        return self
+
+
+class JobRunnerError(Exception):
+    """Exception raised when the runner cannot start"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output for the runner"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s', '%H:%M:%S'))
+    logger.addHandler(console_handler)
+
+
+def load_spec(path: str) -> RunSpec:
+    """Read and validate a job spec file
+
+    Raises:
+        JobRunnerError: If the file cannot be read or does not match RunSpec
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return RunSpec.model_validate(json.load(f))
+    except (IOError, OSError, json.JSONDecodeError) as e:
+        raise JobRunnerError(f"Cannot read job spec {path}: {str(e)}")
+    except SpecValidationError as e:
+        raise JobRunnerError(f"Invalid job spec {path}: {str(e)}")
+
+
+class Job:
+    """Runtime state of one job"""
+
+    def __init__(self, spec: JobSpec, order: int, record_progress: bool = True):
+        self.spec = spec
+        self.order = order
+        self.next_item = 1
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.charged = 0.0
+        self.durations: List[float] = []
+        self.buffer: List[Dict] = []
+        self.outputs: List[str] = []
+        self.progress = (ProgressRecorder(f"jobrunner_{spec.name}_progress.json", spec.type, spec.count)
+                         if record_progress else None)
+        self.coverage: Optional[CoverageScheduler] = None
+
+    @property
+    def pending(self) -> bool:
+        return self.next_item <= self.spec.count
+
+    @property
+    def done(self) -> bool:
+        return not self.pending and self.running == 0
+
+    def estimate(self) -> float:
+        """Expected seconds for the next item (mean of the last ten)"""
+        recent = self.durations[-10:]
+        return sum(recent) / len(recent) if recent else DEFAULT_ITEM_ESTIMATE[self.spec.type]
+
+    def summary(self) -> str:
+        summary = (f"{self.spec.name}: {self.completed}/{self.spec.count} done, "
+                   f"{self.failed} failed, {self.running} running")
+        if self.coverage is not None:
+            summary += f", {self.coverage.stats['unique']} unique"
+        return summary
+
+
+class FairScheduler:
+    """Choose which job gets the next free request slot
+
+    Every job accumulates a charge of request-seconds divided by its
+    priority. The job with the lowest charge that still has items and is
+    under its own concurrency limit goes next, so a priority-2 job gets
+    about twice the capacity of a priority-1 job whether its items take
+    five seconds (characters) or a minute (negotiations).
+    """
+
+    def __init__(self, jobs: List[Job]):
+        self.jobs = jobs
+
+    def pick(self) -> Optional[Job]:
+        ready = [job for job in self.jobs if job.pending and job.running < job.spec.concurrency]
+        if not ready:
+            return None
+        return min(ready, key=lambda job: (job.charged, -job.spec.priority, job.order))
+
+    def start(self, job: Job) -> Tuple[int, float]:
+        """Reserve the next item of a job, charging its estimated cost up front"""
+        item = job.next_item
+        job.next_item += 1
+        job.running += 1
+        estimate = job.estimate()
+        job.charged += estimate / job.spec.priority
+        return item, estimate
+
+    def finish(self, job: Job, estimate: float, seconds: float):
+        """Replace the estimated charge with the measured one"""
+        job.running -= 1
+        job.durations.append(seconds)
+        job.charged += (seconds - estimate) / job.spec.priority
+
+
+def item_generator(job_type: str) -> Callable[..., Dict]:
+    """Return a function generating and validating one item of a job type"""
+    if job_type == 'character':
+        import charactergen
+
+        def generate(**options) -> Dict:
+            with stage_profiler.stage('character'):
+                character = charactergen.generate_character(charactergen.SYSTEM_PROMPT, **options)
+                charactergen.validate_character(character)
+                return character
+        generate.default_models = charactergen.DEFAULT_MODELS
+        generate.default_timeout = charactergen.DEFAULT_ATTEMPT_TIMEOUT
+        return generate
+
+    import negotiationgen
+
+    def generate(seed: Optional[Dict] = None, **options) -> Dict:
+        with stage_profiler.stage('negotiation'):
+            prompt = negotiationgen.SYSTEM_PROMPT
+            if seed is not None:
+                prompt = seed_prompt(prompt, seed)
+            scenario = negotiationgen.generate_negotiation(prompt, **options)
+            negotiationgen.validate_negotiation(scenario)
+            return scenario
+    generate.default_models = negotiationgen.DEFAULT_MODELS
+    generate.default_timeout = negotiationgen.DEFAULT_ATTEMPT_TIMEOUT
+    return generate
+
+
+def coverage_root(spec: JobSpec) -> str:
+    """Directory holding the corpus a diverse job's output joins"""
+    if spec.output.endswith(NDJSON_EXTENSIONS):
+        return os.path.dirname(spec.output) or '.'
+    return spec.output
+
+
+def run_item(job: Job, generate: Callable[..., Dict], run_deadline: Deadline,
+             cancel_event: threading.Event) -> Dict:
+    """Generate one item of a job within its item deadline and the run budget"""
+    spec = job.spec
+    models = spec.models or ([spec.model] if spec.model else generate.default_models)
+    options = dict(
+        attempt_timeout=spec.attempt_timeout or generate.default_timeout,
+        deadlines=[Deadline(spec.item_timeout, scope="item"), run_deadline],
+        cancel_event=cancel_event,
+        models=models,
+        compact_keys=spec.compact_keys
+    )
+    if job.coverage is None:
+        return generate(**options)
+
+    start_time = time.monotonic()
+    seed = job.coverage.next_seed()
+    try:
+        item = generate(seed=seed, **options)
+    except Exception:
+        job.coverage.record(seed, None, time.monotonic() - start_time)
+        raise
+    job.coverage.record(seed, item, time.monotonic() - start_time)
+    return item
+
+
+def store_item(job: Job, data: Dict) -> Optional[str]:
+    """Write a finished item to the job's output target
+
+    NDJSON targets get one line per item as it finishes. Otherwise the
+    output is a directory: scenarios are saved one file each as
+    negotiationgen does, characters are collected and saved when the job ends.
+
+    Returns:
+        Optional[str]: File the item was written to, if already written
+    """
+    output = job.spec.output
+    if job.spec.type == 'negotiation':
+        data = migrate(data)
+    if output.endswith(NDJSON_EXTENSIONS):
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False) + '\n')
+        return output
+    os.makedirs(output, exist_ok=True)
+    if job.spec.type == 'negotiation':
+        from negotiationgen import save_scenario
+        return save_scenario(data, output)
+    job.buffer.append(data)
+    return None
+
+
+def flush_job(job: Job, suffix: str = "") -> Optional[str]:
+    """Save buffered characters of a directory-output job"""
+    if not job.buffer:
+        return None
+    from charactergen import save_characters
+    filename = save_characters(job.buffer, suffix, job.spec.output)
+    job.buffer = []
+    return filename
+
+
+def run(spec: RunSpec, cancel_event: Optional[threading.Event] = None) -> Tuple[str, List[Job]]:
+    """Run every job of a spec to completion
+
+    Args:
+        spec (RunSpec): Validated job spec
+        cancel_event (Optional[threading.Event]): Set to stop dispatching and cancel requests
+
+    Returns:
+        Tuple[str, List[Job]]: Run status (completed, budget_exhausted, interrupted) and the jobs
+    """
+    cancel_event = cancel_event or threading.Event()
+    jobs = [Job(job_spec, order) for order, job_spec in enumerate(spec.jobs)]
+    for job in jobs:
+        if job.spec.diverse and job.spec.type == 'negotiation':
+            root = coverage_root(job.spec)
+            job.coverage = CoverageScheduler.from_corpus(root) if os.path.isdir(root) else CoverageScheduler()
+    generators = {job_type: item_generator(job_type) for job_type in {job.spec.type for job in jobs}}
+    scheduler = FairScheduler(jobs)
+    run_deadline = Deadline(spec.budget, scope="batch")
+    in_flight: Dict[Future, Tuple[Job, int, float, float]] = {}
+    status = 'completed'
+    last_report = time.monotonic()
+
+    logger.info(f"Running {len(jobs)} jobs with capacity {spec.capacity}")
+    pool = ThreadPoolExecutor(max_workers=spec.capacity, thread_name_prefix='job')
+    try:
+        while True:
+            if run_deadline.expired() and status == 'completed':
+                status = 'budget_exhausted'
+                logger.warning("Run budget exhausted; not starting new items")
+            while status == 'completed' and not cancel_event.is_set() and len(in_flight) < spec.capacity:
+                job = scheduler.pick()
+                if job is None:
+                    break
+                item, estimate = scheduler.start(job)
+                job.progress.item_started(item, 1)
+                future = pool.submit(run_item, job, generators[job.spec.type], run_deadline, cancel_event)
+                in_flight[future] = (job, item, estimate, time.monotonic())
+            if not in_flight:
+                break
+
+            finished, _ = wait(list(in_flight), timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job, item, estimate, started = in_flight.pop(future)
+                scheduler.finish(job, estimate, time.monotonic() - started)
+                try:
+                    output = store_item(job, future.result())
+                    job.completed += 1
+                    job.progress.item_completed(output)
+                except Exception as e:
+                    # One failed item does not stop the job or the run
+                    job.failed += 1
+                    reason = getattr(e, 'message', None) or str(e)
+                    job.progress.item_failed(item, reason)
+                    logger.error(f"{job.spec.name} item {item} failed: {reason}")
+                if job.done:
+                    filename = flush_job(job)
+                    if filename:
+                        job.outputs.append(filename)
+                    job.progress.finish('completed' if not job.failed else 'partial' if job.completed else 'failed')
+                    logger.info(f"Job finished - {job.summary()}")
+                    if job.coverage is not None:
+                        logger.info(f"{job.spec.name} diversity: {job.coverage.as_dict()}")
+
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                logger.info(" | ".join(job.summary() for job in jobs))
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        status = 'interrupted'
+        cancel_event.set()
+        logger.info("Interrupted; cancelling in-flight requests...")
+        wait(list(in_flight))
+        raise
+    finally:
+        pool.shutdown(wait=True)
+        for job in jobs:
+            if job.progress.state['status'] == 'running':
+                filename = flush_job(job, "_partial")
+                if filename:
+                    job.outputs.append(filename)
+                job.progress.finish(status if status != 'completed' else 'partial')
+    return status, jobs
+
+
+def exit_code(status: str, jobs: List[Job]) -> int:
+    """Map the run outcome to the process exit code"""
+    if status == 'interrupted':
+        return EXIT_INTERRUPTED
+    completed = sum(job.completed for job in jobs)
+    requested = sum(job.spec.count for job in jobs)
+    if completed == 0:
+        return EXIT_ALL_FAILED
+    if completed < requested:
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Run character and negotiation jobs from a spec file")
+    parser.add_argument('spec', help="Job spec (JSON)")
+    parser.add_argument('--capacity', type=int, help="Override the spec's concurrent request capacity")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        spec = load_spec(args.spec)
+        if args.capacity:
+            spec.capacity = max(args.capacity, 1)
+    except JobRunnerError as e:
+        logger.error(e.message)
+        sys.exit(EXIT_SPEC_ERROR)
+
+    start_time = time.monotonic()
+    stage_profiler.start_from_args(args, [logging.getLogger(name) for name in ('negotiationgen', 'charactergen')])
+    try:
+        status, jobs = run(spec)
+    except KeyboardInterrupt:
+        logger.info("Run cancelled by user; progress files record what finished.")
+        if stage_profiler.enabled:
+            logger.info(stage_profiler.finish(args.profile_output, 'jobrunner'))
+        sys.exit(EXIT_INTERRUPTED)
+
+    logger.info(f"Run {status} in {time.monotonic() - start_time:.1f}s")
+    for job in jobs:
+        logger.info(f"- {job.summary()} (output: {job.spec.output})")
+    if stage_profiler.enabled:
+        logger.info(stage_profiler.finish(args.profile_output, 'jobrunner'))
+    sys.exit(exit_code(status, jobs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+HTTP load test for the viewer backend
+- Builds a synthetic corpus of N scenarios by mutating the sample *_2025*.json files
+- Starts server.py against it (debug or --production) or targets a running --url
+- Replays a weighted mix of static assets, scenario file fetches, /api/scenarios pages
+  and /telemetry batches at one or more concurrency levels
+- Writes throughput, latency percentiles and error rates to a JSON results file
+"""
+
+import argparse
+import copy
+import glob
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from corpus import CorpusError, load_scenario_file
+
+logger = logging.getLogger('loadtest')
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_PATTERN = '*_2025*.json'
+DEFAULT_SCENARIOS = 1000
+DEFAULT_SHARD_SIZE = 50
+DEFAULT_CONCURRENCY = '1,8,32'
+DEFAULT_DURATION = 10.0
+DEFAULT_MIX = 'static=4,data=3,api=2,log=1'
+DEFAULT_PORT = 5099
+PAGE_SIZE = 50
+
+STATIC_PATHS = ['/', '/app.js', '/style.css', '/scenario-worker.js']
+SEVERITIES = ['low', 'medium', 'high', 'critical']
+REQUEST_KINDS = ('static', 'data', 'api', 'log')
+
+
+class LoadTestError(Exception):
+    """Exception raised when the load test cannot be set up"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output for the load test"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console_handler)
+
+
+def load_samples(root: str = APP_ROOT) -> List[Dict]:
+    """Load the sample scenarios used as mutation seeds
+
+    Raises:
+        LoadTestError: If no sample scenario can be read
+    """
+    samples = []
+    for path in sorted(glob.glob(os.path.join(root, SAMPLE_PATTERN))):
+        try:
+            samples.extend(load_scenario_file(path))
+        except CorpusError as e:
+            logger.warning(e.message)
+    if not samples:
+        raise LoadTestError(f"No sample scenarios matching {SAMPLE_PATTERN} in {root}")
+    return samples
+
+
+def mutate_scenario(scenario: Dict, rng: random.Random, serial: int) -> Dict:
+    """Return a perturbed copy of a scenario with a new id and shuffled lists"""
+    mutated = copy.deepcopy(scenario)
+    mutated['negotiationId'] = f"{rng.getrandbits(32):08X}"
+    topic = mutated.get('topic')
+    if isinstance(topic, dict):
+        topic['title'] = f"{topic.get('title', 'Scenario')} {serial}"
+    for key in ('conflictPoints', 'negotiablePoints', 'nonNegotiablePoints'):
+        if isinstance(mutated.get(key), list):
+            rng.shuffle(mutated[key])
+    for point in mutated.get('conflictPoints') or []:
+        if isinstance(point, dict):
+            point['severity'] = rng.choice(SEVERITIES)
+    return mutated
+
+
+def build_corpus(out_dir: str, count: int, samples: List[Dict], seed: int = 0,
+                 shard_size: int = DEFAULT_SHARD_SIZE) -> List[str]:
+    """Write count mutated scenarios as {"scenarios": [...]} shards
+
+    Args:
+        out_dir (str): Directory to write the shards to
+        count (int): Number of scenarios
+        samples (List[Dict]): Seed scenarios
+        seed (int): Random seed, so runs are comparable
+        shard_size (int): Scenarios per file
+
+    Returns:
+        List[str]: Shard file names
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    names = []
+    for start in range(0, count, shard_size):
+        scenarios = [
+            mutate_scenario(samples[serial % len(samples)], rng, serial)
+            for serial in range(start, min(start + shard_size, count))
+        ]
+        name = f"synthetic_{start // shard_size:05d}.json"
+        with open(os.path.join(out_dir, name), 'w', encoding='utf-8') as f:
+            json.dump({'scenarios': scenarios}, f, ensure_ascii=False)
+        names.append(name)
+    return names
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Parse a request mix like "static=4,data=3,api=2,log=1" """
+    mix = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind {kind!r} (expected {', '.join(REQUEST_KINDS)})")
+        try:
+            mix[kind] = int(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for {kind}: {weight!r}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The request mix needs at least one positive weight")
+    return mix
+
+
+def parse_levels(value: str) -> List[int]:
+    """Parse comma-separated concurrency levels"""
+    try:
+        levels = [int(v) for v in value.split(',') if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid concurrency levels: {value!r}")
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("Concurrency levels must be positive")
+    return levels
+
+
+def next_request(kind: str, rng: random.Random, shards: List[str], total: int) -> Tuple[str, str, Optional[bytes]]:
+    """Build (method, path, body) for one request of the given kind"""
+    if kind == 'static':
+        return 'GET', rng.choice(STATIC_PATHS), None
+    if kind == 'data':
+        return 'GET', f"/data/{rng.choice(shards)}", None
+    if kind == 'api':
+        offset = rng.randrange(0, max(total, 1), PAGE_SIZE)
+        return 'GET', f"/api/scenarios?offset={offset}&limit={PAGE_SIZE}", None
+    events = [
+        {'kind': 'error', 'context': 'loadtest', 'message': f"synthetic client error {rng.getrandbits(16)}"},
+        {'kind': 'metric', 'name': 'file-load', 'totalMs': round(rng.uniform(5, 500), 1)},
+    ]
+    return 'POST', '/telemetry', json.dumps({'events': events}).encode()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile (0-100) of sorted values, nearest rank"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))
+    return values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Throughput, error rate and latency percentiles (ms) for a set of requests"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': round(errors / max(count, 1), 4),
+        'throughput_rps': round(count / max(elapsed, 1e-9), 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p90': round(percentile(latencies, 90) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    }
+
+
+def run_level(base_url: str, concurrency: int, duration: float, mix: Dict[str, int],
+              shards: List[str], total: int, seed: int = 0) -> Dict:
+    """Run closed-loop clients for a fixed duration and summarize the results
+
+    Each client keeps one keep-alive connection and sends its next request
+    as soon as the previous one completes.
+
+    Args:
+        base_url (str): Server URL, e.g. http://127.0.0.1:5099
+        concurrency (int): Number of concurrent clients
+        duration (float): Seconds to run
+        mix (Dict[str, int]): Request kind weights
+        shards (List[str]): Scenario file names served under /data/
+        total (int): Number of scenarios, for /api/scenarios offsets
+        seed (int): Random seed
+
+    Returns:
+        Dict: Overall and per-kind results for this level
+    """
+    target = urlsplit(base_url)
+    kinds = [k for k in mix if mix[k] > 0]
+    weights = [mix[k] for k in kinds]
+    results = {kind: ([], [0]) for kind in kinds}
+    lock = threading.Lock()
+    start = time.monotonic()
+    stop_at = start + duration
+
+    def client(index: int):
+        rng = random.Random(seed * 1000 + index)
+        local = {kind: ([], [0]) for kind in kinds}
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        while time.monotonic() < stop_at:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, body = next_request(kind, rng, shards, total)
+            request_start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body,
+                             headers={'Content-Type': 'application/json'} if body is not None else {})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local[kind][1][0] += 1
+                if response.will_close:
+                    conn.close()
+                    conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+            except (OSError, http.client.HTTPException):
+                local[kind][1][0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+            local[kind][0].append(time.perf_counter() - request_start)
+        conn.close()
+        with lock:
+            for kind, (latencies, errors) in local.items():
+                results[kind][0].extend(latencies)
+                results[kind][1][0] += errors[0]
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    all_latencies = [v for latencies, _ in results.values() for v in latencies]
+    all_errors = sum(errors[0] for _, errors in results.values())
+    return {
+        'concurrency': concurrency,
+        **summarize(all_latencies, all_errors, elapsed),
+        'by_kind': {kind: summarize(latencies, errors[0], elapsed) for kind, (latencies, errors) in results.items()}
+    }
+
+
+def start_server(corpus_dir: str, work_dir: str, port: int, production: bool, workers: int) -> subprocess.Popen:
+    """Start server.py on the synthetic corpus and wait until it answers
+
+    The server runs in work_dir so its error.log and metrics.log do not mix
+    with the real ones.
+
+    Raises:
+        LoadTestError: If the server does not come up
+    """
+    command = [sys.executable, os.path.join(APP_ROOT, 'server.py'), '--bind', f"127.0.0.1:{port}"]
+    if production:
+        command += ['--production', '--workers', str(workers)]
+    # Measure ingestion cost rather than the per-client telemetry rate limit
+    env = dict(os.environ, SCENARIO_DATA_ROOT=corpus_dir, TELEMETRY_RATE_LIMIT='0')
+    log = open(os.path.join(work_dir, 'server.out'), 'w')
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise LoadTestError(f"server.py exited with code {process.returncode} (see {log.name})")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/scenarios?limit=1')
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise LoadTestError(f"server.py did not answer on port {port} within 30s")
+
+
+def stop_server(process: subprocess.Popen):
+    """Stop the server started by start_server (gunicorn exits gracefully on SIGTERM)"""
+    process.terminate()
+    try:
+        process.wait(timeout=35)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def git_revision() -> Optional[str]:
+    """Return the current commit hash, if available"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Load test the viewer backend on a synthetic corpus")
+    parser.add_argument('--scenarios', type=int, default=DEFAULT_SCENARIOS, help="Synthetic corpus size")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help="Scenarios per file")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the corpus and request mix")
+    parser.add_argument('--concurrency', type=parse_levels, default=DEFAULT_CONCURRENCY,
+                        help="Comma-separated concurrency levels to run in turn")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Seconds per level")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="Request kind weights (static, data, api, log)")
+    parser.add_argument('--url', help="Target an already running server (its data root must hold the corpus)")
+    parser.add_argument('--corpus-dir', help="Write the synthetic corpus here and keep it")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port for the spawned server")
+    parser.add_argument('--production', action='store_true', help="Spawn the server in production mode")
+    parser.add_argument('--workers', type=int, default=4, help="Workers for --production")
+    parser.add_argument('--output', help="Results file (default: loadtest_results_<timestamp>.json)")
+    args = parser.parse_args()
+
+    setup_logging()
+    work_dir = tempfile.mkdtemp(prefix='loadtest_')
+    corpus_dir = args.corpus_dir or os.path.join(work_dir, 'corpus')
+    process = None
+    try:
+        shards = build_corpus(corpus_dir, args.scenarios, load_samples(), args.seed, max(args.shard_size, 1))
+        logger.info(f"Synthetic corpus: {args.scenarios} scenarios in {len(shards)} files ({corpus_dir})")
+
+        base_url = args.url
+        if base_url is None:
+            process = start_server(corpus_dir, work_dir, args.port, args.production, args.workers)
+            base_url = f"http://127.0.0.1:{args.port}"
+        mode = 'external' if args.url else ('production' if args.production else 'debug')
+
+        levels = []
+        for concurrency in args.concurrency:
+            result = run_level(base_url, concurrency, args.duration, args.mix, shards, args.scenarios, args.seed)
+            levels.append(result)
+            logger.info(
+                f"concurrency {concurrency:>4}: {result['throughput_rps']:>8} req/s  "
+                f"p50 {result['latency_ms']['p50']}ms  p99 {result['latency_ms']['p99']}ms  "
+                f"errors {result['error_rate'] * 100:.2f}%"
+            )
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(),
+                'revision': git_revision(),
+                'server_mode': mode,
+                'workers': args.workers if mode == 'production' else None,
+                'cpu_count': os.cpu_count(),
+                'python': sys.version.split()[0],
+                'scenarios': args.scenarios,
+                'shard_size': args.shard_size,
+                'duration': args.duration,
+                'mix': args.mix,
+                'seed': args.seed,
+            },
+            'levels': levels
+        }
+        output = args.output or f"loadtest_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Results written to {output}")
+
+    except LoadTestError as e:
+        logger.error(e.message)
+        sys.exit(2)
+    except KeyboardInterrupt:
+        logger.info("\nLoad test cancelled by user.")
+        sys.exit(130)
+    finally:
+        if process is not None:
+            stop_server(process)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
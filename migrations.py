@@ -0,0 +1,343 @@
+"""
+Versioned scenario records with lazy migration
+- Every stored scenario carries a "schemaVersion"; records without one are version 0
+- Functions registered with @migration(n) upgrade a record from version n to n + 1
+- Records are migrated when they are read (corpus.load_scenario_file), so a model
+  change never needs a full-corpus rewrite; the corpus index caches the results
+- `python migrations.py compact` (or the server's optional background pass) rewrites
+  stale files in place; `python migrations.py status` shows the version mix
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
+
+logger = logging.getLogger('migrations')
+
+SCHEMA_VERSION_FIELD = 'schemaVersion'
+CURRENT_SCHEMA_VERSION = 1
+
+MIGRATIONS: Dict[int, Callable[[Dict], Dict]] = {}
+
+# Optional fields of the NegotiationScenario model as key paths, "*" stands for every
+# list item. Version 0 writers stored them as null, which the JSON Schema rejects.
+OPTIONAL_PATHS = (
+    ('topic', 'industry'),
+    ('topic', 'expectedTimeframe'),
+    ('parties', '*', 'authorityLevel'),
+    ('conflictPoints', '*', 'relatedPoints'),
+    ('negotiablePoints', '*', 'priority'),
+    ('negotiablePoints', '*', 'flexibility'),
+    ('nonNegotiablePoints', '*', 'impact'),
+    ('walkawayConditions', 'party1Conditions', '*', 'reasoning'),
+    ('walkawayConditions', 'party2Conditions', '*', 'reasoning'),
+    ('strategies',),
+    ('strategies', 'relationshipGoals', 'futureInteractions'),
+    ('tactics',),
+    ('tactics', 'persuasionTechniques', '*', 'fallbackOptions'),
+)
+
+
+class MigrationError(Exception):
+    """Exception raised when a record cannot be migrated"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output for the migration tool"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console_handler)
+
+
+def migration(from_version: int) -> Callable:
+    """Register a function upgrading records from from_version to from_version + 1"""
+    def register(func: Callable[[Dict], Dict]) -> Callable[[Dict], Dict]:
+        if from_version in MIGRATIONS:
+            raise ValueError(f"A migration from version {from_version} is already registered")
+        MIGRATIONS[from_version] = func
+        return func
+    return register
+
+
+def record_version(record: Dict) -> int:
+    """Return the schema version of a stored record (0 if unversioned)"""
+    version = record.get(SCHEMA_VERSION_FIELD, 0)
+    return version if isinstance(version, int) else 0
+
+
+def needs_migration(record: Dict) -> bool:
+    """Return True if the record is older than the current schema version"""
+    return record_version(record) < CURRENT_SCHEMA_VERSION
+
+
+def migrate(record: Dict) -> Dict:
+    """Upgrade a record to the current schema version
+
+    Current records are returned as is. Stale records are copied before the
+    migrations run, so a failing migration never leaves a half-upgraded record.
+
+    Args:
+        record (Dict): Stored scenario
+
+    Returns:
+        Dict: The record at CURRENT_SCHEMA_VERSION (or unchanged if it is newer)
+
+    Raises:
+        MigrationError: If a migration is missing or fails
+    """
+    version = record_version(record)
+    if version >= CURRENT_SCHEMA_VERSION:
+        return record
+    migrated = copy.deepcopy(record)
+    while version < CURRENT_SCHEMA_VERSION:
+        step = MIGRATIONS.get(version)
+        if step is None:
+            raise MigrationError(f"No migration registered from schema version {version}")
+        try:
+            migrated = step(migrated)
+        except Exception as e:
+            raise MigrationError(f"Migration {version} -> {version + 1} failed: {str(e)}")
+        version += 1
+        migrated[SCHEMA_VERSION_FIELD] = version
+    return migrated
+
+
+def migrate_all(records: List[Dict]) -> Tuple[List[Dict], int]:
+    """Migrate a list of records, keeping the originals of records that fail
+
+    Returns:
+        Tuple[List[Dict], int]: Records and the number that were upgraded
+    """
+    result = []
+    upgraded = 0
+    for record in records:
+        if needs_migration(record):
+            try:
+                record = migrate(record)
+                upgraded += 1
+            except MigrationError as e:
+                logger.warning(e.message)
+        result.append(record)
+    return result, upgraded
+
+
+def _values_at(node: Any, path: Tuple[str, ...]) -> Iterator[Tuple[Dict, str]]:
+    """Yield (container, key) for every value found at a key path"""
+    if not path:
+        return
+    head, rest = path[0], path[1:]
+    if head == '*':
+        for item in node if isinstance(node, list) else []:
+            yield from _values_at(item, rest)
+    elif isinstance(node, dict) and head in node:
+        if rest:
+            yield from _values_at(node[head], rest)
+        else:
+            yield node, head
+
+
+@migration(0)
+def drop_null_sections(record: Dict) -> Dict:
+    """Omit null optional fields (e.g. "strategies": null) that the JSON Schema rejects
+
+    Version 0 writers saved model_dump() output, which keeps unset optional
+    fields as null. Only those fields are dropped; list items are never removed.
+    """
+    for path in OPTIONAL_PATHS:
+        for container, key in list(_values_at(record, path)):
+            if container[key] is None:
+                del container[key]
+    return record
+
+
+def _write_atomic(path: str, text: str):
+    """Replace a file without readers ever seeing a partial write"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _migrate_document(data: Any) -> Tuple[Any, int]:
+    """Migrate the scenarios of a parsed document, keeping its layout"""
+    from corpus import extract_scenarios
+    if isinstance(data, dict) and isinstance(data.get('scenarios'), list):
+        scenarios, upgraded = migrate_all(data['scenarios'])
+        return dict(data, scenarios=scenarios), upgraded
+    if extract_scenarios(data):
+        scenarios, upgraded = migrate_all([data])
+        return scenarios[0], upgraded
+    return data, 0
+
+
+def compact_file(path: str, dry_run: bool = False) -> int:
+    """Persist migrated records of one file
+
+    The file is only replaced if it did not change while being migrated.
+
+    Args:
+        path (str): Scenario file (.json or NDJSON)
+        dry_run (bool): Count stale records without writing
+
+    Returns:
+        int: Number of records upgraded
+
+    Raises:
+        MigrationError: If the file cannot be read or written
+    """
+    from corpus import NDJSON_EXTENSIONS
+    try:
+        before = os.stat(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = f.read()
+        if path.endswith(NDJSON_EXTENSIONS):
+            lines = []
+            upgraded = 0
+            for line in raw.splitlines():
+                if not line.strip():
+                    continue
+                document, count = _migrate_document(json.loads(line))
+                lines.append(json.dumps(document, ensure_ascii=False))
+                upgraded += count
+            text = '\n'.join(lines) + '\n'
+        else:
+            document, upgraded = _migrate_document(json.loads(raw))
+            text = json.dumps(document, indent=2, ensure_ascii=False)
+        if not upgraded or dry_run:
+            return upgraded
+        current = os.stat(path)
+        if (current.st_mtime_ns, current.st_size) != (before.st_mtime_ns, before.st_size):
+            logger.info(f"Skipped {path}: changed during compaction")
+            return 0
+        _write_atomic(path, text)
+        return upgraded
+    except (IOError, OSError, ValueError) as e:
+        raise MigrationError(f"Cannot compact {path}: {str(e)}")
+
+
+def compact(paths: List[str], dry_run: bool = False) -> Dict[str, int]:
+    """Persist migrated records for every file in paths
+
+    Returns:
+        Dict[str, int]: Files checked, files rewritten, records upgraded and errors
+    """
+    summary = {'files': 0, 'rewritten': 0, 'records': 0, 'errors': 0}
+    for path in paths:
+        summary['files'] += 1
+        try:
+            upgraded = compact_file(path, dry_run)
+        except MigrationError as e:
+            logger.warning(e.message)
+            summary['errors'] += 1
+            continue
+        if upgraded:
+            summary['rewritten'] += 1
+            summary['records'] += upgraded
+    return summary
+
+
+class BackgroundCompactor:
+    """Periodically persist migrated records of the files in a ScenarioIndex
+
+    Files found current are remembered by modification time, so each file
+    is read at most once per change.
+    """
+
+    def __init__(self, index, interval: float):
+        """
+        Args:
+            index (ScenarioIndex): Corpus whose files should be compacted
+            interval (float): Seconds between passes
+        """
+        self.index = index
+        self.interval = interval
+        self._checked: Set[Tuple[str, int]] = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='compactor', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> Dict[str, int]:
+        """Compact files not yet checked at their current modification time"""
+        versions = [v for v in self.index.file_versions() if v not in self._checked]
+        summary = compact([path for path, _ in versions])
+        # Rewritten files get a new mtime and are confirmed on the next pass
+        self._checked.update(versions)
+        if summary['rewritten']:
+            logger.info(f"Compacted {summary['records']} records in {summary['rewritten']} files")
+        return summary
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"Background compaction failed: {str(e)}")
+
+
+def version_counts(root: str) -> Counter:
+    """Count the stored (unmigrated) scenarios of a data root per schema version"""
+    from corpus import CorpusError, ScenarioIndex, load_scenario_file
+    counts = Counter()
+    for path, _ in ScenarioIndex(root).file_versions():
+        try:
+            counts.update(record_version(s) for s in load_scenario_file(path, migrate_records=False))
+        except CorpusError as e:
+            logger.warning(e.message)
+    return counts
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Inspect and compact versioned scenario records")
+    sub = parser.add_subparsers(dest='command', required=True)
+    status = sub.add_parser('status', help="Show how many stored scenarios are at each schema version")
+    status.add_argument('root', nargs='?', default='.', help="Data root")
+    compact_cmd = sub.add_parser('compact', help="Rewrite files holding records older than the current version")
+    compact_cmd.add_argument('root', nargs='?', default='.', help="Data root")
+    compact_cmd.add_argument('--dry-run', action='store_true', help="Only count the stale records")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        if args.command == 'status':
+            counts = version_counts(args.root)
+            logger.info(f"Current schema version: {CURRENT_SCHEMA_VERSION}")
+            for version in sorted(counts):
+                logger.info(f"  version {version}: {counts[version]} scenarios")
+            stale = sum(n for v, n in counts.items() if v < CURRENT_SCHEMA_VERSION)
+            sys.exit(1 if stale else 0)
+
+        from corpus import ScenarioIndex
+        paths = [path for path, _ in ScenarioIndex(args.root).file_versions()]
+        summary = compact(paths, args.dry_run)
+        logger.info(f"Compaction {'dry run ' if args.dry_run else ''}completed: {json.dumps(summary)}")
+        sys.exit(1 if summary['errors'] else 0)
+
+    except KeyboardInterrupt:
+        logger.info("\nCompaction cancelled by user.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,40 @@ Negotiation Scenario Generator using llama3.2 model
 - Requires: pip install -U ollama pydantic python-json-logger
 """
 
+import argparse
 import json
 import datetime
 import re
 import traceback
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Union, get_args, get_origin
 import sys
 import logging
 from logging.handlers import TimedRotatingFileHandler
 import time
 import os
-from ollama import chat
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
+
+from ollama_runtime import (
+    CascadeStats, Cancelled, ChatResult, Deadline, DeadlineExceeded, HedgePolicy, HedgeStats, InferenceProfile,
+    LatencyTracker, OutputStats, ProgressRecorder, add_hedge_arguments, parse_models, positive_int, run_chat,
+    run_hedged_chat, sleep_within
+)
+from diversity import CoverageScheduler, approach_values, seed_prompt
+from deadletter import DEAD_LETTER_PATH, DeadLetterError, DeadLetterQueue
+from genclient import DEFAULT_SOCKET, DaemonClient, DaemonError
+from migrations import migrate
+from profiling import add_profile_arguments, stage_profiler
+from wire_schema import expand_json, wire_schema
+
+# Model cascade, cheapest first; a single entry disables escalation
+DEFAULT_MODEL = 'llama3.2'
+DEFAULT_MODELS = [DEFAULT_MODEL]
+
+# Time limits (seconds); None means unbounded
+DEFAULT_ATTEMPT_TIMEOUT = 180.0
+DEFAULT_ITEM_TIMEOUT = None
+DEFAULT_BATCH_BUDGET = None
+PROGRESS_FILE = 'negotiationgen_progress.json'
 
 # Pydantic models for negotiation structure
 class Topic(BaseModel):
@@ -159,6 +181,12 @@ class ValidationError(NegotiationGenError):
     def __init__(self, message: str):
         super().__init__(message, "VALIDATION_ERROR")
 
+class DeadlineExceededError(NegotiationGenError):
+    """Exception raised when a request, item or batch runs out of time"""
+    def __init__(self, message: str, scope: str = "attempt"):
+        super().__init__(message, f"DEADLINE_EXCEEDED_{scope.upper()}")
+        self.scope = scope
+
 class SchemaValidationError(NegotiationGenError):
     """Exception for schema validation failures"""
     def __init__(self, message: str, field: str):
@@ -214,7 +242,7 @@ def setup_logging():
     
     return logger
 
-logger = setup_logging()
+logger = logging.getLogger('negotiationgen')
 
 def validate_tactics_and_strategies(negotiation: Dict) -> bool:
     """Specific validation for tactics and strategies
@@ -319,12 +347,311 @@ def extract_json_from_response(text: str) -> Tuple[str, bool]:
             
     raise JSONError("Could not extract valid JSON content from response")
 
-def generate_negotiation(system_prompt: str, max_retries: int = 3) -> Dict:
+# Recent request latencies, hedging and cascade counters for this process
+latency_tracker = LatencyTracker()
+hedge_stats = HedgeStats()
+cascade_stats = CascadeStats()
+output_stats = OutputStats()
+
+# Tuned inference options (autotune.py), re-read when the profile changes
+inference_profile = InferenceProfile()
+
+# Sections are repaired by a larger model instead of regenerating the scenario
+# when no more than this share of them failed validation
+SECTION_REPAIR_MAX_SHARE = 0.5
+_section_models: Dict[str, type] = {}
+
+def parse_negotiation(content: str) -> Dict:
+    """Validate raw model output as a negotiation scenario
+    
+    Args:
+        content (str): JSON text returned by the model
+        
+    Returns:
+        Dict: Validated negotiation data
+        
+    Raises:
+        SchemaValidationError: If tactics or strategies are invalid
+        ValidationError: If the scenario does not match the model
+    """
+    try:
+        # Use Pydantic to validate the response
+        negotiation_data = NegotiationScenario.model_validate_json(content).model_dump()
+        
+        # Additional validation for tactics and strategies
+        validate_tactics_and_strategies(negotiation_data)
+        
+        return negotiation_data
+        
+    except SchemaValidationError as e:
+        logger.error(
+            f"Schema validation error in field {e.field}: {e.message}",
+            extra={'field': e.field}
+        )
+        # Keep the raw output so the cascade can repair individual sections
+        e.raw_content = content
+        raise
+    except Exception as e:
+        error = ValidationError(f"Invalid negotiation data structure: {str(e)}")
+        error.raw_content = content
+        raise error
+
+def section_model(name: str) -> type:
+    """Return a wrapper model {name: <section>} used to request or validate one section
+    
+    Optional sections (strategies, tactics) are required in the wrapper since
+    a repair request has to produce them.
+    """
+    if name not in _section_models:
+        annotation = NegotiationScenario.model_fields[name].annotation
+        if get_origin(annotation) is Union:
+            annotation = next(a for a in get_args(annotation) if a is not type(None))
+        _section_models[name] = create_model(
+            f"{name[0].upper()}{name[1:]}Section",
+            **{name: (annotation, ...)}
+        )
+    return _section_models[name]
+
+@stage_profiler.staged('triage')
+def invalid_sections(draft: Dict) -> List[str]:
+    """Return the top-level sections of a draft scenario that fail validation"""
+    failed = []
+    for name, field in NegotiationScenario.model_fields.items():
+        value = draft.get(name)
+        if value is None and not field.is_required():
+            continue
+        try:
+            section_model(name).model_validate({name: value})
+        except Exception:
+            failed.append(name)
+    return failed
+
+def _request(
+    messages: List[Dict[str, str]],
+    model: str,
+    schema_model: type,
+    parse,
+    attempt_timeout: Optional[float],
+    deadlines: List[Optional[Deadline]],
+    cancel_event,
+    hedge: Optional[HedgePolicy],
+    compact_keys: bool = False,
+    options: Optional[Dict[str, Any]] = None
+) -> Tuple[Any, ChatResult]:
+    """Send one structured request (hedged if configured) and parse the response
+    
+    With compact_keys the schema uses short key aliases to cut output tokens;
+    the response is expanded to canonical field names before parsing.
+    """
+    with stage_profiler.stage('schema'):
+        if compact_keys:
+            format = wire_schema(schema_model)
+            parse_canonical = parse
+            parse = lambda content: parse_canonical(expand_json(content, schema_model))
+        else:
+            format = schema_model.model_json_schema()
+    
+    if hedge is not None:
+        # Race a duplicate request once this one is slower than usual; the
+        # responses are parsed on the hedging threads, inside the model stage
+        with stage_profiler.stage('model'):
+            value, result = run_hedged_chat(
+                messages,
+                model,
+                parse,
+                hedge,
+                latency_tracker,
+                hedge_stats,
+                format=format,
+                options=options,
+                timeout=attempt_timeout,
+                deadlines=deadlines,
+                cancel_event=cancel_event
+            )
+        logger.debug(f"API request completed in {result.elapsed:.2f} seconds (host: {result.host or 'default'})")
+        logger.debug(f"Raw API response: {result.content}")
+        output_stats.record(result)
+        return value, result
+    
+    # Stream the response with the Pydantic model schema so the
+    # request can be cut off at its deadline
+    with stage_profiler.stage('model'):
+        result = run_chat(
+            messages=messages,
+            model=model,
+            format=format,
+            options=options,
+            timeout=attempt_timeout,
+            deadlines=deadlines,
+            cancel_event=cancel_event
+        )
+    latency_tracker.record(result.elapsed)
+    
+    # Log API performance
+    logger.debug(f"API request completed in {result.elapsed:.2f} seconds")
+    
+    # Log the raw response for debugging
+    logger.debug(f"Raw API response: {result.content}")
+    
+    with stage_profiler.stage('parse'):
+        value = parse(result.content)
+    output_stats.record(result)
+    return value, result
+
+def repair_sections(
+    draft: Dict,
+    sections: List[str],
+    models: List[str],
+    **request_options
+) -> Dict:
+    """Regenerate failed sections of a draft scenario with larger models
+    
+    Args:
+        draft (Dict): Scenario whose other sections are valid
+        sections (List[str]): Names of the sections to regenerate
+        models (List[str]): Models to try for each section, in order
+        
+    Returns:
+        Dict: Draft with the repaired sections
+        
+    Raises:
+        ValidationError: If a section fails on every model
+    """
+    context = {k: draft[k] for k in ('topic', 'parties') if k in draft and k not in sections}
+    for name in sections:
+        wrapper = section_model(name)
+        with stage_profiler.stage('prompt'):
+            messages = [
+                {
+                    'role': 'user',
+                    'content': (
+                        f'Generate only the "{name}" section of a negotiation scenario, '
+                        f'as a JSON object with the single key "{name}".\n'
+                        "Scenario context:\n"
+                        f"{json.dumps(context, ensure_ascii=False)}"
+                    )
+                }
+            ]
+        
+        def parse_section(content: str) -> Any:
+            try:
+                return wrapper.model_validate_json(content).model_dump()[name]
+            except Exception as e:
+                raise ValidationError(f"Invalid {name} section: {str(e)}")
+        
+        for model in models:
+            start_time = time.monotonic()
+            try:
+                draft[name], _ = _request(messages, model, wrapper, parse_section,
+                                          **request_options)
+                cascade_stats.record(model, time.monotonic() - start_time, True, section=True)
+                logger.info(f"Section {name} repaired with {model}")
+                break
+            except ValidationError as e:
+                cascade_stats.record(model, time.monotonic() - start_time, False, section=True)
+                logger.warning(f"Section {name} still invalid with {model}: {e.message}")
+        else:
+            raise ValidationError(f"Section {name} failed validation on every model")
+    return draft
+
+def generate_with_cascade(
+    messages: List[Dict[str, str]],
+    models: List[str],
+    **request_options
+) -> Dict:
+    """Generate a scenario trying the cheapest model first
+    
+    Output that fails validation is escalated to the next model. When only
+    a few sections are invalid, just those sections are regenerated by the
+    larger models and the rest of the draft is kept.
+    
+    Raises:
+        ValidationError: If no model produced a valid scenario
+    """
+    last_error = None
+    for tier, model in enumerate(models):
+        start_time = time.monotonic()
+        try:
+            negotiation_data, _ = _request(messages, model, NegotiationScenario, parse_negotiation,
+                                           **request_options)
+            cascade_stats.record(model, time.monotonic() - start_time, True)
+            return negotiation_data
+        except (ValidationError, SchemaValidationError) as e:
+            cascade_stats.record(model, time.monotonic() - start_time, False)
+            last_error = e
+            larger_models = models[tier + 1:]
+            if not larger_models:
+                break
+            
+            try:
+                draft = json.loads(getattr(e, 'raw_content', None) or '')
+            except json.JSONDecodeError:
+                draft = None
+            if isinstance(draft, dict):
+                failed = invalid_sections(draft)
+                if failed and len(failed) <= SECTION_REPAIR_MAX_SHARE * len(NegotiationScenario.model_fields):
+                    logger.info(f"Escalating sections {', '.join(failed)} from {model}")
+                    try:
+                        repaired = repair_sections(draft, failed, larger_models, **request_options)
+                        return parse_negotiation(json.dumps(repaired, ensure_ascii=False))
+                    except (ValidationError, SchemaValidationError) as repair_error:
+                        if getattr(repair_error, 'raw_content', None) is None:
+                            # The draft is the last raw response a dead letter can keep
+                            repair_error.raw_content = getattr(e, 'raw_content', None)
+                        last_error = repair_error
+            logger.info(f"Escalating scenario from {model} to {larger_models[0]}: {str(e)}")
+    raise last_error
+
+def repair_draft(raw_response: str, models: List[str], **request_options) -> Dict:
+    """Turn a stored invalid response into a valid scenario, regenerating only its failed sections
+    
+    Used to replay dead letters (deadletter.py --repair).
+    
+    Raises:
+        ValidationError: If the response is not a JSON object or a section cannot be repaired
+        SchemaValidationError: If the repaired scenario still fails the tactics/strategies checks
+    """
+    try:
+        draft = json.loads(raw_response)
+    except json.JSONDecodeError as e:
+        raise ValidationError(f"Stored response is not JSON: {str(e)}")
+    if not isinstance(draft, dict):
+        raise ValidationError("Stored response is not a JSON object")
+    failed = invalid_sections(draft)
+    if not failed:
+        try:
+            return parse_negotiation(raw_response)
+        except SchemaValidationError as e:
+            if e.field not in NegotiationScenario.model_fields:
+                raise
+            failed = [e.field]
+    logger.info(f"Repairing sections {', '.join(failed)} with {', '.join(models)}")
+    repaired = repair_sections(draft, failed, models, **request_options)
+    return parse_negotiation(json.dumps(repaired, ensure_ascii=False))
+
+def generate_negotiation(
+    system_prompt: str,
+    max_retries: int = 3,
+    attempt_timeout: Optional[float] = DEFAULT_ATTEMPT_TIMEOUT,
+    deadlines: List[Optional[Deadline]] = (),
+    cancel_event=None,
+    hedge: Optional[HedgePolicy] = None,
+    models: Optional[List[str]] = None,
+    compact_keys: bool = False,
+    options: Optional[Dict[str, Any]] = None
+) -> Dict:
     """Generate a negotiation scenario using Ollama chat with enhanced error handling
     
     Args:
         system_prompt (str): Additional prompt instructions
         max_retries (int): Maximum number of retry attempts
+        attempt_timeout (Optional[float]): Seconds allowed for a single request
+        deadlines (List[Optional[Deadline]]): Item/batch deadlines bounding all attempts
+        cancel_event (Optional[threading.Event]): Set to abandon the request cooperatively
+        hedge (Optional[HedgePolicy]): Duplicate slow requests according to this policy
+        models (Optional[List[str]]): Model cascade, cheapest first
+        compact_keys (bool): Request short JSON keys to reduce output tokens
+        options (Optional[Dict[str, Any]]): Ollama inference options (default: the tuned profile)
         
     Returns:
         Dict: Generated negotiation data in dictionary format
@@ -333,18 +660,20 @@ def generate_negotiation(system_prompt: str, max_retries: int = 3) -> Dict:
         APIError: If API connection or response is invalid
         JSONError: If JSON processing fails
         ValidationError: If negotiation data is invalid
+        DeadlineExceededError: If an item or batch deadline is reached
     """
     retry_count = 0
     last_error = None
+    last_raw = None
+    if options is None:
+        options = inference_profile.options('negotiation')
     
     while retry_count < max_retries:
         try:
-            start_time = time.time()
             logger.debug(f"Attempt {retry_count + 1}/{max_retries}: Sending request to Ollama")
             
-            # Use ollama.chat() with Pydantic model schema
-            response = chat(
-                messages=[
+            with stage_profiler.stage('prompt'):
+                messages = [
                     {
                         'role': 'user',
                         'content': (
@@ -352,59 +681,60 @@ def generate_negotiation(system_prompt: str, max_retries: int = 3) -> Dict:
                             f"{system_prompt}"
                         )
                     }
-                ],
-                model='llama3.2',
-                format=NegotiationScenario.model_json_schema()
-            )
-            
-            # Log API performance
-            elapsed = time.time() - start_time
-            logger.debug(f"API request completed in {elapsed:.2f} seconds")
-            
-            # Log the raw response for debugging
-            logger.debug(f"Raw API response: {response.message.content}")
+                ]
             
-            try:
-                # Use Pydantic to validate the response
-                negotiation_data = NegotiationScenario.model_validate_json(
-                    response.message.content
-                ).model_dump()
-                
-                # Additional validation for tactics and strategies
-                validate_tactics_and_strategies(negotiation_data)
-                
-                return negotiation_data
-                
-            except SchemaValidationError as e:
-                logger.error(
-                    f"Schema validation error in field {e.field}: {e.message}",
-                    extra={'field': e.field}
-                )
-                raise
-            except Exception as e:
-                raise ValidationError(f"Invalid negotiation data structure: {str(e)}")
+            return generate_with_cascade(
+                messages,
+                models or DEFAULT_MODELS,
+                attempt_timeout=attempt_timeout,
+                deadlines=deadlines,
+                cancel_event=cancel_event,
+                hedge=hedge,
+                compact_keys=compact_keys,
+                options=options
+            )
             
+        except Cancelled as e:
+            raise DeadlineExceededError(f"Request cancelled: {str(e)}", "cancelled")
         except Exception as e:
             last_error = e
+            # Kept on the final error for the dead-letter queue
+            last_raw = getattr(e, 'raw_content', None) or last_raw
             retry_count += 1
+            # Item and batch deadlines end the retries; a per-attempt timeout does not
+            expired = next((d for d in deadlines if d is not None and d.expired()), None)
+            if expired is not None:
+                logger.error(f"{expired.scope.capitalize()} deadline reached after {retry_count} attempts: {str(e)}")
+                error = DeadlineExceededError(f"{expired.scope} deadline exceeded: {str(e)}", expired.scope)
+                error.raw_content = last_raw
+                raise error
             if retry_count < max_retries:
                 wait_time = 2 ** retry_count  # Exponential backoff
                 logger.warning(
                     f"Error on attempt {retry_count}: {str(e)}. "
                     f"Retrying in {wait_time} seconds..."
                 )
-                time.sleep(wait_time)
+                try:
+                    sleep_within(wait_time, deadlines, cancel_event)
+                except (DeadlineExceeded, Cancelled) as stop:
+                    raise DeadlineExceededError(f"Stopped during backoff: {str(stop)}",
+                                                getattr(stop, 'scope', 'cancelled'))
             else:
                 logger.error(
                     f"Failed after {max_retries} attempts: {str(e)}",
                     exc_info=True,
                     stack_info=True
                 )
-                if "connection" in str(e).lower():
-                    raise APIError(f"Connection error: {str(e)}")
+                if isinstance(e, DeadlineExceeded):
+                    error = DeadlineExceededError(f"Request timed out: {str(e)}", "attempt")
+                elif "connection" in str(e).lower():
+                    error = APIError(f"Connection error: {str(e)}")
                 else:
-                    raise NegotiationGenError(f"Failed to generate negotiation: {str(e)}")
+                    error = NegotiationGenError(f"Failed to generate negotiation: {str(e)}")
+                error.raw_content = last_raw
+                raise error
 
+@stage_profiler.staged('validate')
 def validate_negotiation(negotiation: Dict) -> bool:
     """Validate the negotiation JSON structure using Pydantic
     
@@ -449,46 +779,27 @@ def validate_negotiation(negotiation: Dict) -> bool:
         )
         raise ValidationError(f"Validation failed: {str(e)}")
 
-def main():
-    """Main function to run the negotiation generator with enhanced error handling"""
-    start_time = time.time()
-    process_id = os.getpid()
-    logger.info(f"Starting negotiation generation process (PID: {process_id})")
-    
-    try:
-        # Get number of scenarios to generate
-        while True:
-            try:
-                num_scenarios = int(input("How many negotiation scenarios would you like to generate? "))
-                if num_scenarios > 0:
-                    break
-                logger.warning(
-                    f"User entered invalid number: {num_scenarios}",
-                    extra={'user_input': num_scenarios}
-                )
-                print("Please enter a positive number.")
-            except ValueError as e:
-                logger.warning(
-                    "User entered non-numeric value",
-                    extra={'error': str(e)}
-                )
-                print("Please enter a valid number.")
+@stage_profiler.staged('save')
+def save_scenario(scenario: Dict, directory: str = "") -> str:
+    """Save one scenario as {"scenarios": [...]} in a file named after its title
 
-        # Generate scenarios
-        successful_generations = 0
-        total_attempts = 0
-        generated_files = []
+    The record is stamped with the current schema version before it is written.
+    
+    Returns:
+        str: Path of the written file
         
-        for i in range(num_scenarios):
-            logger.info(f"Generating scenario {i+1}/{num_scenarios}...")
-            generation_start = time.time()
-            attempts = 0
-            max_attempts = 3
-            
-            while attempts < max_attempts:
-                try:
-                    total_attempts += 1
-                    system_prompt = """
+    Raises:
+        IOError: If the file cannot be written
+    """
+    timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    safe_title = re.sub(r'[^\w\-]', '_', scenario["topic"]["title"])
+    filename = os.path.join(directory, f"{safe_title}_{timestamp}.json")
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({"scenarios": [migrate(scenario)]}, f, indent=2, ensure_ascii=False)
+    return filename
+
+# Prompt sent with every request
+SYSTEM_PROMPT = """
 Generate a negotiation scenario following this exact JSON structure:
 {
   "negotiationId": "A unique identifier",
@@ -626,22 +937,190 @@ Guidelines:
 - Include comprehensive tactics and strategies
 - Make sure negotiation approaches match the context
 """
-                    scenario = generate_negotiation(system_prompt)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line options for the generator"""
+    parser = argparse.ArgumentParser(description="Generate negotiation scenarios with Ollama")
+    parser.add_argument('--attempt-timeout', type=float, default=DEFAULT_ATTEMPT_TIMEOUT,
+                        help="Seconds allowed for a single Ollama request")
+    parser.add_argument('--item-timeout', type=float, default=DEFAULT_ITEM_TIMEOUT,
+                        help="Seconds allowed per scenario across all retries")
+    parser.add_argument('--batch-budget', type=float, default=DEFAULT_BATCH_BUDGET,
+                        help="Seconds allowed for the whole batch")
+    add_hedge_arguments(parser)
+    parser.add_argument('--compact-keys', action='store_true',
+                        help="Generate with short JSON keys and expand them before validation")
+    parser.add_argument('--models', type=parse_models, default=DEFAULT_MODELS,
+                        help="Comma-separated model cascade, cheapest first (e.g. llama3.2:1b,llama3.2)")
+    parser.add_argument('--progress-file', default=PROGRESS_FILE,
+                        help="Where batch progress is recorded")
+    parser.add_argument('--count', type=positive_int, default=None,
+                        help="Number of negotiation scenarios to generate (asked interactively if omitted)")
+    parser.add_argument('--diverse', action='store_true',
+                        help="Seed each request with the least covered industry/deal type/parties/approach")
+    parser.add_argument('--data-root', default='.',
+                        help="Existing scenarios the --diverse scheduler steers away from")
+    parser.add_argument('--daemon', nargs='?', const=DEFAULT_SOCKET, default=None, metavar='SOCKET',
+                        help="Run the batch on the generator daemon (gendaemon.py) instead of in this process")
+    parser.add_argument('--dead-letters', default=DEAD_LETTER_PATH,
+                        help="Where scenarios that fail every attempt are queued for replay (deadletter.py)")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+def record_dead_letter(
+    dead_letters: DeadLetterQueue,
+    args: argparse.Namespace,
+    item: int,
+    prompt: str,
+    seed: Optional[Dict],
+    error: Exception,
+    attempts: int
+):
+    """Queue a failed scenario for replay so the batch can go on"""
+    try:
+        letter_id = dead_letters.add(
+            'negotiation',
+            error,
+            prompt,
+            item=item,
+            seed=seed,
+            models=args.models,
+            compact_keys=args.compact_keys,
+            attempts=attempts,
+            schema_model=NegotiationScenario
+        )
+    except DeadLetterError as e:
+        logger.error(f"Scenario {item} could not be queued for replay: {e.message}")
+        print(f"Failed to generate scenario {item}. Check error.log for details.")
+        return
+    logger.error(f"Scenario {item} queued in {dead_letters.path} as {letter_id}")
+    print(f"Failed to generate scenario {item}; queued for replay as {letter_id}.")
+
+def generate_with_daemon(args: argparse.Namespace, count: int) -> int:
+    """Run the batch on the generator daemon, saving scenarios as they stream back
+    
+    Returns:
+        int: Number of scenarios saved
+        
+    Raises:
+        DaemonError: If the daemon is not running or rejects the request
+    """
+    fields = dict(models=args.models, compact_keys=args.compact_keys, attempt_timeout=args.attempt_timeout,
+                  item_timeout=args.item_timeout, budget=args.batch_budget)
+    if args.diverse:
+        fields.update(diverse=True, data_root=os.path.abspath(args.data_root))
+    saved = 0
+    for event in DaemonClient(args.daemon).generate('negotiation', count, **fields):
+        if event['event'] == 'accepted':
+            logger.info(f"Daemon accepted the batch as {event['job']}")
+        elif event['event'] == 'item':
+            filename = save_scenario(event['data'])
+            saved += 1
+            logger.info(f"Received scenario {event['item']}/{count} in {event['seconds']:.2f}s, saved to {filename}")
+        elif event['event'] == 'failed':
+            logger.error(f"Scenario {event['item']} failed on the daemon: {event['error']}")
+        elif event['event'] == 'done' and 'diversity' in event:
+            print(f"Diversity: {event['diversity']}")
+    return saved
+
+def main():
+    """Main function to run the negotiation generator with enhanced error handling"""
+    args = parse_args()
+    setup_logging()
+    start_time = time.time()
+    process_id = os.getpid()
+    logger.info(f"Starting negotiation generation process (PID: {process_id})")
+    if stage_profiler.start_from_args(args, [logger]):
+        logger.info(f"Profiling pipeline stages ({args.profile or 'timings only'})")
+    tuned_options = inference_profile.options('negotiation')
+    if tuned_options:
+        logger.info(f"Using inference options from {inference_profile.path}: {tuned_options}")
+    successful_generations = 0
+    progress = None
+    
+    try:
+        # Get number of scenarios to generate (--count skips the prompt)
+        num_scenarios = args.count
+        while args.count is None:
+            try:
+                num_scenarios = int(input("How many negotiation scenarios would you like to generate? "))
+                if num_scenarios > 0:
+                    break
+                logger.warning(
+                    f"User entered invalid number: {num_scenarios}",
+                    extra={'user_input': num_scenarios}
+                )
+                print("Please enter a positive number.")
+            except ValueError as e:
+                logger.warning(
+                    "User entered non-numeric value",
+                    extra={'error': str(e)}
+                )
+                print("Please enter a valid number.")
+
+        if args.daemon:
+            try:
+                saved = generate_with_daemon(args, num_scenarios)
+            except DaemonError as e:
+                logger.error(e.message)
+                print(f"{e.message}. Start it with: python gendaemon.py")
+                sys.exit(1)
+            print(f"\nSuccessfully generated {saved} scenarios.")
+            sys.exit(0 if saved == num_scenarios else 1)
+
+        # Generate scenarios
+        total_attempts = 0
+        generated_files = []
+        batch_status = 'completed'
+        batch_deadline = Deadline(args.batch_budget, scope="batch")
+        progress = ProgressRecorder(args.progress_file, 'negotiation', num_scenarios)
+        dead_letters = DeadLetterQueue(args.dead_letters)
+        hedge_policy = HedgePolicy.from_args(args)
+        coverage = (CoverageScheduler.from_corpus(args.data_root, approaches=approach_values(Strategy))
+                    if args.diverse else None)
+        if coverage is not None:
+            logger.info(f"Diverse seeding over {coverage.existing} existing scenarios: {coverage.coverage()}")
+        
+        for i in range(num_scenarios):
+            if batch_deadline.expired():
+                logger.warning(f"Batch budget exhausted before scenario {i+1}/{num_scenarios}")
+                batch_status = 'budget_exhausted'
+                break
+            logger.info(f"Generating scenario {i+1}/{num_scenarios}...")
+            generation_start = time.time()
+            item_deadline = Deadline(args.item_timeout, scope="item")
+            deadlines = [item_deadline, batch_deadline]
+            attempts = 0
+            max_attempts = 3
+            # Retries keep the item's seed; the seed is released when the item ends
+            with stage_profiler.stage('diversity'):
+                seed = coverage.next_seed() if coverage is not None else None
+                prompt = seed_prompt(SYSTEM_PROMPT, seed) if seed is not None else SYSTEM_PROMPT
+            accepted = None
+            
+            while attempts < max_attempts:
+                try:
+                    total_attempts += 1
+                    with stage_profiler.stage('progress'):
+                        progress.item_started(i + 1, attempts + 1)
+                    scenario = generate_negotiation(
+                        prompt,
+                        attempt_timeout=args.attempt_timeout,
+                        deadlines=deadlines,
+                        hedge=hedge_policy,
+                        models=args.models,
+                        compact_keys=args.compact_keys
+                    )
                     
                     # Validate the generated scenario
                     if validate_negotiation(scenario):
-                        # Create unique filename for this scenario
-                        timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-                        title = scenario["topic"]["title"]
-                        safe_title = re.sub(r'[^\w\-]', '_', title)
-                        filename = f"{safe_title}_{timestamp}.json"
-                        
-                        # Save individual scenario to file wrapped in scenarios array
                         try:
-                            with open(filename, 'w', encoding='utf-8') as f:
-                                json.dump({"scenarios": [scenario]}, f, indent=2, ensure_ascii=False)
+                            filename = save_scenario(scenario)
                             generated_files.append(filename)
                             successful_generations += 1
+                            accepted = scenario
+                            with stage_profiler.stage('progress'):
+                                progress.item_completed(filename)
                             generation_time = time.time() - generation_start
                             logger.info(
                                 f"Successfully generated scenario {i+1} "
@@ -658,7 +1137,22 @@ Guidelines:
                             attempts += 1
                             continue
                         
-                except (APIError, JSONError, ValidationError, SchemaValidationError) as e:
+                except DeadlineExceededError as e:
+                    if e.scope in ('item', 'batch'):
+                        # Give up on this item (or the batch) instead of stalling behind it
+                        logger.error(f"Scenario {i+1} stopped: {e.message}")
+                        progress.item_failed(i + 1, e.message)
+                        print(f"Scenario {i+1} ran out of time ({e.scope} deadline).")
+                        if e.scope == 'item':
+                            record_dead_letter(dead_letters, args, i + 1, prompt, seed, e, attempts + 1)
+                        break
+                    attempts += 1
+                    logger.error(f"Timed out on attempt {attempts}/{max_attempts}: {e.message}")
+                    if attempts >= max_attempts:
+                        progress.item_failed(i + 1, e.message)
+                        record_dead_letter(dead_letters, args, i + 1, prompt, seed, e, attempts)
+                        
+                except NegotiationGenError as e:
                     attempts += 1
                     logger.error(
                         f"Error on attempt {attempts}/{max_attempts}: {str(e)}",
@@ -667,15 +1161,34 @@ Guidelines:
                     )
                     if attempts < max_attempts:
                         print(f"Error occurred, retrying... ({attempts}/{max_attempts})")
-                        time.sleep(2 ** attempts)  # Exponential backoff
+                        try:
+                            sleep_within(2 ** attempts, deadlines)  # Exponential backoff
+                        except DeadlineExceeded as stop:
+                            logger.error(f"Scenario {i+1} stopped during backoff: {stop.message}")
+                            progress.item_failed(i + 1, stop.message)
+                            if stop.scope == 'item':
+                                record_dead_letter(dead_letters, args, i + 1, prompt, seed, e, attempts)
+                            break
                     else:
                         logger.error(
                             f"Failed to generate scenario {i+1} after {max_attempts} attempts",
                             exc_info=True,
                             stack_info=True
                         )
-                        print(f"Failed to generate scenario {i+1}. Check error.log for details.")
-                        sys.exit(1)
+                        progress.item_failed(i + 1, str(e))
+                        # One bad item does not cost the rest of the batch
+                        record_dead_letter(dead_letters, args, i + 1, prompt, seed, e, attempts)
+            
+            if coverage is not None:
+                with stage_profiler.stage('diversity'):
+                    unique = coverage.record(seed, accepted, time.time() - generation_start)
+                if unique is False:
+                    logger.info(f"Scenario {i+1} is a near-duplicate of an existing scenario")
+            
+            if batch_deadline.expired() and i + 1 < num_scenarios:
+                batch_status = 'budget_exhausted'
+                logger.warning(f"Batch budget exhausted after scenario {i+1}/{num_scenarios}")
+                break
             
         # Log final statistics
         total_time = time.time() - start_time
@@ -687,15 +1200,36 @@ Guidelines:
                     'scenarios_requested': num_scenarios,
                     'scenarios_generated': successful_generations,
                     'total_attempts': total_attempts,
-                    'success_rate': f"{(successful_generations/total_attempts)*100:.1f}%"
+                    'success_rate': f"{(successful_generations/max(total_attempts, 1))*100:.1f}%",
+                    'status': batch_status,
+                    'dead_letters': dead_letters.added,
+                    **(hedge_stats.as_dict() if hedge_policy is not None else {}),
+                    'models': cascade_stats.as_dict(),
+                    'output': {'keys': 'compact' if args.compact_keys else 'canonical', **output_stats.as_dict()},
+                    **({'diversity': coverage.as_dict()} if coverage is not None else {})
                 }
             }
         )
+        progress.finish(batch_status)
         
         print(f"\nSuccessfully generated {successful_generations} scenarios.")
+        if dead_letters.added:
+            print(f"{dead_letters.added} failed scenarios queued in {dead_letters.path} "
+                  f"(replay with: python deadletter.py replay)")
+        if hedge_policy is not None:
+            print(f"Hedging: {hedge_stats.as_dict()}")
+        print(f"Output ({'compact' if args.compact_keys else 'canonical'} keys): {output_stats.as_dict()}")
+        if coverage is not None:
+            print(f"Diversity: {coverage.as_dict()}")
+        if len(args.models) > 1:
+            print("Model cascade:")
+            for model, tier in cascade_stats.as_dict().items():
+                print(f"- {model}: {tier}")
         print("Files generated:")
         for file in generated_files:
             print(f"- {file}")
+        if stage_profiler.enabled:
+            print(stage_profiler.finish(args.profile_output, 'negotiation'))
 
     except KeyboardInterrupt:
         elapsed_time = time.time() - start_time
@@ -704,6 +1238,11 @@ Guidelines:
             extra={'partial_completion': successful_generations}
         )
         print("\nOperation cancelled by user.")
+        if progress is not None:
+            progress.finish('interrupted')
+            print(f"Progress recorded in {progress.path}")
+        if stage_profiler.enabled:
+            print(stage_profiler.finish(args.profile_output, 'negotiation'))
         sys.exit(0)
         
     except Exception as e:
@@ -717,6 +1256,8 @@ Guidelines:
                 'partial_completion': successful_generations
             }
         )
+        if progress is not None:
+            progress.finish('failed')
         print("An unexpected error occurred. Check error.log for details.")
         sys.exit(1)
 
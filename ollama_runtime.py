@@ -0,0 +1,620 @@
+"""
+Shared Ollama call runtime for the character and negotiation generators
+- Streams chat responses so a request can be abandoned between chunks
+- Enforces per-attempt timeouts and absolute per-item / per-batch deadlines; a watchdog
+  shuts a stalled connection down at the deadline instead of after a full read timeout
+- Closes the HTTP connection on cancellation so Ollama stops generating
+- Records batch progress so interrupted runs leave a trace of where they stopped
+- Optionally hedges slow requests with a duplicate sent to another endpoint
+- Tracks per-model results for cheapest-first model cascades
+- Loads tuned inference options per workload from the profile written by autotune.py
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from ollama import Client
+from pydantic import BaseModel
+
+logger = logging.getLogger('ollama_runtime')
+
+# Tuned options written by autotune.py and loaded by both generators
+PROFILE_PATH = os.environ.get('OLLAMA_PROFILE', 'ollama_profile.json')
+TUNABLE_OPTIONS = ('num_ctx', 'num_thread', 'num_batch', 'num_predict', 'temperature')
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its timeout or deadline"""
+    def __init__(self, message: str, scope: str = "attempt"):
+        self.message = message
+        self.scope = scope
+        super().__init__(self.message)
+
+
+class Cancelled(Exception):
+    """Raised when a request is cancelled through its cancel event"""
+
+
+class Deadline:
+    """Absolute point in time after which work must stop
+
+    A Deadline created with seconds=None never expires, so callers can pass
+    one around unconditionally.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, scope: str = "item"):
+        self.scope = scope
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None for an unbounded deadline"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has passed"""
+        if self.expired():
+            raise DeadlineExceeded(f"{self.scope} deadline exceeded", self.scope)
+
+
+def time_budget(timeout: Optional[float], deadlines: List[Optional[Deadline]]) -> Optional[float]:
+    """Return the tightest of a timeout and the remaining time of some deadlines"""
+    budgets = [timeout] if timeout is not None else []
+    budgets += [d.remaining() for d in deadlines if d is not None and d.remaining() is not None]
+    return min(budgets) if budgets else None
+
+
+def sleep_within(seconds: float, deadlines: List[Optional[Deadline]] = (),
+                 cancel_event: Optional[threading.Event] = None):
+    """Sleep for a backoff period without overrunning a deadline
+
+    Raises:
+        DeadlineExceeded: If a deadline expires before the sleep would end
+        Cancelled: If the cancel event is set while sleeping
+    """
+    budget = time_budget(None, list(deadlines))
+    wait = seconds if budget is None else min(seconds, budget)
+    if cancel_event is not None:
+        if cancel_event.wait(wait):
+            raise Cancelled("Cancelled during backoff")
+    else:
+        time.sleep(wait)
+    for deadline in deadlines:
+        if deadline is not None:
+            deadline.check()
+
+
+class ConnectionWatchdog:
+    """Shut down the connection of a streamed response once a deadline passes
+
+    httpx timeouts apply to each network operation, so a stream that stalls
+    just before the deadline could run a whole read timeout past it. The
+    watchdog takes the socket from the response (as an httpx response hook)
+    and shuts it down at the deadline, which ends a blocked read at once.
+    """
+
+    def __init__(self, stop_at: float):
+        self.fired = False
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(max(stop_at - time.monotonic(), 0.0), self._fire)
+        self._timer.daemon = True
+
+    def attach(self, response: httpx.Response):
+        stream = response.extensions.get('network_stream')
+        sock = stream.get_extra_info('socket') if stream is not None else None
+        with self._lock:
+            self._sock = sock
+            fired = self.fired
+        if fired:
+            self._shutdown(sock)
+
+    def start(self):
+        self._timer.start()
+
+    def cancel(self):
+        self._timer.cancel()
+
+    def _fire(self):
+        with self._lock:
+            self.fired = True
+            sock = self._sock
+        self._shutdown(sock)
+
+    @staticmethod
+    def _shutdown(sock: Optional[socket.socket]):
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class ChatResult(BaseModel):
+    """Outcome of one streamed chat request"""
+    content: str
+    model: str
+    host: Optional[str] = None
+    elapsed: float
+    eval_count: Optional[int] = None
+    prompt_eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+
+
+def run_chat(
+    messages: List[Dict[str, str]],
+    model: str,
+    format: Any = None,
+    options: Optional[Dict[str, Any]] = None,
+    host: Optional[str] = None,
+    timeout: Optional[float] = None,
+    deadlines: List[Optional[Deadline]] = (),
+    cancel_event: Optional[threading.Event] = None,
+) -> ChatResult:
+    """Run a streamed chat request bounded by a timeout and deadlines
+
+    The response is streamed so the deadline and cancel event can be checked
+    after every chunk, and a ConnectionWatchdog ends reads that stall past the
+    deadline. Leaving the stream closes the HTTP connection, which makes
+    Ollama abort the generation instead of finishing it unseen.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat messages
+        model (str): Ollama model name
+        format (Any): JSON schema or "json" for structured output
+        options (Optional[Dict[str, Any]]): Ollama inference options
+        host (Optional[str]): Ollama endpoint (defaults to OLLAMA_HOST)
+        timeout (Optional[float]): Per-attempt timeout in seconds
+        deadlines (List[Optional[Deadline]]): Item/batch deadlines that also bound the attempt
+        cancel_event (Optional[threading.Event]): Set to abandon the request
+
+    Returns:
+        ChatResult: Concatenated content with timing and token counts
+
+    Raises:
+        DeadlineExceeded: If the timeout or a deadline is reached
+        Cancelled: If the cancel event is set
+    """
+    for deadline in deadlines:
+        if deadline is not None:
+            deadline.check()
+    budget = time_budget(timeout, list(deadlines))
+    start_time = time.monotonic()
+    stop_at = start_time + budget if budget is not None else None
+
+    watchdog = ConnectionWatchdog(stop_at) if stop_at is not None else None
+    client = Client(host=host, timeout=budget,
+                    event_hooks={'response': [watchdog.attach]} if watchdog is not None else None)
+    parts = []
+    final = None
+    stream = None
+    try:
+        if watchdog is not None:
+            watchdog.start()
+        stream = client.chat(
+            model=model,
+            messages=messages,
+            format=format,
+            options=options,
+            stream=True
+        )
+        for chunk in stream:
+            parts.append(chunk.message.content or '')
+            if chunk.done:
+                final = chunk
+            if cancel_event is not None and cancel_event.is_set():
+                raise Cancelled("Request cancelled")
+            if stop_at is not None and time.monotonic() >= stop_at:
+                raise DeadlineExceeded(f"Request exceeded its {budget:.1f}s budget")
+        if final is None and watchdog is not None and watchdog.fired:
+            raise DeadlineExceeded(f"Request exceeded its {budget:.1f}s budget")
+    except httpx.TransportError as e:
+        # A read ended by the watchdog surfaces as a read or protocol error
+        if not isinstance(e, httpx.TimeoutException) and not (watchdog is not None and watchdog.fired):
+            raise
+        raise DeadlineExceeded(f"Request timed out after {time.monotonic() - start_time:.1f}s: {str(e)}")
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        if stream is not None:
+            stream.close()
+        client.close()
+
+    return ChatResult(
+        content=''.join(parts),
+        model=model,
+        host=host,
+        elapsed=time.monotonic() - start_time,
+        eval_count=getattr(final, 'eval_count', None),
+        prompt_eval_count=getattr(final, 'prompt_eval_count', None),
+        eval_duration=getattr(final, 'eval_duration', None)
+    )
+
+
+class LatencyTracker:
+    """Sliding window of recent successful request latencies"""
+
+    def __init__(self, window: int = 100):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-quantile (0-1) of recent latencies, or None without samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def mean_above(self, seconds: float) -> Optional[float]:
+        """Mean of the recent latencies longer than the given value"""
+        with self._lock:
+            tail = [s for s in self._samples if s > seconds]
+        return sum(tail) / len(tail) if tail else None
+
+
+class HedgePolicy(BaseModel):
+    """When and where to send a duplicate request"""
+    percentile: float = 0.9
+    hosts: List[Optional[str]] = [None]
+    min_samples: int = 5
+    initial_delay: Optional[float] = None
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> Optional['HedgePolicy']:
+        """Build a policy from the options added by add_hedge_arguments"""
+        if not args.hedge:
+            return None
+        return cls(
+            percentile=args.hedge_percentile,
+            hosts=[None] + (args.hedge_host or []),
+            initial_delay=args.hedge_delay
+        )
+
+    def delay(self, tracker: LatencyTracker) -> Optional[float]:
+        """Seconds to wait for the primary request before hedging"""
+        if len(tracker) >= self.min_samples:
+            return tracker.percentile(self.percentile)
+        return self.initial_delay
+
+
+def add_hedge_arguments(parser: argparse.ArgumentParser):
+    """Add the hedging options shared by both generators"""
+    parser.add_argument('--hedge', action='store_true',
+                        help="Send a duplicate request when one is slower than usual")
+    parser.add_argument('--hedge-percentile', type=float, default=0.9,
+                        help="Latency percentile (0-1) after which a request is hedged")
+    parser.add_argument('--hedge-host', action='append',
+                        help="Extra Ollama endpoint for hedge requests (repeatable)")
+    parser.add_argument('--hedge-delay', type=float, default=None,
+                        help="Hedge delay in seconds until enough latencies are recorded")
+
+
+class HedgeStats:
+    """Counters reported in the run statistics"""
+
+    def __init__(self):
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.estimated_saved = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'hedged_requests': self.hedged,
+            'hedge_rate': f"{(self.hedged / max(self.requests, 1)) * 100:.1f}%",
+            'hedge_wins': self.hedge_wins,
+            'estimated_latency_saved': f"{self.estimated_saved:.2f}s"
+        }
+
+
+def run_hedged_chat(
+    messages: List[Dict[str, str]],
+    model: str,
+    parse: Callable[[str], Any],
+    policy: HedgePolicy,
+    tracker: LatencyTracker,
+    stats: HedgeStats,
+    format: Any = None,
+    options: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    deadlines: List[Optional[Deadline]] = (),
+    cancel_event: Optional[threading.Event] = None,
+) -> Tuple[Any, ChatResult]:
+    """Run a chat request and hedge it once it is slower than usual
+
+    The primary request goes to the first host. If it has not produced a
+    valid response after the policy's latency percentile, a duplicate is sent
+    to the next host (or the same one if only one is configured). The first
+    response that parses wins and the other request is cancelled.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat messages
+        model (str): Ollama model name
+        parse (Callable[[str], Any]): Validates the content, raising on invalid output
+        policy (HedgePolicy): Hedge delay and endpoints
+        tracker (LatencyTracker): Recent latencies for this workload
+        stats (HedgeStats): Counters updated with the outcome
+        format (Any): JSON schema for structured output
+        options (Optional[Dict[str, Any]]): Ollama inference options
+        timeout (Optional[float]): Per-request timeout in seconds
+        deadlines (List[Optional[Deadline]]): Item/batch deadlines
+        cancel_event (Optional[threading.Event]): Set to abandon both requests
+
+    Returns:
+        Tuple[Any, ChatResult]: Parsed value and the winning response
+
+    Raises:
+        Exception: The last error if no request produced a valid response
+    """
+    hosts = policy.hosts or [None]
+    delay = policy.delay(tracker)
+    start_time = time.monotonic()
+    events = []
+    pool = ThreadPoolExecutor(max_workers=2)
+
+    def attempt(host: Optional[str], event: threading.Event) -> Tuple[Any, ChatResult]:
+        result = run_chat(messages, model, format=format, options=options, host=host,
+                          timeout=timeout, deadlines=deadlines, cancel_event=event)
+        return parse(result.content), result
+
+    def launch(host: Optional[str]):
+        event = threading.Event()
+        events.append(event)
+        return pool.submit(attempt, host, event)
+
+    roles = {launch(hosts[0]): 'primary'}
+    stats.add(requests=1)
+    try:
+        pending = set(roles)
+        hedge_at = start_time + delay if delay is not None else None
+        last_error = None
+        while pending:
+            now = time.monotonic()
+            wait_for = 0.25
+            if hedge_at is not None:
+                wait_for = min(wait_for, max(hedge_at - now, 0))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    value, result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                total = time.monotonic() - start_time
+                tracker.record(result.elapsed)
+                if roles[future] == 'hedge':
+                    # The primary would have needed at least `total`; estimate
+                    # its latency from recent requests slower than that
+                    expected = tracker.mean_above(total)
+                    stats.add(hedge_wins=1, estimated_saved=max((expected or total) - total, 0.0))
+                return value, result
+
+            if cancel_event is not None and cancel_event.is_set():
+                raise Cancelled("Request cancelled")
+            if hedge_at is not None and pending and time.monotonic() >= hedge_at:
+                hedge_at = None
+                future = launch(hosts[1 % len(hosts)])
+                roles[future] = 'hedge'
+                pending.add(future)
+                stats.add(hedged=1)
+
+        raise last_error
+    finally:
+        for event in events:
+            event.set()
+        pool.shutdown(wait=False)
+
+
+def parse_models(value: str) -> List[str]:
+    """Parse a comma-separated model cascade, cheapest model first"""
+    models = [m.strip() for m in value.split(',') if m.strip()]
+    if not models:
+        raise argparse.ArgumentTypeError("at least one model is required")
+    return models
+
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a number")
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be a positive number")
+    return number
+
+
+class CascadeStats:
+    """Per-model outcome and cost counters for a model cascade
+
+    Cost is measured in compute-seconds: the wall time spent waiting on each
+    model, whether or not its output validated.
+    """
+
+    def __init__(self):
+        self.tiers: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float, valid: bool, section: bool = False):
+        prefix = 'section_' if section else 'item_'
+        with self._lock:
+            tier = self.tiers.setdefault(model, {
+                'item_attempts': 0, 'item_valid': 0,
+                'section_attempts': 0, 'section_valid': 0,
+                'compute_seconds': 0.0
+            })
+            tier[prefix + 'attempts'] += 1
+            tier[prefix + 'valid'] += int(valid)
+            tier['compute_seconds'] += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            report = {}
+            for model, tier in self.tiers.items():
+                valid = tier['item_valid'] + tier['section_valid']
+                attempts = tier['item_attempts'] + tier['section_attempts']
+                report[model] = {
+                    'items': f"{tier['item_valid']}/{tier['item_attempts']}",
+                    'sections': f"{tier['section_valid']}/{tier['section_attempts']}",
+                    'success_rate': f"{(valid / max(attempts, 1)) * 100:.1f}%",
+                    'compute_seconds': round(tier['compute_seconds'], 2),
+                    'valid_per_compute_second': round(valid / max(tier['compute_seconds'], 1e-9), 4)
+                }
+            return report
+
+
+class OutputStats:
+    """Output-token and latency counters for successful requests
+
+    Used to compare runs with canonical and compact (--compact-keys) schemas.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.output_tokens = 0
+        self.prompt_tokens = 0
+        self.seconds = 0.0
+        self.eval_ns = 0
+        self._lock = threading.Lock()
+
+    def record(self, result: ChatResult):
+        with self._lock:
+            self.requests += 1
+            self.output_tokens += result.eval_count or 0
+            self.prompt_tokens += result.prompt_eval_count or 0
+            self.seconds += result.elapsed
+            self.eval_ns += result.eval_duration or 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            count = max(self.requests, 1)
+            return {
+                'requests': self.requests,
+                'mean_output_tokens': round(self.output_tokens / count, 1),
+                'mean_prompt_tokens': round(self.prompt_tokens / count, 1),
+                'mean_latency': f"{self.seconds / count:.2f}s",
+                'output_tokens_per_second': round(self.output_tokens / max(self.eval_ns / 1e9, 1e-9), 1)
+                if self.eval_ns else None
+            }
+
+
+class InferenceProfile:
+    """Tuned Ollama inference options per workload, read from a JSON profile
+
+    The file is re-read when its modification time changes, so a new tuning
+    run applies to generators that are already running. A missing file means
+    Ollama's defaults; an unreadable one is logged and ignored.
+    """
+
+    def __init__(self, path: str = PROFILE_PATH):
+        self.path = path
+        self._mtime_ns: Optional[int] = None
+        self._workloads: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._mtime_ns = None
+            self._workloads = {}
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        self._mtime_ns = mtime_ns
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                workloads = json.load(f).get('workloads', {})
+            self._workloads = workloads if isinstance(workloads, dict) else {}
+        except (IOError, OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring inference profile {self.path}: {str(e)}")
+            self._workloads = {}
+
+    def options(self, workload: str) -> Optional[Dict[str, Any]]:
+        """Return the tuned options of a workload, or None to use Ollama's defaults"""
+        with self._lock:
+            self._reload()
+            entry = self._workloads.get(workload)
+        options = entry.get('options') if isinstance(entry, dict) else None
+        if not isinstance(options, dict):
+            return None
+        return {k: v for k, v in options.items() if k in TUNABLE_OPTIONS and isinstance(v, (int, float))} or None
+
+
+class ProgressRecorder:
+    """Persist the state of a batch run to a small JSON file
+
+    The file is rewritten atomically on every update so it is always
+    readable, including after Ctrl-C or a crash.
+    """
+
+    def __init__(self, path: str, kind: str, requested: int):
+        self.path = path
+        self.state = {
+            'kind': kind,
+            'pid': os.getpid(),
+            'started': datetime.datetime.utcnow().isoformat(),
+            'status': 'running',
+            'requested': requested,
+            'completed': 0,
+            'failed': [],
+            'current_item': None,
+            'current_attempt': None,
+            'outputs': [],
+        }
+        self.save()
+
+    def update(self, **fields):
+        self.state.update(fields)
+        self.save()
+
+    def item_started(self, item: int, attempt: int):
+        self.update(current_item=item, current_attempt=attempt)
+
+    def item_completed(self, output: Optional[str] = None):
+        if output is not None:
+            self.state['outputs'].append(output)
+        self.update(completed=self.state['completed'] + 1, current_attempt=None)
+
+    def item_failed(self, item: int, reason: str):
+        self.state['failed'].append({'item': item, 'reason': reason})
+        self.update(current_attempt=None)
+
+    def finish(self, status: str):
+        self.update(status=status, finished=datetime.datetime.utcnow().isoformat())
+
+    def save(self):
+        self.state['updated'] = datetime.datetime.utcnow().isoformat()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,404 @@
+"""
+Opt-in CPU profiling for the generation pipeline
+- Times named pipeline stages (prompt, schema, model, parse, validate, save, logging, ...)
+  in wall-clock and per-thread CPU seconds; nested stages are reported under their parent
+- Can attach cProfile (a .prof file for pstats, snakeviz or flameprof) or a built-in
+  sampler that writes collapsed stacks (flamegraph.pl, speedscope, inferno) weighted by
+  the CPU time each thread used and rooted at the stage it was sampled in
+- Disabled by default: stage() then returns a shared no-op context manager
+- One profiler per process (stage_profiler), shared by both generators, the job runner
+  and the daemon, so stage costs can be compared as concurrency grows
+"""
+
+import argparse
+import cProfile
+import datetime
+import functools
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger('profiling')
+
+PROFILERS = ('cprofile', 'sample')
+DEFAULT_SAMPLE_INTERVAL = 0.01
+STAGE_SEPARATOR = ';'
+
+_NO_STAGE = nullcontext()
+
+
+class ProfilingError(Exception):
+    """Exception raised when a profiler cannot be started"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def thread_cpu_clock(ident: int) -> Optional[int]:
+    """CPU-time clock of a thread, or None where per-thread clocks are not available"""
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        return None
+
+
+class _Stage:
+    """One timed stage; entered through StageProfiler.stage()"""
+    __slots__ = ('profiler', 'name', 'stack', 'profile', 'wall', 'cpu')
+
+    def __init__(self, profiler: 'StageProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.stack = self.profiler._stack()
+        self.profile = self.profiler._profile_thread() if not self.stack else None
+        self.stack.append(self.name)
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        path = STAGE_SEPARATOR.join(self.stack)
+        self.stack.pop()
+        if self.profile is not None:
+            self.profile.disable()
+        self.profiler._record(path, wall, cpu)
+        return False
+
+
+class StageProfiler:
+    """Per-stage wall/CPU timings with an optional cProfile or sampling profiler attached"""
+
+    def __init__(self):
+        self.enabled = False
+        self.mode: Optional[str] = None
+        self.interval = DEFAULT_SAMPLE_INTERVAL
+        # Stage path -> [calls, wall seconds, CPU seconds]
+        self.stages: Dict[str, List[float]] = {}
+        # Collapsed stack -> CPU microseconds (or samples without per-thread clocks)
+        self.samples: Counter = Counter()
+        self.sample_unit = 'cpu_us'
+        self.started_at: Optional[str] = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._start = (0.0, 0.0)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stacks: Dict[int, List[str]] = {}
+        self._profiles: List[cProfile.Profile] = []
+        self._loggers: List[logging.Logger] = []
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def stage(self, name: str):
+        """Context manager timing one stage (a no-op while profiling is off)"""
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self, name)
+
+    def staged(self, name: str) -> Callable:
+        """Decorator timing every call of a function as a stage"""
+        def decorate(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Stage(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def instrument_logger(self, target: logging.Logger):
+        """Time a logger's calls (record creation, stack_info capture, handlers) as the logging stage"""
+        original = target._log
+
+        def _log(level, msg, args, **kwargs):
+            # Skip this wrapper when logging looks up the calling line
+            kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 1
+            with self.stage('logging'):
+                return original(level, msg, args, **kwargs)
+        target._log = _log
+        self._loggers.append(target)
+
+    def start(self, mode: Optional[str] = None, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """Enable stage timing and attach a profiler
+
+        Args:
+            mode (Optional[str]): 'cprofile', 'sample' or None for stage timings only
+            interval (float): Seconds between samples in sample mode
+
+        Raises:
+            ProfilingError: If the mode is unknown or the profiler cannot run here
+        """
+        if mode is not None and mode not in PROFILERS:
+            raise ProfilingError(f"Unknown profiler {mode!r} (expected {', '.join(PROFILERS)})")
+        self.mode = mode
+        self.interval = max(interval, 0.001)
+        self.stages.clear()
+        self.samples.clear()
+        self.started_at = datetime.datetime.utcnow().isoformat()
+        self._start = (time.perf_counter(), time.process_time())
+        self.enabled = True
+        if mode == 'cprofile':
+            # The starting thread is profiled throughout; other threads while inside a stage
+            self._local.whole_thread = True
+            self._profile_thread()
+        elif mode == 'sample':
+            self.sample_unit = 'cpu_us' if thread_cpu_clock(threading.get_ident()) is not None else 'samples'
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, name='stage-sampler', daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        """Stop timing and detach the profiler and logger hooks"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.wall_seconds = time.perf_counter() - self._start[0]
+        self.cpu_seconds = time.process_time() - self._start[1]
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        profile = getattr(self._local, 'profile', None)
+        if profile is not None:
+            profile.disable()
+        for target in self._loggers:
+            del target._log
+        self._loggers.clear()
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            with self._lock:
+                self._stacks[threading.get_ident()] = stack
+        return stack
+
+    def _profile_thread(self) -> Optional[cProfile.Profile]:
+        """Enable this thread's cProfile for a top-level stage (None if it is not needed)"""
+        if self.mode != 'cprofile':
+            return None
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        elif getattr(self._local, 'whole_thread', False):
+            return None
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler, which already covers every thread
+            return None
+        return profile
+
+    def _record(self, path: str, wall: float, cpu: float):
+        with self._lock:
+            totals = self.stages.get(path)
+            if totals is None:
+                totals = self.stages[path] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+
+    def _sample(self):
+        """Sampler thread: attribute each thread's CPU time since the last sample to its current stack"""
+        own = threading.get_ident()
+        clocks: Dict[int, List[int]] = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident in [i for i in self._stacks if i not in frames]:
+                    del self._stacks[ident]
+                stages = {ident: list(stack) for ident, stack in self._stacks.items()}
+            for ident in [i for i in clocks if i not in frames]:
+                del clocks[ident]
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                if self.sample_unit == 'samples':
+                    # No per-thread clocks: count samples of threads inside a stage
+                    weight = 1 if stages.get(ident) else 0
+                else:
+                    weight = self._cpu_delta(clocks, ident)
+                if weight:
+                    self.samples[self._fold(stages.get(ident), frame)] += weight
+
+    @staticmethod
+    def _cpu_delta(clocks: Dict[int, List[int]], ident: int) -> int:
+        """CPU microseconds a thread used since it was last sampled"""
+        try:
+            clock = clocks.get(ident)
+            if clock is None:
+                clock_id = thread_cpu_clock(ident)
+                if clock_id is not None:
+                    clocks[ident] = [clock_id, time.clock_gettime_ns(clock_id)]
+                return 0
+            now = time.clock_gettime_ns(clock[0])
+        except OSError:
+            # The thread ended between listing and reading its clock
+            return 0
+        delta, clock[1] = now - clock[1], now
+        return max(delta // 1000, 0)
+
+    @staticmethod
+    def _fold(stages: Optional[List[str]], frame) -> str:
+        """Collapsed stack: stage names, then Python frames from the outermost call"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.reverse()
+        return STAGE_SEPARATOR.join([f"[{name}]" for name in stages or ()] + names)
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """Per-stage totals, each stage followed by its nested stages
+
+        Self CPU excludes the CPU time of nested stages.
+        """
+        with self._lock:
+            stages = {path: list(totals) for path, totals in self.stages.items()}
+        children: Dict[str, float] = {}
+        for path, (_, _, cpu) in stages.items():
+            parent, _, _ = path.rpartition(STAGE_SEPARATOR)
+            if parent:
+                children[parent] = children.get(parent, 0.0) + cpu
+        rows = []
+        for path in sorted(stages, key=lambda p: p.split(STAGE_SEPARATOR)):
+            calls, wall, cpu = stages[path]
+            rows.append({
+                'stage': path,
+                'calls': calls,
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'self_cpu_seconds': round(cpu - children.get(path, 0.0), 4),
+                'mean_wall_ms': round(wall / calls * 1000, 3),
+                'mean_cpu_ms': round(cpu / calls * 1000, 3),
+            })
+        return rows
+
+    def summary(self) -> Dict[str, Any]:
+        """Run totals and the stage breakdown, as written to the .stages.json file"""
+        rows = self.breakdown()
+        staged_cpu = sum(row['cpu_seconds'] for row in rows if STAGE_SEPARATOR not in row['stage'])
+        return {
+            'started_at': self.started_at,
+            'argv': sys.argv,
+            'profiler': self.mode,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'process_cpu_seconds': round(self.cpu_seconds, 3),
+            # Main loop, progress output, client threads and the sampler itself
+            'cpu_outside_stages': round(max(self.cpu_seconds - staged_cpu, 0.0), 3),
+            'stages': rows,
+        }
+
+    def report(self) -> str:
+        """Stage breakdown as a text table"""
+        summary = self.summary()
+        lines = [
+            f"Stage profile: {summary['wall_seconds']:.2f}s wall, {summary['process_cpu_seconds']:.2f}s process CPU "
+            f"({summary['cpu_outside_stages']:.2f}s outside stages)",
+            f"{'stage':<36} {'calls':>7} {'wall s':>10} {'cpu s':>9} {'self cpu':>9} {'cpu ms/call':>12}",
+        ]
+        for row in summary['stages']:
+            depth = row['stage'].count(STAGE_SEPARATOR)
+            name = '  ' * depth + row['stage'].rpartition(STAGE_SEPARATOR)[2]
+            lines.append(
+                f"{name:<36} {row['calls']:>7} {row['wall_seconds']:>10.3f} {row['cpu_seconds']:>9.3f} "
+                f"{row['self_cpu_seconds']:>9.3f} {row['mean_cpu_ms']:>12.3f}"
+            )
+        return '\n'.join(lines)
+
+    def write(self, prefix: str) -> List[str]:
+        """Write <prefix>.stages.json and, if a profiler ran, <prefix>.prof or <prefix>.folded
+
+        Returns:
+            List[str]: Paths written
+
+        Raises:
+            IOError: If a file cannot be written
+        """
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        paths = [f"{prefix}.stages.json"]
+        with open(paths[0], 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+        if self.mode == 'cprofile':
+            stats = None
+            for profile in self._profiles:
+                try:
+                    if stats is None:
+                        stats = pstats.Stats(profile)
+                    else:
+                        stats.add(profile)
+                except TypeError:
+                    # A thread that never entered a stage has nothing to add
+                    continue
+            if stats is not None:
+                paths.append(f"{prefix}.prof")
+                stats.dump_stats(paths[-1])
+        elif self.mode == 'sample':
+            paths.append(f"{prefix}.folded")
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                for stack, weight in sorted(self.samples.items()):
+                    f.write(f"{stack} {weight}\n")
+        return paths
+
+    def start_from_args(self, args: argparse.Namespace, loggers: List[logging.Logger] = ()) -> bool:
+        """Start profiling if the options added by add_profile_arguments ask for it
+
+        Returns:
+            bool: True if profiling was started
+        """
+        if not (args.profile_stages or args.profile):
+            return False
+        self.start(args.profile, args.profile_interval)
+        for target in loggers:
+            self.instrument_logger(target)
+        return True
+
+    def finish(self, prefix: Optional[str], name: str) -> str:
+        """Stop profiling, write the profile files and return the report
+
+        Args:
+            prefix (Optional[str]): Output path prefix (default: profile_<name>_<timestamp>)
+            name (str): Workload or tool name used in the default prefix
+        """
+        self.stop()
+        if prefix is None:
+            prefix = f"profile_{name}_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        try:
+            written = f"Profile written to {', '.join(self.write(prefix))}"
+        except (IOError, OSError) as e:
+            written = f"Could not write profile {prefix}: {str(e)}"
+        return f"{self.report()}\n{written}"
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Add the profiling options shared by the generators, the job runner and the daemon"""
+    parser.add_argument('--profile-stages', action='store_true',
+                        help="Time each pipeline stage and report wall/CPU seconds per stage")
+    parser.add_argument('--profile', choices=PROFILERS, default=None,
+                        help="Also attach cProfile or the sampling profiler (implies --profile-stages)")
+    parser.add_argument('--profile-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL,
+                        help="Seconds between samples with --profile sample")
+    parser.add_argument('--profile-output', default=None, metavar='PREFIX',
+                        help="Path prefix of the profile files (default: profile_<name>_<timestamp>)")
+
+
+# Shared by every module of the pipeline in this process
+stage_profiler = StageProfiler()
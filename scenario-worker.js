@@ -0,0 +1,196 @@
+// Web Worker that streams a scenario file and posts records as they are parsed.
+//
+// Accepted inputs:
+// - {"scenarios": [...]} documents of any size (elements are parsed one by one)
+// - NDJSON / concatenated JSON with one scenario object per value
+// - a single bare scenario object
+//
+// Messages posted back to the page:
+// - {type: 'records', records, bytesRead}
+// - {type: 'done', count, bytesRead, parseMs}
+// - {type: 'error', message}
+
+const BATCH_SIZE = 25;
+const BATCH_INTERVAL_MS = 50;
+
+function isScenario(value) {
+    return value !== null && typeof value === 'object' && !Array.isArray(value)
+        && 'negotiationId' in value && 'topic' in value;
+}
+
+class ScenarioStreamParser {
+    constructor(onRecord) {
+        this.onRecord = onRecord;
+        this.buffer = '';
+        this.pos = 0;
+        this.depth = 0;
+        this.inString = false;
+        this.escape = false;
+        this.stringStart = -1;
+        this.lastKey = null;
+        this.scenariosPending = false;
+        this.inScenarios = false;
+        this.elementStart = -1;
+        this.topStart = -1;
+        this.topKept = true;
+    }
+
+    push(text) {
+        this.buffer += text;
+        const buffer = this.buffer;
+        for (let i = this.pos; i < buffer.length; i++) {
+            const ch = buffer[i];
+
+            if (this.inString) {
+                if (this.escape) {
+                    this.escape = false;
+                } else if (ch === '\\') {
+                    this.escape = true;
+                } else if (ch === '"') {
+                    this.inString = false;
+                    if (this.depth === 1 && !this.inScenarios) {
+                        this.lastKey = buffer.slice(this.stringStart + 1, i);
+                    }
+                }
+                continue;
+            }
+
+            if (ch === ' ' || ch === '\n' || ch === '\r' || ch === '\t') continue;
+
+            if (this.scenariosPending) {
+                this.scenariosPending = false;
+                if (ch === '[') {
+                    this.inScenarios = true;
+                    // The enclosing document no longer needs to be kept in memory
+                    this.topKept = false;
+                }
+            }
+
+            switch (ch) {
+                case '"':
+                    this.inString = true;
+                    this.stringStart = i;
+                    break;
+                case ':':
+                    if (this.depth === 1 && this.lastKey === 'scenarios') {
+                        this.scenariosPending = true;
+                    }
+                    this.lastKey = null;
+                    break;
+                case ',':
+                    this.lastKey = null;
+                    break;
+                case '{':
+                case '[':
+                    if (this.depth === 0) {
+                        this.topStart = i;
+                        this.topKept = true;
+                    } else if (this.inScenarios && this.depth === 2 && ch === '{') {
+                        this.elementStart = i;
+                    }
+                    this.depth++;
+                    break;
+                case '}':
+                case ']':
+                    this.depth--;
+                    if (this.inScenarios && this.depth === 2 && this.elementStart >= 0) {
+                        this.emit(JSON.parse(buffer.slice(this.elementStart, i + 1)));
+                        this.elementStart = -1;
+                    } else if (this.inScenarios && this.depth === 1) {
+                        this.inScenarios = false;
+                    } else if (this.depth === 0) {
+                        if (this.topKept) {
+                            this.emitTopLevel(JSON.parse(buffer.slice(this.topStart, i + 1)));
+                        }
+                        this.topStart = -1;
+                    }
+                    break;
+                default:
+                    break;
+            }
+        }
+        this.pos = buffer.length;
+        this.compact();
+    }
+
+    emit(value) {
+        if (isScenario(value)) {
+            this.onRecord(value);
+        }
+    }
+
+    emitTopLevel(value) {
+        if (Array.isArray(value)) {
+            value.forEach(v => this.emit(v));
+        } else {
+            this.emit(value);
+        }
+    }
+
+    // Drop text that can no longer be part of a pending value
+    compact() {
+        let keepFrom = this.pos;
+        if (this.inString && this.depth === 1) keepFrom = Math.min(keepFrom, this.stringStart);
+        if (this.elementStart >= 0) keepFrom = Math.min(keepFrom, this.elementStart);
+        if (this.topStart >= 0 && this.topKept) keepFrom = Math.min(keepFrom, this.topStart);
+        if (keepFrom === 0) return;
+
+        this.buffer = this.buffer.slice(keepFrom);
+        this.pos -= keepFrom;
+        if (this.stringStart >= 0) this.stringStart -= keepFrom;
+        if (this.elementStart >= 0) this.elementStart -= keepFrom;
+        if (this.topStart >= 0) this.topStart -= keepFrom;
+    }
+
+    finish() {
+        if (this.depth !== 0 || this.inString) {
+            throw new Error('Unexpected end of file while parsing JSON.');
+        }
+    }
+}
+
+self.addEventListener('message', async (e) => {
+    const { file } = e.data;
+    const started = performance.now();
+    let batch = [];
+    let count = 0;
+    let bytesRead = 0;
+    let lastFlush = started;
+
+    const flush = () => {
+        if (batch.length === 0) return;
+        self.postMessage({ type: 'records', records: batch, bytesRead });
+        batch = [];
+        lastFlush = performance.now();
+    };
+
+    const parser = new ScenarioStreamParser(record => {
+        batch.push(record);
+        count++;
+        if (batch.length >= BATCH_SIZE || performance.now() - lastFlush >= BATCH_INTERVAL_MS) {
+            flush();
+        }
+    });
+
+    try {
+        const reader = file.stream().getReader();
+        const decoder = new TextDecoder();
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            bytesRead += value.byteLength;
+            parser.push(decoder.decode(value, { stream: true }));
+        }
+        parser.push(decoder.decode());
+        parser.finish();
+        flush();
+
+        if (count === 0) {
+            throw new Error('Invalid JSON format. File must contain a "scenarios" array or scenario records.');
+        }
+        self.postMessage({ type: 'done', count, bytesRead, parseMs: performance.now() - started });
+    } catch (error) {
+        flush();
+        self.postMessage({ type: 'error', message: error.message });
+    }
+});
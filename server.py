@@ -1,11 +1,74 @@
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import Flask, Response, abort, jsonify, make_response, render_template, request, send_from_directory
+import argparse
+import hashlib
 import os
 import json
 import logging
+import re
+import threading
+import time
 from logging.handlers import RotatingFileHandler
 
+from analytics import CorpusAnalytics
+from corpus import ScenarioIndex
+from fragments import FragmentCache
+from genclient import DaemonClient, DaemonError, DaemonRejected
+from migrations import BackgroundCompactor
+from telemetry import Deduplicator, TelemetryIngest, TokenBucket, start_async_logging
+
 app = Flask(__name__)
 
+# Directory holding the generated scenario files
+DATA_ROOT = os.environ.get('SCENARIO_DATA_ROOT', '.')
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 500
+
+# Only these files are served from the application directory; logs, scripts
+# and progress files are not reachable over HTTP
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_FILES = {'index.html', 'app.js', 'style.css', 'scenario-worker.js', 'negotiation-schema.json'}
+
+# Cache lifetimes (seconds). Fingerprinted asset URLs (?v=<hash>) never change
+# content, so they are cached for a year; scenario files can be regenerated
+STATIC_MAX_AGE = 365 * 24 * 3600
+DATA_MAX_AGE = 60
+
+# Production server defaults (gunicorn)
+DEFAULT_BIND = '127.0.0.1:5000'
+DEFAULT_WORKERS = min(2 * (os.cpu_count() or 1) + 1, 8)
+PID_FILE = 'server.pid'
+
+# Seconds between background passes that persist migrated records (0 disables it)
+COMPACT_INTERVAL = float(os.environ.get('SCENARIO_COMPACT_INTERVAL', '0'))
+
+# Socket of a running gendaemon.py; /api/generate is disabled without it
+GENERATOR_SOCKET = os.environ.get('GENERATOR_SOCKET')
+MAX_GENERATE_COUNT = 20
+GENERATE_FIELDS = ('type', 'count', 'models', 'compact_keys', 'diverse', 'priority')
+
+# Pre-rendered card HTML: rendered once per scenario version, shared on disk by all workers
+FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR', '.fragment_cache')
+FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', '2048'))
+
+# Live corpus updates (/api/events): seconds between checks for changed files and
+# between keep-alive comments, how long a stream stays open before the browser
+# reconnects (possibly to another worker), and streams held open per process;
+# each open stream occupies a server thread
+EVENTS_POLL_INTERVAL = 2.0
+EVENTS_HEARTBEAT = 15.0
+EVENTS_STREAM_SECONDS = 300.0
+EVENTS_RETRY_MS = 3000
+EVENT_STREAMS_MAX = int(os.environ.get('EVENT_STREAMS_MAX', '2'))
+# Event ids are only meaningful to the process that issued them
+SERVER_STARTED = int(time.time())
+
+scenario_index = ScenarioIndex(DATA_ROOT)
+corpus_analytics = CorpusAnalytics(scenario_index)
+fragment_cache = FragmentCache(FRAGMENT_CACHE_DIR or None, FRAGMENT_CACHE_SIZE)
+if COMPACT_INTERVAL > 0:
+    # Started before gunicorn forks, so only the master process compacts
+    BackgroundCompactor(scenario_index, COMPACT_INTERVAL).start()
+
 # Setup basic logging
 handler = logging.FileHandler('error.log')
 handler.setLevel(logging.ERROR)
@@ -14,28 +77,346 @@ handler.setFormatter(formatter)
 logger = logging.getLogger(__name__)
 logger.addHandler(handler)
 
+# Client-side parse/render timings
+metrics_handler = logging.FileHandler('metrics.log')
+metrics_handler.setLevel(logging.INFO)
+metrics_handler.setFormatter(formatter)
+metrics_logger = logging.getLogger(f"{__name__}.metrics")
+metrics_logger.setLevel(logging.INFO)
+metrics_logger.propagate = False
+metrics_logger.addHandler(metrics_handler)
+
+# Log files are written on a background thread, never inside a request
+start_async_logging([logger, metrics_logger])
+
+# Client telemetry: events/s per client (0 disables the limit) and batch size cap
+TELEMETRY_RATE_LIMIT = float(os.environ.get('TELEMETRY_RATE_LIMIT', '20'))
+MAX_TELEMETRY_BYTES = 256 * 1024
+telemetry = TelemetryIngest(
+    logger,
+    metrics_logger,
+    limiter=TokenBucket(TELEMETRY_RATE_LIMIT) if TELEMETRY_RATE_LIMIT > 0 else None,
+    deduplicator=Deduplicator()
+)
+
+# Paged scenario data for the viewer grid
+@app.route('/api/scenarios')
+def list_scenarios():
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = request.args.get('limit', PAGE_SIZE_DEFAULT, type=int)
+        limit = min(max(limit, 1), PAGE_SIZE_MAX)
+        total, items = scenario_index.page(offset, limit)
+        return jsonify({
+            "total": total,
+            "offset": offset,
+            "version": scenario_index.version,
+            "items": items
+        }), 200
+    except Exception as e:
+        logger.error(f"Error listing scenarios: {str(e)}")
+        return jsonify({"error": "Failed to list scenarios"}), 500
+
+# Paged card HTML for the viewer grid, inserted by the client as is
+@app.route('/api/fragments')
+def list_fragments():
+    try:
+        ids = request.args.getlist('id')
+        if ids:
+            # Cards changed since the client loaded them (see /api/events)
+            return jsonify({
+                "version": scenario_index.version,
+                "items": fragment_cache.items(scenario_index, ids[:PAGE_SIZE_MAX])
+            }), 200
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = request.args.get('limit', PAGE_SIZE_DEFAULT, type=int)
+        limit = min(max(limit, 1), PAGE_SIZE_MAX)
+        total, items = fragment_cache.page(scenario_index, offset, limit)
+        response = jsonify({
+            "total": total,
+            "offset": offset,
+            "version": scenario_index.version,
+            "items": items
+        })
+        response.headers['Cache-Control'] = 'no-cache'
+        response.add_etag()
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error listing fragments: {str(e)}")
+        return jsonify({"error": "Failed to list fragments"}), 500
+
+def _sse(event, data, event_id=None):
+    """Format one Server-Sent Event"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+_event_streams = threading.BoundedSemaphore(EVENT_STREAMS_MAX)
+
+# Scenario ids added, updated and removed in the data root, pushed to open viewers
+# as Server-Sent Events. A browser that reconnects with Last-Event-ID gets what it
+# missed, or a resync event when this process cannot tell what changed
+@app.route('/api/events')
+def corpus_events():
+    if not _event_streams.acquire(blocking=False):
+        response = jsonify({"error": "Too many open event streams"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    origin = f"{os.getpid()}.{SERVER_STARTED}"
+    last_origin, _, last_version = request.headers.get('Last-Event-ID', '').rpartition(':')
+
+    def stream():
+        scenario_index.refresh()
+        version = scenario_index.version
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        if last_origin == origin and last_version.isdigit():
+            version = int(last_version)
+        else:
+            # A new client, or one whose last event came from another process
+            kind = 'resync' if last_origin else 'ready'
+            yield _sse(kind, {"version": version, "total": len(scenario_index)}, f"{origin}:{version}")
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < EVENTS_STREAM_SECONDS:
+            time.sleep(EVENTS_POLL_INTERVAL)
+            changes = scenario_index.changes(version)
+            if changes is None:
+                version = scenario_index.version
+                yield _sse('resync', {"version": version, "total": len(scenario_index)}, f"{origin}:{version}")
+                last_sent = time.monotonic()
+            elif changes['version'] != version:
+                version = changes['version']
+                changes['total'] = len(scenario_index)
+                yield _sse('changes', changes, f"{origin}:{version}")
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= EVENTS_HEARTBEAT:
+                # Keeps proxies from timing out and finds closed connections
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(_event_streams.release)
+    return response
+
+@app.route('/api/scenarios/<scenario_id>')
+def get_scenario(scenario_id):
+    scenario = scenario_index.get(scenario_id)
+    if scenario is None:
+        return jsonify({"error": "Scenario not found"}), 404
+    return jsonify({"id": scenario_id, "scenario": scenario}), 200
+
+_fingerprints = {}
+
+def fingerprint(name):
+    """Return a short content hash of a static file, cached by modification time"""
+    path = os.path.join(APP_ROOT, name)
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _fingerprints.get(name)
+    if cached is None or cached[0] != mtime_ns:
+        with open(path, 'rb') as f:
+            cached = (mtime_ns, hashlib.sha1(f.read()).hexdigest()[:12])
+        _fingerprints[name] = cached
+    return cached[1]
+
+def _versioned_asset(match):
+    name = match.group(2)
+    if name not in STATIC_FILES:
+        return match.group(0)
+    return f'{match.group(1)}="{name}?v={fingerprint(name)}"'
+
+# Corpus statistics, recomputed only when scenario files change
+@app.route('/api/stats')
+def corpus_stats():
+    try:
+        etag, stats = corpus_analytics.stats()
+        response = jsonify(stats)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error computing corpus stats: {str(e)}")
+        return jsonify({"error": "Failed to compute corpus stats"}), 500
+
 # Serve static files
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    # Asset URLs carry a content hash so they can be cached for a long time
+    with open(os.path.join(APP_ROOT, 'index.html'), encoding='utf-8') as f:
+        html = re.sub(r'(src|href)="([^"?#:]+)"', _versioned_asset, f.read())
+    response = make_response(html)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/data/<path:name>')
+def serve_data(name):
+    # Only files the index knows hold scenarios; send_file hands the open
+    # file to the WSGI server, which uses sendfile() under gunicorn
+    if name not in scenario_index.files():
+        abort(404)
+    response = send_from_directory(scenario_index.root, name, max_age=DATA_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={DATA_MAX_AGE}, must-revalidate'
+    return response
 
 @app.route('/<path:path>')
 def serve_file(path):
+    if path not in STATIC_FILES:
+        # Scenario files used to be linked from the application directory
+        if path in scenario_index.files():
+            return serve_data(path)
+        return jsonify({"error": "File not found"}), 404
     try:
-        return send_from_directory('.', path)
+        if request.args.get('v'):
+            response = send_from_directory(APP_ROOT, path, max_age=STATIC_MAX_AGE)
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+        else:
+            response = send_from_directory(APP_ROOT, path, max_age=0)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f"Error serving file {path}: {str(e)}")
         return jsonify({"error": "File not found"}), 404
 
+def _telemetry_response(result):
+    if result['rate_limited'] and not result['accepted'] and not result['duplicates']:
+        response = jsonify(dict(result, error="Rate limit exceeded"))
+        response.status_code = 429
+        response.headers['Retry-After'] = str(telemetry.limiter.retry_after())
+        return response
+    return jsonify(dict(result, status="success")), 200
+
+# Batched browser telemetry (sent with navigator.sendBeacon)
+@app.route('/telemetry', methods=['POST'])
+def ingest_telemetry():
+    try:
+        if (request.content_length or 0) > MAX_TELEMETRY_BYTES:
+            return jsonify({"error": "Batch too large"}), 413
+        batch = request.get_json(force=True, silent=True)
+        if not isinstance(batch, dict) or not isinstance(batch.get('events'), list):
+            return jsonify({"error": "Expected {\"events\": [...]}"}), 400
+        dropped = batch.get('dropped')
+        result = telemetry.ingest(request.remote_addr or 'unknown', batch['events'],
+                                  dropped if isinstance(dropped, int) else 0)
+        return _telemetry_response(result)
+    except Exception as e:
+        logger.error(f"Error ingesting telemetry: {str(e)}")
+        return jsonify({"error": "Failed to ingest telemetry"}), 500
+
+# Generate items through the generator daemon; events are streamed as NDJSON
+# and new scenarios are saved into the viewer's data root
+@app.route('/api/generate', methods=['POST'])
+def generate_items():
+    if not GENERATOR_SOCKET:
+        return jsonify({"error": "Generation is not enabled (set GENERATOR_SOCKET)"}), 404
+    body = request.get_json(force=True, silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    fields = {k: v for k, v in body.items() if k in GENERATE_FIELDS}
+    count = fields.pop('count', 1)
+    if not isinstance(count, int) or not 1 <= count <= MAX_GENERATE_COUNT:
+        return jsonify({"error": f"count must be between 1 and {MAX_GENERATE_COUNT}"}), 400
+
+    job_type = fields.pop('type', 'negotiation')
+    if job_type not in ('negotiation', 'character'):
+        return jsonify({"error": "type must be negotiation or character"}), 400
+
+    data_root = os.path.abspath(DATA_ROOT)
+    events = DaemonClient(GENERATOR_SOCKET).generate(
+        job_type, count, output=data_root, data_root=data_root, **fields
+    )
+    try:
+        first = next(events)
+    except DaemonRejected as e:
+        events.close()
+        return jsonify({"error": e.message}), 400
+    except (DaemonError, StopIteration) as e:
+        events.close()
+        logger.error(f"Generator daemon unavailable: {str(e)}")
+        return jsonify({"error": "Generator daemon unavailable"}), 503
+
+    def stream():
+        # Closing the connection (client gone) makes the daemon cancel the rest
+        try:
+            yield json.dumps(first) + '\n'
+            for event in events:
+                yield json.dumps(event, ensure_ascii=False) + '\n'
+        except DaemonError as e:
+            yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+        finally:
+            events.close()
+
+    return Response(stream(), mimetype='application/x-ndjson', headers={'Cache-Control': 'no-store'})
+
+# Single-event endpoints kept for older clients; they share the batch pipeline
 @app.route('/log-error', methods=['POST'])
 def log_error():
     try:
         error_message = request.get_data(as_text=True)
-        logger.error(error_message)
-        return jsonify({"status": "success"}), 200
+        result = telemetry.ingest(request.remote_addr or 'unknown', [{'kind': 'error', 'message': error_message}])
+        return _telemetry_response(result)
     except Exception as e:
         logger.error(f"Error logging message: {str(e)}")
         return jsonify({"error": "Failed to log error"}), 500
 
+@app.route('/log-metrics', methods=['POST'])
+def log_metrics():
+    try:
+        metrics = request.get_json(force=True, silent=True)
+        if not isinstance(metrics, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        result = telemetry.ingest(request.remote_addr or 'unknown', [dict(metrics, kind='metric')])
+        return _telemetry_response(result)
+    except Exception as e:
+        logger.error(f"Error logging metrics: {str(e)}")
+        return jsonify({"error": "Failed to log metrics"}), 500
+
+def serve_production(bind=DEFAULT_BIND, workers=DEFAULT_WORKERS, threads=4, pid_file=PID_FILE):
+    """Run the app under gunicorn with several worker processes
+
+    Send SIGHUP to the master (pid in pid_file) to reload code and
+    configuration gracefully: new workers start before the old ones finish
+    their in-flight requests and exit.
+
+    Args:
+        bind (str): host:port to listen on
+        workers (int): Number of worker processes
+        threads (int): Threads per worker
+        pid_file (str): Where the master process id is written
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("Production mode needs gunicorn: pip install gunicorn")
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', threads)
+            self.cfg.set('sendfile', True)
+            self.cfg.set('graceful_timeout', 30)
+            self.cfg.set('pidfile', pid_file)
+
+        def load(self):
+            return app
+
+    ProductionServer().run()
+
+def parse_args(argv=None):
+    """Parse command-line options for the server"""
+    parser = argparse.ArgumentParser(description="Serve the negotiation card viewer")
+    parser.add_argument('--production', action='store_true',
+                        help="Run under gunicorn with multiple workers instead of the debug server")
+    parser.add_argument('--bind', default=DEFAULT_BIND, help="host:port to listen on")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Worker processes (production)")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker (production)")
+    return parser.parse_args(argv)
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    args = parse_args()
+    if args.production:
+        serve_production(args.bind, args.workers, args.threads)
+    else:
+        host, _, port = args.bind.rpartition(':')
+        app.run(debug=True, host=host or None, port=int(port))
@@ -0,0 +1,187 @@
+"""
+Batched client telemetry for the viewer backend
+- Accepts batches of browser events (errors and parse/render timings) in one request
+- Drops repeated errors within a time window and logs how often they repeated
+- Rate-limits each client with a token bucket
+- Log records are handed to a background QueueListener, so requests never wait on file writes
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+# Limits per batch and per client
+MAX_EVENTS_PER_BATCH = 200
+MAX_FIELD_LENGTH = 4000
+RATE_LIMIT_EVENTS_PER_SECOND = 20.0
+RATE_LIMIT_BURST = 200
+DEDUP_WINDOW_SECONDS = 60.0
+EVENT_KINDS = ('error', 'metric')
+
+
+def start_async_logging(loggers: List[logging.Logger]) -> QueueListener:
+    """Move the handlers of the given loggers behind a queue
+
+    Each logger keeps a QueueHandler; the original (file) handlers run on a
+    listener thread, so emitting a record only costs a queue put.
+
+    Args:
+        loggers (List[logging.Logger]): Loggers whose handlers should write asynchronously
+
+    Returns:
+        QueueListener: The running listener (stopped automatically at exit)
+    """
+    listener_queue: 'queue.Queue[logging.LogRecord]' = queue.Queue(-1)
+    handlers = []
+    for target in loggers:
+        handlers.extend(target.handlers)
+        for handler in list(target.handlers):
+            target.removeHandler(handler)
+        target.addHandler(QueueHandler(listener_queue))
+    # respect_handler_level keeps e.g. the ERROR-only error.log handler filtering
+    listener = QueueListener(listener_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class TokenBucket:
+    """Per-client token buckets refilled at a fixed rate"""
+
+    def __init__(self, rate: float = RATE_LIMIT_EVENTS_PER_SECOND, burst: int = RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, client: str, tokens: int) -> int:
+        """Take up to `tokens` tokens and return how many were granted"""
+        now = time.monotonic()
+        with self._lock:
+            available, updated = self._buckets.get(client, (float(self.burst), now))
+            available = min(self.burst, available + (now - updated) * self.rate)
+            granted = min(tokens, int(available))
+            self._buckets[client] = (available - granted, now)
+            if len(self._buckets) > 10000:
+                # Forget idle clients; their buckets would be full again anyway
+                cutoff = now - self.burst / self.rate
+                self._buckets = {k: v for k, v in self._buckets.items() if v[1] >= cutoff}
+            return granted
+
+    def retry_after(self) -> int:
+        """Seconds until one token is available again"""
+        return max(1, int(round(1 / self.rate)))
+
+
+class Deduplicator:
+    """Suppress events seen within a time window and count the repeats"""
+
+    def __init__(self, window: float = DEDUP_WINDOW_SECONDS):
+        self.window = window
+        self._seen: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def check(self, key: str, summary: str) -> bool:
+        """Return True the first time a key is seen in the window"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                return False
+            self._seen[key] = [now, 0, summary]
+            return True
+
+    def expired(self) -> List[Tuple[str, int]]:
+        """Pop window entries that ended with repeats, as (summary, repeat count)"""
+        now = time.monotonic()
+        repeated = []
+        with self._lock:
+            for key in [k for k, (first, _, _) in self._seen.items() if now - first >= self.window]:
+                _, count, summary = self._seen.pop(key)
+                if count:
+                    repeated.append((summary, count))
+        return repeated
+
+
+def _text(value: Any) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text[:MAX_FIELD_LENGTH]
+
+
+class TelemetryIngest:
+    """Validate, rate-limit, deduplicate and log client telemetry batches"""
+
+    def __init__(self, error_logger: logging.Logger, metrics_logger: logging.Logger,
+                 limiter: Optional[TokenBucket] = None, deduplicator: Optional[Deduplicator] = None):
+        """
+        Args:
+            error_logger (logging.Logger): Receives client errors
+            metrics_logger (logging.Logger): Receives timing events
+            limiter (Optional[TokenBucket]): Per-client rate limit (None disables it)
+            deduplicator (Optional[Deduplicator]): Repeat suppression for errors
+        """
+        self.error_logger = error_logger
+        self.metrics_logger = metrics_logger
+        self.limiter = limiter
+        self.deduplicator = deduplicator or Deduplicator()
+
+    def ingest(self, client: str, events: List[Any], client_dropped: int = 0) -> Dict[str, int]:
+        """Log a batch of events from one client
+
+        Args:
+            client (str): Client key for rate limiting (remote address)
+            events (List[Any]): Event objects with a "kind" of error or metric
+            client_dropped (int): Events the browser discarded from a full buffer
+
+        Returns:
+            Dict[str, int]: Counts of accepted, duplicate, invalid and rate-limited events
+        """
+        result = {'accepted': 0, 'duplicates': 0, 'invalid': 0, 'rate_limited': 0}
+        events = events[:MAX_EVENTS_PER_BATCH]
+        granted = self.limiter.take(client, len(events)) if self.limiter else len(events)
+        result['rate_limited'] = len(events) - granted
+        for event in events[:granted]:
+            if not isinstance(event, dict) or event.get('kind') not in EVENT_KINDS:
+                result['invalid'] += 1
+                continue
+            if event['kind'] == 'error':
+                if self._log_error(client, event):
+                    result['accepted'] += 1
+                else:
+                    result['duplicates'] += 1
+            else:
+                self.metrics_logger.info(_text({k: v for k, v in event.items() if k != 'kind'}))
+                result['accepted'] += 1
+
+        for summary, count in self.deduplicator.expired():
+            self.error_logger.error(f"{summary} (repeated {count} more times in {self.deduplicator.window:.0f}s)")
+        if client_dropped or result['rate_limited']:
+            summary = f"[telemetry] events lost for {client}"
+            # Reported once per window like any other repeated error
+            if self.deduplicator.check(f"lost\0{client}", summary):
+                self.error_logger.error(
+                    f"{summary}: {client_dropped} dropped by the browser, {result['rate_limited']} rate limited"
+                )
+        return result
+
+    def _log_error(self, client: str, event: Dict) -> bool:
+        context = _text(event.get('context', ''))
+        message = _text(event.get('message', ''))
+        key = hashlib.sha1(f"{client}\0{context}\0{message}".encode('utf-8', 'replace')).hexdigest()
+        summary = f"[client] {context}: {message.splitlines()[0] if message else ''}"
+        if not self.deduplicator.check(key, summary):
+            return False
+        timestamp = _text(event.get('timestamp', ''))
+        count = event.get('count')
+        repeats = f"(x{count} in browser)" if isinstance(count, int) and count > 1 else ''
+        header = ' '.join(part for part in (f"[{timestamp}]" if timestamp else '', '[ERROR]', context, repeats) if part)
+        stack = _text(event.get('stack', '')) or message
+        self.error_logger.error(f"{header}\n{stack}\n---")
+        return True
@@ -0,0 +1,372 @@
+"""
+Bulk corpus validator for negotiation scenarios
+- Validates every scenario file under a directory (or NDJSON shards) against
+  negotiation-schema.json and the NegotiationScenario Pydantic model
+- Runs across processes with one compiled validator per worker
+- Streams one JSON result line per file and reports drift between the two schemas
+- Validates stored records as written; --migrate validates them as readers see them
+- Requires: pip install -U jsonschema pydantic (fastjsonschema is used when installed)
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from corpus import EXCLUDED_FILES, NDJSON_EXTENSIONS, SCENARIO_EXTENSIONS, extract_scenarios
+from migrations import migrate_all
+
+logger = logging.getLogger('validate_corpus')
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'negotiation-schema.json')
+MAX_ERRORS_PER_SCENARIO = 5
+
+# Enum constraints expressed by the Pydantic models as "^(a|b|c)$" patterns
+ENUM_PATTERN = re.compile(r'^\^\(([\w\-|]+)\)\$$')
+
+
+class CorpusValidationError(Exception):
+    """Exception raised when the validator itself cannot run"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output and error.log for the validator"""
+    logger.setLevel(logging.INFO)
+    error_handler = logging.FileHandler('error.log', encoding='utf-8')
+    error_handler.setLevel(logging.ERROR)
+    error_handler.setFormatter(logging.Formatter(
+        '[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s\n'
+        'Context: %(pathname)s:%(lineno)d\n'
+        '%(stack_info)s\n'
+        '---'
+    ))
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(error_handler)
+    logger.addHandler(console_handler)
+
+
+def load_schema(path: str) -> Dict:
+    """Load the draft-07 JSON Schema
+
+    Raises:
+        CorpusValidationError: If the schema cannot be read
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, OSError, json.JSONDecodeError) as e:
+        raise CorpusValidationError(f"Cannot load schema {path}: {str(e)}")
+
+
+def compile_schema(schema: Dict) -> Callable[[Any], List[str]]:
+    """Compile the JSON Schema into a function returning error messages
+
+    fastjsonschema generates Python code for the schema and is used when
+    installed. It stops at the first error, so rejected documents are
+    re-checked with jsonschema's Draft7Validator to collect messages.
+
+    Args:
+        schema (Dict): JSON Schema document
+
+    Returns:
+        Callable[[Any], List[str]]: Validator returning a list of error messages
+
+    Raises:
+        CorpusValidationError: If no JSON Schema library is installed
+    """
+    try:
+        from jsonschema import Draft7Validator
+    except ImportError:
+        raise CorpusValidationError("jsonschema is required: pip install -U jsonschema")
+    explainer = Draft7Validator(schema)
+
+    def explain(data: Any) -> List[str]:
+        errors = []
+        for error in explainer.iter_errors(data):
+            location = '/'.join(str(p) for p in error.absolute_path) or '<root>'
+            errors.append(f"{location}: {error.message}")
+            if len(errors) >= MAX_ERRORS_PER_SCENARIO:
+                break
+        return errors
+
+    try:
+        import fastjsonschema
+    except ImportError:
+        return explain
+
+    fast = fastjsonschema.compile(schema)
+
+    def validate(data: Any) -> List[str]:
+        try:
+            fast(data)
+            return []
+        except fastjsonschema.JsonSchemaException:
+            return explain(data)
+
+    return validate
+
+
+# Per-process state, built once by the pool initializer
+_schema_validator: Optional[Callable[[Any], List[str]]] = None
+_scenario_model = None
+_migrate_records = False
+
+
+def _init_worker(schema: Dict, migrate_records: bool = False):
+    """Compile validators once per worker process"""
+    global _schema_validator, _scenario_model, _migrate_records
+    from negotiationgen import NegotiationScenario
+    _schema_validator = compile_schema(schema)
+    _scenario_model = NegotiationScenario
+    _migrate_records = migrate_records
+
+
+def _model_errors(scenario: Dict) -> List[str]:
+    """Validate one scenario against the Pydantic model"""
+    from pydantic import ValidationError as PydanticValidationError
+    try:
+        _scenario_model.model_validate(scenario)
+        return []
+    except PydanticValidationError as e:
+        return [
+            f"{'/'.join(str(p) for p in err['loc']) or '<root>'}: {err['msg']}"
+            for err in e.errors()[:MAX_ERRORS_PER_SCENARIO]
+        ]
+
+
+def _read_scenarios(path: str) -> List[Dict]:
+    """Read the scenarios of a .json file or NDJSON shard"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if path.endswith(NDJSON_EXTENSIONS):
+        scenarios = []
+        for line in raw.splitlines():
+            if line.strip():
+                scenarios.extend(extract_scenarios(json.loads(line)))
+    else:
+        scenarios = extract_scenarios(json.loads(raw))
+    if _migrate_records:
+        scenarios, _ = migrate_all(scenarios)
+    return scenarios
+
+
+def validate_file(path: str) -> Dict:
+    """Validate every scenario in a file against both schemas
+
+    Args:
+        path (str): Scenario file path
+
+    Returns:
+        Dict: Result with per-scenario errors and drift flags
+    """
+    result = {'path': path, 'scenarios': 0, 'valid': True, 'drift': 0, 'errors': []}
+    try:
+        scenarios = _read_scenarios(path)
+    except (IOError, OSError, ValueError) as e:
+        result['valid'] = False
+        result['errors'].append({'index': None, 'kind': 'read', 'messages': [str(e)]})
+        return result
+
+    if not scenarios:
+        # Character files, logs and other JSON documents share the directory
+        result['skipped'] = True
+        return result
+
+    result['scenarios'] = len(scenarios)
+    for index, scenario in enumerate(scenarios):
+        schema_errors = _schema_validator(scenario)
+        model_errors = _model_errors(scenario)
+        if schema_errors:
+            result['errors'].append({'index': index, 'kind': 'json_schema', 'messages': schema_errors})
+        if model_errors:
+            result['errors'].append({'index': index, 'kind': 'model', 'messages': model_errors})
+        if schema_errors or model_errors:
+            result['valid'] = False
+        # One validator accepts what the other rejects
+        if bool(schema_errors) != bool(model_errors):
+            result['drift'] += 1
+    return result
+
+
+def iter_corpus_files(root: str) -> Iterator[str]:
+    """Yield scenario files under a directory (or the path itself if it is a file)"""
+    if os.path.isfile(root):
+        yield root
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != '__pycache__']
+        for name in sorted(filenames):
+            if name.endswith(SCENARIO_EXTENSIONS) and name not in EXCLUDED_FILES:
+                yield os.path.join(dirpath, name)
+
+
+def _unwrap(node: Dict, defs: Dict) -> Dict:
+    """Resolve $ref and drop the null branch of Optional fields"""
+    while True:
+        if '$ref' in node:
+            node = defs[node['$ref'].split('/')[-1]]
+        elif 'anyOf' in node:
+            branches = [b for b in node['anyOf'] if b.get('type') != 'null']
+            if len(branches) != 1:
+                return node
+            node = branches[0]
+        else:
+            return node
+
+
+def _allowed_values(node: Dict) -> Optional[frozenset]:
+    """Return the enum of a string node, whether written as enum or pattern"""
+    if 'enum' in node:
+        return frozenset(node['enum'])
+    match = ENUM_PATTERN.match(node.get('pattern', ''))
+    if match:
+        return frozenset(match.group(1).split('|'))
+    return None
+
+
+def compare_schemas(json_schema: Dict, model_schema: Dict) -> List[str]:
+    """Report structural differences between the JSON Schema and the Pydantic model
+
+    Args:
+        json_schema (Dict): negotiation-schema.json document
+        model_schema (Dict): NegotiationScenario.model_json_schema()
+
+    Returns:
+        List[str]: One line per drift, prefixed with the JSON path
+    """
+    defs = model_schema.get('$defs', {})
+    drift = []
+
+    def walk(js: Dict, ms: Dict, path: str):
+        ms = _unwrap(ms, defs)
+        js_type, ms_type = js.get('type'), ms.get('type')
+        if js_type != ms_type:
+            drift.append(f"{path}: type {js_type!r} in JSON Schema vs {ms_type!r} in model")
+            return
+
+        if js_type == 'object':
+            js_props, ms_props = js.get('properties', {}), ms.get('properties', {})
+            for name in sorted(set(js_props) - set(ms_props)):
+                drift.append(f"{path}.{name}: only in JSON Schema")
+            for name in sorted(set(ms_props) - set(js_props)):
+                drift.append(f"{path}.{name}: only in model")
+            js_req, ms_req = set(js.get('required', [])), set(ms.get('required', []))
+            for name in sorted(js_req - ms_req):
+                drift.append(f"{path}.{name}: required in JSON Schema, optional in model")
+            for name in sorted(ms_req - js_req):
+                drift.append(f"{path}.{name}: required in model, optional in JSON Schema")
+            for name in sorted(set(js_props) & set(ms_props)):
+                walk(js_props[name], ms_props[name], f"{path}.{name}")
+
+        elif js_type == 'array':
+            for bound in ('minItems', 'maxItems'):
+                if js.get(bound) != ms.get(bound):
+                    drift.append(f"{path}: {bound} {js.get(bound)} in JSON Schema vs {ms.get(bound)} in model")
+            if 'items' in js and 'items' in ms:
+                walk(js['items'], ms['items'], f"{path}[]")
+
+        elif js_type == 'string':
+            js_values, ms_values = _allowed_values(js), _allowed_values(ms)
+            if js_values != ms_values:
+                drift.append(
+                    f"{path}: allowed values {sorted(js_values) if js_values else 'any'} in JSON Schema "
+                    f"vs {sorted(ms_values) if ms_values else 'any'} in model"
+                )
+            elif js_values is None and js.get('pattern') != ms.get('pattern'):
+                drift.append(
+                    f"{path}: pattern {js.get('pattern')!r} in JSON Schema vs {ms.get('pattern')!r} in model"
+                )
+
+    walk(json_schema, model_schema, '$')
+    return drift
+
+
+def run(paths: List[str], schema: Dict, workers: int, chunksize: int, out, migrate_records: bool = False) -> Dict:
+    """Validate a corpus in parallel and stream per-file results
+
+    Args:
+        paths (List[str]): Directories or files to validate
+        schema (Dict): JSON Schema document
+        workers (int): Number of worker processes
+        chunksize (int): Files handed to a worker at a time
+        out: Text stream receiving one JSON line per file
+        migrate_records (bool): Validate records after upgrading them to the current schema version
+
+    Returns:
+        Dict: Summary statistics
+    """
+    start_time = time.time()
+    summary = {'files': 0, 'skipped_files': 0, 'invalid_files': 0, 'scenarios': 0, 'drift_scenarios': 0}
+    files = (f for root in paths for f in iter_corpus_files(root))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(schema, migrate_records)) as pool:
+        for result in pool.map(validate_file, files, chunksize=chunksize):
+            summary['files'] += 1
+            if result.get('skipped'):
+                summary['skipped_files'] += 1
+                continue
+            summary['scenarios'] += result['scenarios']
+            summary['drift_scenarios'] += result['drift']
+            if not result['valid']:
+                summary['invalid_files'] += 1
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            if summary['files'] % 1000 == 0:
+                logger.info(f"Validated {summary['files']} files...")
+
+    summary['elapsed'] = f"{time.time() - start_time:.2f}s"
+    return summary
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Validate a scenario corpus against the JSON Schema and the Pydantic model")
+    parser.add_argument('paths', nargs='*', default=['.'], help="Directories, scenario files or NDJSON shards")
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA_PATH, help="Path to negotiation-schema.json")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--chunksize', type=int, default=64, help="Files per worker task")
+    parser.add_argument('--output', help="Write per-file results here instead of stdout")
+    parser.add_argument('--migrate', action='store_true', help="Validate records after lazy schema migration")
+    parser.add_argument('--drift-only', action='store_true', help="Only print the static schema drift report")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        schema = load_schema(args.schema)
+        from negotiationgen import NegotiationScenario
+        drift = compare_schemas(schema, NegotiationScenario.model_json_schema())
+        logger.info(f"Schema drift between {os.path.basename(args.schema)} and NegotiationScenario: {len(drift)}")
+        for line in drift:
+            logger.info(f"  {line}")
+        if args.drift_only:
+            sys.exit(1 if drift else 0)
+
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            summary = run(args.paths, schema, max(args.workers, 1), max(args.chunksize, 1), out, args.migrate)
+        finally:
+            if args.output:
+                out.close()
+        summary['schema_drift'] = len(drift)
+        logger.info(f"Validation completed: {json.dumps(summary)}")
+        sys.exit(1 if summary['invalid_files'] else 0)
+
+    except CorpusValidationError as e:
+        logger.error(e.message)
+        sys.exit(2)
+    except KeyboardInterrupt:
+        logger.info("\nValidation cancelled by user.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
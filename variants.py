@@ -0,0 +1,385 @@
+"""
+Rule-based scenario variant engine
+- Expands validated NegotiationScenario records into many schema-valid variants
+  without an LLM call: severity shifts, swapped party roles, reordered concession
+  stages, new industries/timeframes and sub-models recombined across scenarios
+- Every variant changes its source: operators that do not apply are replaced by
+  ones that do, and sources no operator applies to are skipped
+- Deterministic for a given seed; every variant carries provenance (source id,
+  operators applied, scenarios it borrowed from)
+- Variants share unchanged sections with their source, so only touched sections are copied
+- Usage: python variants.py [PATH ...] --count 5000 [--seed 0] [--output variants.json]
+  (default output: variants/variants_<timestamp>.json, outside the viewer's data root)
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from corpus import CorpusError, load_scenario_file, scenario_files
+
+logger = logging.getLogger('variants')
+
+DEFAULT_COUNT = 1000
+MAX_OPERATORS_PER_VARIANT = 3
+
+SEVERITY_LEVELS = ['low', 'medium', 'high', 'critical']
+PRIORITY_LEVELS = ['low', 'medium', 'high']
+FLEXIBILITY_LEVELS = ['rigid', 'moderate', 'flexible']
+DEFAULT_INDUSTRIES = [
+    'Healthcare', 'Manufacturing', 'Logistics', 'Retail', 'Financial Services',
+    'Software', 'Energy', 'Construction', 'Agriculture', 'Telecommunications'
+]
+DEFAULT_TIMEFRAMES = ['2 weeks', '6 weeks', '3 months', '6 months', '6-12 months', '18 months']
+# Default output directory; the viewer serves the working directory, so variants stay out of it
+DEFAULT_OUTPUT_DIR = 'variants'
+
+
+class VariantError(Exception):
+    """Exception raised when variants cannot be generated"""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def setup_logging():
+    """Configure console output for the variant engine"""
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console_handler)
+
+
+def industry_words(text: str) -> List[str]:
+    """Lowercase words of four or more letters, as used to spot industry names in text"""
+    return [word for word in re.findall(r'[a-z]+', text.lower()) if len(word) >= 4]
+
+
+class VariantContext:
+    """Source scenarios and value pools shared by the operators"""
+
+    def __init__(self, sources: List[Dict]):
+        self.sources = sources
+        self.industries = sorted({s['topic']['industry'] for s in sources if s['topic'].get('industry')}
+                                 | set(DEFAULT_INDUSTRIES))
+        self.industry_words = {word for industry in self.industries for word in industry_words(industry)}
+        self.timeframes = sorted({s['topic']['expectedTimeframe'] for s in sources
+                                  if s['topic'].get('expectedTimeframe')} | set(DEFAULT_TIMEFRAMES))
+        self.with_strategies = [i for i, s in enumerate(sources) if s.get('strategies')]
+        self.with_tactics = [i for i, s in enumerate(sources) if s.get('tactics')]
+
+
+# Operators take (variant, rng, context) and return a description for the
+# provenance, or None if they do not apply to this scenario. A variant is a
+# shallow copy of its source: operators must copy a section before changing it.
+Operator = Callable[[Dict, random.Random, VariantContext], Optional[Dict]]
+
+
+def shift_severity(variant: Dict, rng: random.Random, context: VariantContext) -> Optional[Dict]:
+    """Move each conflict point's severity up or down one level"""
+    points = copy.deepcopy(variant['conflictPoints'])
+    if not points:
+        return None
+    step = rng.choice((-1, 1))
+    for point in points:
+        level = SEVERITY_LEVELS.index(point['severity'])
+        point['severity'] = SEVERITY_LEVELS[min(max(level + step, 0), len(SEVERITY_LEVELS) - 1)]
+    variant['conflictPoints'] = points
+    return {'op': 'severity', 'step': step}
+
+
+def swap_roles(variant: Dict, rng: random.Random, context: VariantContext) -> Optional[Dict]:
+    """Exchange the two parties' roles and authority levels
+
+    Each party keeps its id, name, interests, constraints, positions and
+    walkaway conditions, so the variant puts the same demands in other hands.
+    """
+    if len(variant['parties']) != 2:
+        return None
+    first, second = variant['parties']
+    if (first['role'], first.get('authorityLevel')) == (second['role'], second.get('authorityLevel')):
+        return None
+    swapped = []
+    for party, other in ((first, second), (second, first)):
+        party = dict(party, role=other['role'])
+        party.pop('authorityLevel', None)
+        if other.get('authorityLevel') is not None:
+            party['authorityLevel'] = other['authorityLevel']
+        swapped.append(party)
+    variant['parties'] = swapped
+    return {'op': 'swap-roles'}
+
+
+def reorder_concessions(variant: Dict, rng: random.Random, context: VariantContext) -> Optional[Dict]:
+    """Shuffle the order of the concession stages"""
+    tactics = variant.get('tactics')
+    if not tactics or len(tactics['concessionPlan']['sequence']) < 2:
+        return None
+    sequence = list(tactics['concessionPlan']['sequence'])
+    order = list(range(len(sequence)))
+    rng.shuffle(order)
+    variant['tactics'] = dict(tactics, concessionPlan=dict(tactics['concessionPlan'],
+                                                           sequence=[sequence[i] for i in order]))
+    return {'op': 'reorder-concessions', 'order': order}
+
+
+def change_industry(variant: Dict, rng: random.Random, context: VariantContext) -> Optional[Dict]:
+    """Set a different industry
+
+    Only applies to scenarios whose title, description and context name no
+    known industry, since those fields are not rewritten.
+    """
+    topic = variant['topic']
+    words = context.industry_words | set(industry_words(topic.get('industry') or ''))
+    text = ' '.join((topic['title'], topic['description'], topic['context']))
+    if words.intersection(industry_words(text)):
+        return None
+    choices = [i for i in context.industries if i != variant['topic'].get('industry')]
+    industry = rng.choice(choices)
+    variant['topic'] = dict(variant['topic'], industry=industry)
+    return {'op': 'industry', 'value': industry}
+
+
+def change_timeframe(variant: Dict, rng: random.Random, context: VariantContext) -> Optional[Dict]:
+    """Set a different expected timeframe"""
+    choices = [t for t in context.timeframes if t != variant['topic'].get('expectedTimeframe')]
+    timeframe = rng.choice(choices)
+    variant['topic'] = dict(variant['topic'], expectedTimeframe=timeframe)
+    return {'op': 'timeframe', 'value': timeframe}
+
+
+def perturb_priorities(variant: Dict, rng: random.Random, context: VariantContext) -> Optional[Dict]:
+    """Reassign priority and flexibility of the negotiable points"""
+    if not variant['negotiablePoints']:
+        return None
+    variant['negotiablePoints'] = [
+        dict(point, priority=rng.choice(PRIORITY_LEVELS), flexibility=rng.choice(FLEXIBILITY_LEVELS))
+        for point in variant['negotiablePoints']
+    ]
+    return {'op': 'priorities'}
+
+
+def _recombine(section: str, candidates_attr: str) -> Operator:
+    def recombine(variant: Dict, rng: random.Random, context: VariantContext) -> Optional[Dict]:
+        candidates = [i for i in getattr(context, candidates_attr)
+                      if context.sources[i][section] is not variant.get(section)]
+        if not candidates:
+            return None
+        donor = rng.choice(candidates)
+        variant[section] = context.sources[donor][section]
+        return {'op': f'recombine-{section}', 'from': donor}
+    recombine.__doc__ = f"Borrow {section} from another scenario"
+    return recombine
+
+
+OPERATORS: Dict[str, Operator] = {
+    'severity': shift_severity,
+    'swap-roles': swap_roles,
+    'reorder-concessions': reorder_concessions,
+    'industry': change_industry,
+    'timeframe': change_timeframe,
+    'priorities': perturb_priorities,
+    'recombine-strategies': _recombine('strategies', 'with_strategies'),
+    'recombine-tactics': _recombine('tactics', 'with_tactics'),
+}
+
+
+def party_positions(scenario: Dict) -> Dict[str, Tuple[List[str], List[Dict]]]:
+    """Map each party name to its positions and walkaway conditions
+
+    Positions and conditions are stored under party1/party2 keys, which follow
+    the party ids in list order, so they belong to whichever party holds that slot.
+    """
+    by_party = {}
+    for slot, party in enumerate(scenario['parties'][:2], start=1):
+        key = f'party{slot}'
+        by_party[party['name']] = (
+            [point['currentPosition'][f'{key}Position'] for point in scenario['negotiablePoints']],
+            scenario['walkawayConditions'][f'{key}Conditions']
+        )
+    return by_party
+
+
+def variant_id(seed: int, index: int) -> str:
+    """Deterministic 8-character negotiation id for a variant"""
+    return hashlib.sha1(f"{seed}:{index}".encode()).hexdigest()[:8].upper()
+
+
+def load_sources(paths: List[str]) -> Tuple[List[Dict], List[str]]:
+    """Load and validate source scenarios
+
+    Args:
+        paths (List[str]): Scenario files or directories
+
+    Returns:
+        Tuple[List[Dict], List[str]]: Validated scenarios and their source labels (file#index)
+
+    Raises:
+        VariantError: If no valid scenario was found
+    """
+    from negotiationgen import NegotiationScenario
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(scenario_files(path))
+        else:
+            files.append(path)
+
+    sources, labels = [], []
+    for path in files:
+        try:
+            scenarios = load_scenario_file(path)
+        except CorpusError as e:
+            logger.warning(e.message)
+            continue
+        for index, scenario in enumerate(scenarios):
+            try:
+                sources.append(NegotiationScenario.model_validate(scenario).model_dump(exclude_none=True))
+                labels.append(f"{os.path.basename(path)}#{index}")
+            except Exception as e:
+                logger.warning(f"Skipping invalid scenario {os.path.basename(path)}#{index}: {str(e).splitlines()[0]}")
+    if not sources:
+        raise VariantError("No valid source scenarios found")
+    return sources, labels
+
+
+def generate_variants(
+    sources: List[Dict],
+    labels: List[str],
+    count: int,
+    seed: int = 0,
+    operators: Optional[List[str]] = None,
+    validate: bool = True
+) -> Iterator[Tuple[Dict, Dict]]:
+    """Yield (variant, provenance) pairs
+
+    Sources are used round-robin. Each variant applies 1 to
+    MAX_OPERATORS_PER_VARIANT operators chosen by a per-variant RNG, so
+    variant i depends only on the seed, i and the sources. If none of the
+    chosen operators applies, the first remaining one that does is used; a
+    variant no operator applies to is skipped, so fewer than count may be yielded.
+
+    Args:
+        sources (List[Dict]): Validated source scenarios
+        labels (List[str]): Source labels for the provenance
+        count (int): Number of variants
+        seed (int): Random seed
+        operators (Optional[List[str]]): Operator names to use (default: all)
+        validate (bool): Validate every variant against NegotiationScenario
+
+    Raises:
+        VariantError: If validation is on and a variant is invalid
+    """
+    from negotiationgen import NegotiationScenario
+
+    names = operators or list(OPERATORS)
+    context = VariantContext(sources)
+    for index in range(count):
+        source_index = index % len(sources)
+        rng = random.Random(f"{seed}:{index}")
+        variant = dict(sources[source_index])
+        chosen = rng.sample(names, min(rng.randint(1, MAX_OPERATORS_PER_VARIANT), len(names)))
+        fallback = [name for name in names if name not in chosen]
+        rng.shuffle(fallback)
+        applied = []
+        for name in chosen + fallback:
+            if applied and name not in chosen:
+                break
+            description = OPERATORS[name](variant, rng, context)
+            if description is not None:
+                if 'from' in description:
+                    description['from'] = labels[description['from']]
+                applied.append(description)
+        if not applied:
+            logger.debug(f"Skipping variant {index}: no operator applies to {labels[source_index]}")
+            continue
+        variant['negotiationId'] = variant_id(seed, index)
+
+        if validate:
+            try:
+                NegotiationScenario.model_validate(variant)
+            except Exception as e:
+                raise VariantError(f"Variant {index} of {labels[source_index]} is invalid: {str(e)}")
+            if party_positions(variant) != party_positions(sources[source_index]):
+                raise VariantError(f"Variant {index} of {labels[source_index]} gave a party "
+                                   "another party's positions")
+
+        yield variant, {
+            'negotiationId': variant['negotiationId'],
+            'variantOf': labels[source_index],
+            'sourceNegotiationId': sources[source_index]['negotiationId'],
+            'seed': seed,
+            'index': index,
+            'operators': applied
+        }
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Generate rule-based variants of negotiation scenarios")
+    parser.add_argument('paths', nargs='*', default=['.'], help="Scenario files or directories (.json and NDJSON files)")
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT, help="Number of variants")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--operators', help=f"Comma-separated subset of: {', '.join(OPERATORS)}")
+    parser.add_argument('--no-validate', action='store_true', help="Skip validating each variant")
+    parser.add_argument('--output', help=f"Output file (default: {DEFAULT_OUTPUT_DIR}/variants_<timestamp>.json)")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        operators = None
+        if args.operators:
+            operators = [name.strip() for name in args.operators.split(',') if name.strip()]
+            unknown = [name for name in operators if name not in OPERATORS]
+            if unknown:
+                raise VariantError(f"Unknown operators: {', '.join(unknown)}")
+
+        sources, labels = load_sources(args.paths)
+        logger.info(f"Loaded {len(sources)} source scenarios")
+
+        start_time = time.perf_counter()
+        scenarios, provenance = [], []
+        for variant, record in generate_variants(sources, labels, args.count, args.seed,
+                                                 operators, not args.no_validate):
+            scenarios.append(variant)
+            provenance.append(record)
+        elapsed = time.perf_counter() - start_time
+        if len(scenarios) < args.count:
+            logger.warning(f"Skipped {args.count - len(scenarios)} variants: no operator applies to their source")
+
+        # Provenance is stored next to the scenarios, aligned by index, so the
+        # scenario records themselves stay schema-valid
+        output = args.output or os.path.join(
+            DEFAULT_OUTPUT_DIR, f"variants_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            if not args.output:
+                os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump({'scenarios': scenarios, 'provenance': provenance}, f, ensure_ascii=False)
+        except (IOError, OSError) as e:
+            raise VariantError(f"Cannot write {output}: {str(e)}")
+        logger.info(
+            f"Generated {len(scenarios)} variants in {elapsed:.2f}s "
+            f"({len(scenarios) / max(elapsed, 1e-9):.0f}/s) and saved to {output}"
+        )
+
+    except VariantError as e:
+        logger.error(e.message)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        logger.info("\nVariant generation cancelled by user.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
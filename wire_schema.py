@@ -0,0 +1,240 @@
+"""
+Compact-key wire schemas for structured generation
+- Derives short key aliases (applicationContext -> ac) from any Pydantic model;
+  aliases are unique across the whole model, so each stands for one field name
+- Builds the JSON schema passed as `format` with the aliased keys
+- Expands model output back to canonical field names before validation,
+  so saved files and app.js keep the long names
+- `python wire_schema.py measure` reports the net token change per request on a
+  corpus: output tokens plus the schema sent with each request
+"""
+
+import argparse
+import copy
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rough subword token proxy used when no tokenizer is available: BPE vocabularies
+# split camelCase keys at case changes and digits, and punctuation is its own token
+TOKEN_PATTERN = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d|[^\w\s]')
+
+
+def short_alias(name: str, taken: set) -> str:
+    """Derive a short, unique alias from a camelCase field name
+
+    Args:
+        name (str): Canonical field name
+        taken (set): Aliases already used in the model
+
+    Returns:
+        str: Alias made of word initials and digits (e.g. party1Position -> p1p); on a
+        clash the last word is spelled out further (context -> cont), then numbered
+    """
+    words = re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+', name) or [name]
+    initials = ''.join(w if w.isdigit() else w[0] for w in words).lower()
+    last = words[-1].lower()
+    candidates = [initials] + [initials[:-1] + last[:length] for length in range(2, len(last) + 1)]
+    for alias in candidates:
+        if alias not in taken:
+            return alias
+    counter = 2
+    while f"{initials}{counter}" in taken:
+        counter += 1
+    return f"{initials}{counter}"
+
+
+def _alias_object(node: Dict, names: Dict[str, str]) -> Dict[str, str]:
+    """Rename the properties of one object schema in place and return its alias map
+
+    names maps every field name of the model seen so far to its alias and is
+    extended here, so a field name has the same alias in every object.
+    """
+    aliases = {}
+    properties = {}
+    for name, prop in node.get('properties', {}).items():
+        if name not in names:
+            names[name] = short_alias(name, set(names.values()))
+        aliases[name] = names[name]
+        prop.pop('title', None)
+        properties[names[name]] = prop
+    node['properties'] = properties
+    if 'required' in node:
+        node['required'] = [aliases[n] for n in node['required']]
+    node.pop('title', None)
+    return aliases
+
+
+@lru_cache(maxsize=None)
+def _compact(model: type) -> Tuple[str, str]:
+    schema = copy.deepcopy(model.model_json_schema())
+    names = {}
+    aliases = {'#': _alias_object(schema, names)}
+    for def_name, definition in schema.get('$defs', {}).items():
+        if definition.get('type') == 'object':
+            aliases[def_name] = _alias_object(definition, names)
+    # Cached as JSON so callers cannot mutate the shared copies
+    return json.dumps(schema), json.dumps(aliases)
+
+
+def wire_schema(model: type) -> Dict:
+    """Return the JSON schema of a model with short property names"""
+    return json.loads(_compact(model)[0])
+
+
+def alias_map(model: type) -> Dict[str, Dict[str, str]]:
+    """Return {definition name: {canonical field: alias}} ('#' is the root model)"""
+    return json.loads(_compact(model)[1])
+
+
+def _resolve(node: Dict, defs: Dict, value: Any) -> Tuple[Dict, Optional[str]]:
+    """Follow $ref/anyOf to the schema branch that matches a value"""
+    ref_name = None
+    while True:
+        if '$ref' in node:
+            ref_name = node['$ref'].split('/')[-1]
+            node = defs[ref_name]
+        elif 'anyOf' in node:
+            wanted = 'object' if isinstance(value, dict) else 'array' if isinstance(value, list) else None
+            branch = next(
+                (b for b in node['anyOf'] if '$ref' in b and wanted == 'object' or b.get('type') == wanted),
+                None
+            )
+            if branch is None:
+                return node, ref_name
+            node = branch
+        else:
+            return node, ref_name
+
+
+def _expand(value: Any, node: Dict, defs: Dict, reverse: Dict[str, Dict[str, str]], def_name: str) -> Any:
+    node, ref_name = _resolve(node, defs, value)
+    def_name = ref_name or def_name
+    if isinstance(value, dict) and node.get('type') == 'object':
+        names = reverse.get(def_name, {})
+        properties = node.get('properties', {})
+        return {
+            names.get(key, key): _expand(item, properties.get(key, {}), defs, reverse, None)
+            for key, item in value.items()
+        }
+    if isinstance(value, list) and 'items' in node:
+        return [_expand(item, node['items'], defs, reverse, None) for item in value]
+    return value
+
+
+def expand(data: Any, model: type) -> Any:
+    """Rename aliased keys in parsed wire output back to canonical field names
+
+    Args:
+        data (Any): JSON data produced against wire_schema(model)
+        model (type): Pydantic model the schema was derived from
+
+    Returns:
+        Any: Data using the model's canonical field names
+    """
+    schema = wire_schema(model)
+    reverse = {
+        def_name: {alias: name for name, alias in fields.items()}
+        for def_name, fields in alias_map(model).items()
+    }
+    return _expand(data, schema, schema.get('$defs', {}), reverse, '#')
+
+
+def compact(data: Any, model: type) -> Any:
+    """Convert canonical data to its wire form (used for measurements)"""
+    schema = json.loads(json.dumps(model.model_json_schema()))
+    aliases = alias_map(model)
+    return _expand(data, schema, schema.get('$defs', {}), aliases, '#')
+
+
+def expand_json(content: str, model: type) -> str:
+    """Expand a raw JSON response; invalid JSON is returned unchanged for the validator to report"""
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return content
+    return json.dumps(expand(data, model), ensure_ascii=False)
+
+
+def approx_tokens(text: str) -> int:
+    """Approximate token count (subwords and punctuation)"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def measure(scenarios: List[Dict], model: type, tokens_per_second: Optional[float] = None) -> Dict:
+    """Compare canonical and wire encodings of a set of scenarios
+
+    Each request also carries its schema as `format`, so the schema tokens are
+    counted on the prompt side; the net change is prompt plus output tokens.
+
+    Args:
+        scenarios (List[Dict]): Scenarios using canonical field names
+        model (type): Pydantic model of the scenarios
+        tokens_per_second (Optional[float]): Generation speed used to estimate latency savings
+
+    Returns:
+        Dict: Mean characters/tokens per scenario, the schema tokens per request and
+        the relative output and net savings
+    """
+    canonical_chars = wire_chars = canonical_tokens = wire_tokens = 0
+    for scenario in scenarios:
+        canonical = json.dumps(scenario, indent=2, ensure_ascii=False)
+        wire = json.dumps(compact(scenario, model), indent=2, ensure_ascii=False)
+        canonical_chars += len(canonical)
+        wire_chars += len(wire)
+        canonical_tokens += approx_tokens(canonical)
+        wire_tokens += approx_tokens(wire)
+    count = max(len(scenarios), 1)
+    saved_tokens = (canonical_tokens - wire_tokens) / count
+    canonical_schema = approx_tokens(json.dumps(model.model_json_schema()))
+    wire_schema_tokens = approx_tokens(json.dumps(wire_schema(model)))
+    canonical_request = canonical_tokens / count + canonical_schema
+    net_saved = saved_tokens + canonical_schema - wire_schema_tokens
+    report = {
+        'scenarios': len(scenarios),
+        'mean_canonical_tokens': round(canonical_tokens / count, 1),
+        'mean_wire_tokens': round(wire_tokens / count, 1),
+        'mean_tokens_saved': round(saved_tokens, 1),
+        'token_savings': f"{(1 - wire_tokens / max(canonical_tokens, 1)) * 100:.1f}%",
+        'char_savings': f"{(1 - wire_chars / max(canonical_chars, 1)) * 100:.1f}%",
+        'canonical_schema_tokens': canonical_schema,
+        'wire_schema_tokens': wire_schema_tokens,
+        'mean_net_tokens_saved': round(net_saved, 1),
+        'net_token_savings': f"{net_saved / max(canonical_request, 1) * 100:.1f}%",
+    }
+    if tokens_per_second:
+        report['estimated_seconds_saved_per_scenario'] = round(saved_tokens / tokens_per_second, 2)
+    return report
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Compact-key wire schemas for the generators")
+    sub = parser.add_subparsers(dest='command', required=True)
+    show = sub.add_parser('show', help="Print the wire schema")
+    show.add_argument('model', choices=['negotiation', 'character'])
+    bench = sub.add_parser('measure', help="Measure prompt and output token savings on a scenario corpus")
+    bench.add_argument('root', nargs='?', default='.', help="Directory holding scenario files")
+    bench.add_argument('--tokens-per-second', type=float, default=None,
+                       help="Generation speed used to estimate latency savings")
+    args = parser.parse_args()
+
+    from negotiationgen import NegotiationScenario
+    if args.command == 'show':
+        if args.model == 'character':
+            from charactergen import Character as model
+        else:
+            model = NegotiationScenario
+        print(json.dumps(wire_schema(model), indent=2))
+        return
+
+    from corpus import ScenarioIndex
+    index = ScenarioIndex(args.root)
+    # Raw records are measured as-is; sample files need not pass the current validators
+    scenarios = [index.get(entry['id']) for entry in index.entries()]
+    print(json.dumps(measure(scenarios, NegotiationScenario, args.tokens_per_second), indent=2))
+
+
+if __name__ == "__main__":
+    main()